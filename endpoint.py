@@ -1,114 +1,820 @@
+import os
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator
 
 import modal
 
+from ollama_modal.manifests import model_blob_paths
+from ollama_modal.prefetch import prefetch_files
+from ollama_modal.pull import Progress, RegistryPuller, collect_garbage
+from ollama_modal.routing import POOLS, RoutingTable
+from ollama_modal.startup import StartupTimeline
+from ollama_modal.verify import VerificationCache, remove_blobs, verify_model
+
 DEFAULT_MODEL = "gemma4:12b"
+MODELS_DIR = "/usr/share/ollama/.ollama/models"
+# Requests Ollama decodes concurrently per loaded model; Modal routes this many
+# inputs to a container before scaling out, and the router admits this many per
+# container before queueing.
+OLLAMA_NUM_PARALLEL = 4
+POOL_MAX_CONTAINERS = 4
+# Models verified, prefetched and loaded at container start, e.g.
+# `OLLAMA_WARM_MODELS=gemma4:12b,llama3.2 modal deploy endpoint.py`.
+WARM_MODELS = [
+    m for m in os.environ.get("OLLAMA_WARM_MODELS", DEFAULT_MODEL).split(",") if m
+]
+# Snapshot the CPU-side startup (imports, Volume verification) so restored
+# containers only start `ollama serve` and load weights. Set to 0 at deploy
+# time for the unsnapshotted path, e.g. to compare the two.
+MEMORY_SNAPSHOT = os.environ.get("OLLAMA_MEMORY_SNAPSHOT", "1") == "1"
 
 image = (
     modal.Image.debian_slim(python_version="3.12")
     .apt_install("curl", "systemctl", "zstd")
     .run_commands("curl -fsSL https://ollama.com/install.sh | sh", force_build=False)
-    .pip_install("httpx", "loguru")
+    .pip_install("fastapi", "httpx", "loguru")
     .env(
         {
             "OLLAMA_HOST": "0.0.0.0:11434",
-            "OLLAMA_MODELS": "/usr/share/ollama/.ollama/models",
+            "OLLAMA_MODELS": MODELS_DIR,
             # Keep weights in GPU memory while the container is alive (including at snapshot time).
             "OLLAMA_KEEP_ALIVE": "-1",
+            "OLLAMA_NUM_PARALLEL": str(OLLAMA_NUM_PARALLEL),
+            "OLLAMA_WARM_MODELS": ",".join(WARM_MODELS),
+            "OLLAMA_MEMORY_SNAPSHOT": "1" if MEMORY_SNAPSHOT else "0",
         }
     )
+    .add_local_python_source("ollama_modal")
 )
 
 volume = modal.Volume.from_name("ollama-model-weights", create_if_missing=True)
+response_cache_volume = modal.Volume.from_name(
+    "ollama-response-cache", create_if_missing=True
+)
+RESPONSE_CACHE_DIR = "/response-cache"
+# Cross-container leases on blobs being pulled: {digest: (owner, expires_at)}.
+pull_locks = modal.Dict.from_name("ollama-pull-locks", create_if_missing=True)
+PULL_LEASE_SECONDS = 3600
 
 app = modal.App(name="ollama-service", image=image)
 
 
-def wait_for_ollama(timeout: int = 120, interval: int = 2) -> None:
+def wait_for_ollama(
+    timeout: float = 120,
+    initial_interval: float = 0.05,
+    max_interval: float = 1.0,
+    proc: subprocess.Popen | None = None,
+) -> None:
     """Wait for Ollama service to be ready.
 
+    Polls ``/api/version`` with an exponential backoff that starts at
+    ``initial_interval`` and is capped at ``max_interval``, so a server that comes
+    up in 300ms is noticed in ~300ms rather than at the next 2s tick.
+
     :param timeout: Maximum time to wait in seconds
-    :param interval: Time between checks in seconds
+    :param initial_interval: First delay between checks in seconds
+    :param max_interval: Upper bound on the delay between checks in seconds
+    :param proc: The ``ollama serve`` process, if we started it; fail fast if it exits
     :raises TimeoutError: If the service doesn't start within the timeout period
+    :raises RuntimeError: If ``proc`` exits before the service is ready
     """
     import httpx
     from loguru import logger
 
     start_time = time.time()
-    while True:
-        try:
-            response = httpx.get(
-                "http://localhost:11434/api/version", timeout=interval + 3
-            )
-            if response.status_code == 200:
-                logger.info("Ollama service is ready")
-                return
-        except (httpx.ConnectError, httpx.ReadTimeout, httpx.TimeoutException):
-            if time.time() - start_time > timeout:
+    interval = initial_interval
+    last_log = start_time
+    with httpx.Client(timeout=max_interval + 3) as client:
+        while True:
+            try:
+                response = client.get("http://localhost:11434/api/version")
+                if response.status_code == 200:
+                    logger.info(
+                        f"Ollama service is ready ({time.time() - start_time:.2f}s)"
+                    )
+                    return
+            except (httpx.ConnectError, httpx.ReadTimeout, httpx.TimeoutException):
+                pass
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"ollama serve exited with {proc.returncode}")
+            now = time.time()
+            if now - start_time > timeout:
                 raise TimeoutError("Ollama service failed to start")
-            logger.info(
-                f"Waiting for Ollama service... ({int(time.time() - start_time)}s)"
-            )
+            if now - last_log >= 5:
+                logger.info(f"Waiting for Ollama service... ({int(now - start_time)}s)")
+                last_log = now
             time.sleep(interval)
+            interval = min(interval * 1.5, max_interval)
+
 
+def warmup_model(model_name: str = DEFAULT_MODEL, timeout: float = 600.0) -> dict:
+    """Load model weights into GPU VRAM so the first real request is fast.
 
-def warmup_model(model_name: str = DEFAULT_MODEL, timeout: float = 600.0) -> None:
-    """Load model weights into GPU VRAM so the first real request is fast."""
+    Sends a one-token generation, which loads the weights and evaluates the
+    chat template's prompt into the KV cache, then a second one to show what a
+    request against the now-resident model costs.
+
+    :return: ``load_duration`` in seconds of the first (cold) and second (warm) request
+    """
     import httpx
     from loguru import logger
 
     logger.info(f"Warming up {model_name}...")
-    response = httpx.post(
-        "http://localhost:11434/api/generate",
-        json={"model": model_name, "prompt": "warmup", "stream": False, "think": False},
-        timeout=timeout,
-    )
-    response.raise_for_status()
-    logger.info("Model warmup complete")
+    request = {
+        "model": model_name,
+        "prompt": "warmup",
+        "stream": False,
+        "think": False,
+        "options": {"num_predict": 1},
+    }
+    load_seconds = []
+    with httpx.Client(timeout=timeout) as client:
+        for _ in range(2):
+            response = client.post("http://localhost:11434/api/generate", json=request)
+            response.raise_for_status()
+            load_seconds.append(response.json().get("load_duration", 0) / 1e9)
+    result = {
+        "cold_load_seconds": round(load_seconds[0], 3),
+        "warm_load_seconds": round(load_seconds[1], 3),
+    }
+    logger.info(f"Model warmup complete for {model_name}: {result}")
+    return result
 
 
-@app.cls(
-    volumes={"/usr/share/ollama/.ollama/models": volume},
-    gpu="A10G",
-    scaledown_window=120,
-    timeout=3600,
-)
-class OllamaService:
-    @modal.enter()
-    def start_and_load(self):
-        """Start Ollama, ensure the model is fully present (blobs included), and load it into VRAM."""
+def progress_logger():
+    """Progress callback that logs each blob at most every 5s, and when it finishes."""
+    from loguru import logger
+
+    last_log = 0.0
+
+    def log_progress(p: Progress) -> None:
+        nonlocal last_log
+        if p.completed == p.total or time.time() - last_log >= 5:
+            last_log = time.time()
+            logger.info(
+                f"{p.model} {p.digest[:19]}: "
+                f"{p.completed / 1e9:.2f}/{p.total / 1e9:.2f} GB "
+                f"({p.bytes_per_second / 1e6:.0f} MB/s)"
+            )
+
+    return log_progress
+
+
+@contextmanager
+def blob_leases(digests: Iterable[str], poll: float = 2.0) -> Iterator[bool]:
+    """Hold a lease on each digest, across containers, until the block exits.
+
+    A second pull of the same blob waits here rather than downloading it
+    again. Leases are taken in sorted order so two batches can't deadlock, and
+    expire after ``PULL_LEASE_SECONDS`` so a crashed puller doesn't block the
+    others for good.
+
+    :return: Whether another container held one of the leases first
+    """
+    owner = os.environ.get("MODAL_TASK_ID", str(os.getpid()))
+    held: dict[str, tuple[str, float]] = {}
+    waited = False
+    try:
+        for digest in sorted(digests):
+            while True:
+                lease = (owner, time.time() + PULL_LEASE_SECONDS)
+                if pull_locks.put(digest, lease, skip_if_exists=True):
+                    break
+                holder = pull_locks.get(digest)
+                if holder is not None and holder[1] < time.time():
+                    if take_over_lease(digest, holder, lease):
+                        break
+                    continue
+                waited = True
+                time.sleep(poll)
+            held[digest] = lease
+        yield waited
+    finally:
+        for digest, lease in held.items():
+            release_lease(digest, lease)
+
+
+def take_over_lease(
+    digest: str, expired: tuple[str, float], lease: tuple[str, float]
+) -> bool:
+    """Replace an expired lease with ``lease``, unless another waiter got there first.
+
+    ``modal.Dict`` has no compare-and-swap, so waiters that saw the same expired
+    holder race to create a claim key named after it; only the winner re-puts.
+    """
+    claim = f"{digest}:takeover:{expired[0]}:{expired[1]}"
+    if not pull_locks.put(claim, lease, skip_if_exists=True):
+        return False
+    try:
+        if pull_locks.get(digest) != expired:
+            return False
+        pull_locks.put(digest, lease)
+        return True
+    finally:
+        release_lease(claim, lease)
+
+
+def release_lease(digest: str, lease: tuple[str, float]) -> None:
+    """Drop the lease on ``digest`` if it is still ``lease`` (not taken over since)."""
+    if pull_locks.get(digest) != lease:
+        return
+    try:
+        pull_locks.pop(digest)
+    except KeyError:
+        pass
+
+
+def pull_into_volume(
+    model_name: str, only: set[str] | None = None, attempts: int = 3
+) -> dict:
+    """Download ``model_name`` into the weights Volume with parallel range requests.
+
+    :param model_name: Model name as passed to ``ollama pull``
+    :param only: Restrict the download to these blob digests
+    :param attempts: Tries before giving up; each retry resumes from the partial blobs
+    :return: Summary of what was downloaded and the achieved throughput
+    """
+    import httpx
+    from loguru import logger
+
+    logger.info(f"Pulling {model_name}...")
+    puller = RegistryPuller(MODELS_DIR, progress=progress_logger())
+    for attempt in range(1, attempts + 1):
+        try:
+            result = puller.pull(model_name, only=only)
+            break
+        except httpx.HTTPError as exc:
+            if attempt == attempts:
+                raise
+            # Finished chunks are kept on disk, so the retry resumes mid-blob.
+            logger.warning(f"Pull of {model_name} failed ({exc}), resuming...")
+    logger.info(f"Pulled {model_name}: {result.as_dict()}")
+    return result.as_dict()
+
+
+class _OllamaServer:
+    """Ollama on one GPU class; each subclass below is its own Modal container pool."""
+
+    # Name of this class's pool in ``ollama_modal.routing.POOLS``.
+    pool = "a10g"
+    # Warm models still corrupt after a repair; never prefetched or loaded.
+    broken_models: frozenset[str] = frozenset()
+
+    def warm_models(self) -> list[str]:
+        """The ``WARM_MODELS`` the router sends to this pool.
+
+        Models that need a bigger GPU, or fit on a cheaper one, are warmed by
+        the other pool. Models not on the Volume yet route to the cheapest pool,
+        which pulls them.
+        """
+        table = RoutingTable(MODELS_DIR, POOLS, num_parallel=OLLAMA_NUM_PARALLEL)
+        return [
+            model
+            for model in WARM_MODELS
+            if model not in self.broken_models and table.route(model).name == self.pool
+        ]
+
+    def ensure_models(self, timeline: StartupTimeline) -> None:
+        """Verify this pool's warm models on the Volume, re-fetching bad blobs."""
         from loguru import logger
 
-        subprocess.Popen(["ollama", "serve"])
-        wait_for_ollama(timeout=180)
-        # `ollama show` validates the model is loadable (manifest + blobs intact),
-        # unlike `ollama list` which only reads the manifest. Re-pull cleanly if broken.
-        show = subprocess.run(["ollama", "show", DEFAULT_MODEL], capture_output=True)
-        if show.returncode != 0:
-            logger.warning(f"Model {DEFAULT_MODEL} missing or corrupt, (re)pulling...")
-            subprocess.run(["ollama", "rm", DEFAULT_MODEL], capture_output=True)
-            subprocess.run(["ollama", "pull", DEFAULT_MODEL], check=True)
+        cache = VerificationCache.for_root(MODELS_DIR)
+        reports = {}
+        for model in self.warm_models():
+            with timeline.phase("verify_model", model=model) as detail:
+                reports[model] = verify_model(MODELS_DIR, model, cache)
+                detail.update(reports[model].as_dict())
+        for model, report in reports.items():
+            if report.ok:
+                continue
+            with timeline.phase("repair", model=model):
+                logger.warning(
+                    f"Model {model} missing or corrupt "
+                    f"(missing={len(report.missing)}, corrupt={len(report.corrupt)}), "
+                    "re-fetching bad blobs..."
+                )
+                remove_blobs(MODELS_DIR, report.corrupt)
+                only = (
+                    {layer.digest for layer in report.bad}
+                    if report.manifest_found
+                    else None
+                )
+                pull_into_volume(model, only=only)
+                repaired = verify_model(MODELS_DIR, model, cache)
+            if not repaired.ok:
+                # Don't warm it, and don't leave corrupt bytes to be committed.
+                logger.error(
+                    f"Model {model} still bad after repair, skipping it: "
+                    f"{repaired.as_dict()}"
+                )
+                remove_blobs(MODELS_DIR, repaired.corrupt)
+                self.broken_models = self.broken_models | {model}
+        if cache.dirty or not all(r.ok for r in reports.values()):
+            cache.save()
             volume.commit()
-        warmup_model()
+
+    @modal.enter(snap=True)
+    def prepare(self):
+        """CPU-side startup, in the memory snapshot when ``OLLAMA_MEMORY_SNAPSHOT=1``.
+
+        Imports the libraries the container uses and verifies (and if needed
+        repairs) the warm models on the Volume. Nothing here touches the GPU or
+        the page cache, neither of which survives a restore.
+        """
+        import httpx  # noqa: F401
+        from loguru import logger  # noqa: F401
+
+        self.prepare_timeline = StartupTimeline()
+        self.ensure_models(self.prepare_timeline)
+        self.prepared_at = time.time()
+
+    @modal.enter(snap=False)
+    def start_and_load(self):
+        """Start (or reattach to) ``ollama serve`` and load the warm models into VRAM.
+
+        Reading the warm models' blobs into the page cache overlaps with
+        ``ollama serve`` booting. Per-phase wall times end up in
+        ``self.startup`` (see ``startup_report``).
+        """
+        from loguru import logger
+
+        timeline = StartupTimeline()
+        self.startup = timeline
+        proc = getattr(self, "ollama_proc", None)
+        if proc is None or proc.poll() is not None:
+            with timeline.phase("spawn_server"):
+                self.ollama_proc = subprocess.Popen(["ollama", "serve"])
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            ready = pool.submit(
+                timeline.timed,
+                "wait_ready",
+                wait_for_ollama,
+                timeout=180,
+                proc=self.ollama_proc,
+            )
+            models = self.warm_models()
+            blobs = {model: model_blob_paths(MODELS_DIR, model) for model in models}
+            if any(paths is None for paths in blobs.values()):
+                # The Volume changed since the snapshot was taken.
+                self.ensure_models(timeline)
+                models = self.warm_models()
+                blobs = {model: model_blob_paths(MODELS_DIR, model) for model in models}
+            with timeline.phase("prefetch") as detail:
+                detail.update(
+                    prefetch_files(
+                        p for paths in blobs.values() for p in paths or ()
+                    ).as_dict()
+                )
+            logger.info(f"Prefetched warm models into the page cache: {detail}")
+            ready.result()
+
+        def warm(model: str) -> None:
+            with timeline.phase("warmup", model=model) as detail:
+                detail.update(warmup_model(model))
+
+        # Loads are concurrent; Ollama reads each model's weights from the page cache.
+        with ThreadPoolExecutor(max_workers=max(1, len(models))) as pool:
+            list(pool.map(warm, models))
+        logger.info(f"Startup timeline: {timeline.to_json()}")
+
+    @modal.method()
+    def startup_report(self) -> dict:
+        """Per-phase wall times of this container's cold start.
+
+        ``prepare`` ran once before the snapshot (or just now, without snapshots);
+        ``snapshot_age_seconds`` is large when this container was restored.
+        """
+        return {
+            "prepare": self.prepare_timeline.as_dict(),
+            "start": self.startup.as_dict(),
+            "snapshot_age_seconds": round(time.time() - self.prepared_at, 3),
+            "memory_snapshot": MEMORY_SNAPSHOT,
+        }
 
     @modal.method()
     def pull_model(self, model_name: str = DEFAULT_MODEL):
-        wait_for_ollama()
-        subprocess.run(["echo", "pulling model", model_name])
-        subprocess.run(["ollama", "pull", model_name], check=True)
-        volume.commit()
+        """Pull one model; prefer the ``pull_models`` function, which needs no GPU."""
+        return pull_models.local(model_name)
 
     @modal.method()
     def list(self):
-        """List all available models."""
-        wait_for_ollama()
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        print(result.stdout)
-        if result.stderr:
-            print(result.stderr)
-        return result.stdout
+        """List all available models.
+
+        Prefer the ``list_models`` function, which needs no GPU.
+        """
+        return list_models.local()
 
     @modal.web_server(11434, startup_timeout=600)
     def server(self):
         pass
+
+
+@app.cls(
+    volumes={MODELS_DIR: volume},
+    gpu="A10G",
+    scaledown_window=120,
+    timeout=3600,
+    max_containers=POOL_MAX_CONTAINERS,
+    enable_memory_snapshot=MEMORY_SNAPSHOT,
+)
+@modal.concurrent(max_inputs=OLLAMA_NUM_PARALLEL)
+class OllamaService(_OllamaServer):
+    """A10G pool; also the pool for models that aren't on the Volume yet."""
+
+
+@app.cls(
+    volumes={MODELS_DIR: volume},
+    gpu="H100",
+    scaledown_window=120,
+    timeout=3600,
+    max_containers=POOL_MAX_CONTAINERS,
+    enable_memory_snapshot=MEMORY_SNAPSHOT,
+)
+@modal.concurrent(max_inputs=OLLAMA_NUM_PARALLEL)
+class OllamaServiceH100(_OllamaServer):
+    """H100 pool for models whose weights + KV cache don't fit on an A10G."""
+
+    pool = "h100"
+
+
+@app.function(volumes={MODELS_DIR: volume}, timeout=3600)
+def pull_models(
+    model_names: str = DEFAULT_MODEL, gc: bool = False, dry_run: bool = False
+) -> dict:
+    """Pull a comma-separated list of models into the weights Volume on a CPU container.
+
+    Blobs shared between the models, or already on the Volume, are not
+    downloaded again; up to four blobs download at once. Every missing blob is
+    leased (``blob_leases``) until the single ``volume.commit()`` at the end, so
+    a concurrent pull of the same blob waits and then finds it committed.
+
+    With ``gc`` set, blobs no manifest references are deleted afterwards
+    (``dry_run`` only reports them), e.g.
+    ``modal run endpoint.py::pull_models --model-names gemma4:12b,llama3.2 --gc``.
+    """
+    import httpx
+    from loguru import logger
+
+    models = [m.strip() for m in model_names.split(",") if m.strip()]
+    puller = RegistryPuller(MODELS_DIR, progress=progress_logger())
+    plan = puller.plan(models) if models else None
+    summary: dict = {}
+    with blob_leases(plan.missing if plan else ()) as waited:
+        if plan is not None:
+            if waited:
+                # Another container pulled some of these blobs while we waited.
+                volume.reload()
+                plan = puller.plan(models)
+            logger.info(f"Pull plan: {plan.as_dict()}")
+            for attempt in range(1, 4):
+                try:
+                    summary["pull"] = puller.pull_many(plan).as_dict()
+                    break
+                except httpx.HTTPError as exc:
+                    if attempt == 3:
+                        raise
+                    logger.warning(f"Pull failed ({exc}), resuming...")
+                    plan = puller.plan(models)
+            logger.info(f"Pulled {models}: {summary['pull']}")
+        if gc:
+            summary["gc"] = collect_garbage(MODELS_DIR, dry_run=dry_run).as_dict()
+            logger.info(f"Garbage collection: {summary['gc']}")
+        volume.commit()
+    return summary
+
+
+_catalog = None
+
+
+@app.function(volumes={MODELS_DIR: volume}, scaledown_window=300)
+def list_models() -> list[dict]:
+    """Every model on the weights Volume, read from the manifests on a CPU container.
+
+    Returns name, digest, size, family, parameter size, quantization, layer
+    digests and ``modified_at`` for each model. The index (``.catalog.json`` on
+    the Volume, and in memory while the container stays warm) is only
+    re-read for manifests that changed since the last call.
+    """
+    from loguru import logger
+
+    from ollama_modal.catalog import Catalog
+
+    global _catalog
+    start = time.perf_counter()
+    if _catalog is None:
+        _catalog = Catalog(MODELS_DIR)
+    else:
+        volume.reload()
+    models = [info.as_dict() for info in _catalog.refresh()]
+    if _catalog.dirty:
+        _catalog.save()
+        volume.commit()
+    logger.info(
+        f"Listed {len(models)} models in {(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+    for model in models:
+        print(
+            f"{model['name']:<40} {model['digest'][7:19]}  "
+            f"{model['size'] / 1e9:6.1f} GB  {model['modified_at']}"
+        )
+    return models
+
+
+POOL_CLASSES = {"a10g": OllamaService, "h100": OllamaServiceH100}
+
+# Router knobs read from the deploying shell's environment (name -> default).
+ROUTER_SETTINGS = {
+    "ROUTER_RESPONSE_CACHE": "0",
+    "ROUTER_CACHE_MEMORY_BYTES": str(256 * 1024**2),
+    "ROUTER_EMBED_WINDOW_MS": "5",
+    "ROUTER_EMBED_MAX_BATCH": "64",
+    # JSON {pool: [replica base URLs]}; pools listed here get prefix-affinity routing.
+    "ROUTER_REPLICAS": "{}",
+    "ROUTER_PREFIX_AFFINITY": "1",
+    "ROUTER_MAX_QUEUE": "64",
+    "ROUTER_MAX_WAIT_SECONDS": "30",
+    # VRAM residency management for the replicas in ROUTER_REPLICAS; pinned
+    # models are never evicted.
+    "ROUTER_RESIDENCY": "0",
+    "ROUTER_PINNED_MODELS": DEFAULT_MODEL,
+    "ROUTER_EVICTION_POLICY": "lru",
+    # Gateway: JSON {logical model: {backend: backend's model name}}; other
+    # models go to the Ollama router unchanged.
+    "GATEWAY_MODELS": (
+        '{"qwen3.6-27b": {"vllm": "qwen3.6-27b", "ollama": "qwen3.6:27b"}}'
+    ),
+    "GATEWAY_VLLM_APP": "qwen36-vllm-service",
+    # Hedging: "1" hedges every streaming request, "0" only those sending
+    # `x-hedge: 1`; at most GATEWAY_HEDGE_MAX_EXTRA of requests are duplicated.
+    "GATEWAY_HEDGE": "0",
+    "GATEWAY_HEDGE_MAX_EXTRA": "0.1",
+}
+
+
+# Deploy-time settings, e.g. `ROUTER_RESPONSE_CACHE=1 modal deploy endpoint.py`.
+router_settings = modal.Secret.from_dict(
+    {name: os.environ.get(name, default) for name, default in ROUTER_SETTINGS.items()}
+)
+
+
+@app.function(
+    volumes={MODELS_DIR: volume, RESPONSE_CACHE_DIR: response_cache_volume},
+    secrets=[router_settings],
+    scaledown_window=300,
+    timeout=3600,
+    # Admission slots, queues, coalescing and residency state live in this
+    # container's memory; a second container would double every model's limit.
+    max_containers=1,
+)
+@modal.concurrent(max_inputs=200)
+@modal.asgi_app()
+def router():
+    """Single front endpoint: sends `/api/*` and `/v1/*` to the cheapest pool that fits.
+
+    Set ``ROUTER_RESPONSE_CACHE=1`` to cache every deterministic request; otherwise
+    clients opt in per request with ``x-response-cache: 1``. Embedding calls are
+    micro-batched (``ROUTER_EMBED_WINDOW_MS``, ``ROUTER_EMBED_MAX_BATCH``). Pools with
+    several replicas in ``ROUTER_REPLICAS`` keep each conversation on one replica.
+    Each model gets ``OLLAMA_NUM_PARALLEL * POOL_MAX_CONTAINERS`` slots and a bounded
+    queue (``ROUTER_MAX_QUEUE``, ``ROUTER_MAX_WAIT_SECONDS``); see ``/router/queue``.
+    With ``ROUTER_RESIDENCY=1`` each replica's loaded models are kept within its
+    GPU's VRAM (``ROUTER_PINNED_MODELS``, ``ROUTER_EVICTION_POLICY``).
+    """
+    import json
+    import threading
+
+    import httpx
+    from loguru import logger
+
+    from ollama_modal.admission import AdmissionController
+    from ollama_modal.affinity import PrefixAffinity
+    from ollama_modal.cache import ResponseCache
+    from ollama_modal.coalesce import Coalescer
+    from ollama_modal.embed import EmbeddingBatcher
+    from ollama_modal.manifests import manifest_digest
+    from ollama_modal.metrics import InferenceMetrics
+    from ollama_modal.proxy import UpstreamProxy, create_router_app
+    from ollama_modal.residency import OllamaControl, ResidencyManager
+
+    table = RoutingTable(MODELS_DIR, POOLS, num_parallel=OLLAMA_NUM_PARALLEL)
+    urls: dict[str, str] = {}
+    last_reload = 0.0
+
+    def choose_upstream(model: str | None, num_ctx: int | None) -> tuple[str, str]:
+        nonlocal last_reload
+        if model and table.size(model) is None and time.time() - last_reload > 30:
+            # The model may have been pulled since this container mounted the Volume.
+            last_reload = time.time()
+            volume.reload()
+        pool = table.route(model, num_ctx)
+        if pool.name not in urls:
+            urls[pool.name] = POOL_CLASSES[pool.name]().server.get_web_url()
+        logger.info(f"{model} (num_ctx={num_ctx}) -> {pool.gpu}")
+        return pool.name, urls[pool.name]
+
+    cache_dirty = threading.Event()
+
+    def commit_cache() -> None:
+        # Batch disk-tier writes into one Volume commit every 30s.
+        while True:
+            time.sleep(30)
+            if cache_dirty.is_set():
+                cache_dirty.clear()
+                response_cache_volume.commit()
+
+    threading.Thread(target=commit_cache, daemon=True).start()
+
+    def reload_models() -> None:
+        # Re-pulls replace a model's manifest; without a reload the cache keys
+        # keep the old digest and never invalidate.
+        nonlocal last_reload
+        while True:
+            time.sleep(30)
+            try:
+                volume.reload()
+                last_reload = time.time()
+            except Exception as exc:
+                logger.warning(f"models Volume reload failed: {exc}")
+
+    threading.Thread(target=reload_models, daemon=True).start()
+    cache = ResponseCache(
+        memory_bytes=int(os.environ["ROUTER_CACHE_MEMORY_BYTES"]),
+        disk_root=RESPONSE_CACHE_DIR,
+        on_disk_write=cache_dirty.set,
+    )
+
+    proxy = UpstreamProxy()
+    embedder = EmbeddingBatcher(
+        lambda upstream, payload: proxy.post_json(upstream, "api/embed", payload),
+        window=float(os.environ["ROUTER_EMBED_WINDOW_MS"]) / 1000,
+        max_batch=int(os.environ["ROUTER_EMBED_MAX_BATCH"]),
+    )
+
+    # Modal load-balances across a class's containers itself, so affinity needs
+    # separately addressable replicas (e.g. the same app deployed under several names).
+    replicas_by_pool = json.loads(os.environ["ROUTER_REPLICAS"])
+    affinity = {
+        pool: PrefixAffinity(
+            replicas, enabled=os.environ["ROUTER_PREFIX_AFFINITY"] == "1"
+        )
+        for pool, replicas in replicas_by_pool.items()
+    }
+
+    def probe_replicas() -> None:
+        # Replicas marked down after a failed request rejoin the ring once they
+        # answer again; healthy ones aren't probed, so they can still scale down.
+        while True:
+            time.sleep(15)
+            for pool_affinity in affinity.values():
+                for replica in pool_affinity.down:
+                    try:
+                        httpx.get(
+                            f"{replica}/api/version", timeout=5
+                        ).raise_for_status()
+                    except httpx.HTTPError:
+                        continue
+                    pool_affinity.mark_up(replica)
+
+    threading.Thread(target=probe_replicas, daemon=True).start()
+
+    admission = AdmissionController(
+        limit=OLLAMA_NUM_PARALLEL * POOL_MAX_CONTAINERS,
+        max_queue=int(os.environ["ROUTER_MAX_QUEUE"]),
+        max_wait=float(os.environ["ROUTER_MAX_WAIT_SECONDS"]),
+    )
+
+    def scale_on_queue() -> None:
+        # Ask Modal for warm buffer containers while requests are queueing, so
+        # the backlog drains instead of waiting on cold starts one at a time.
+        buffers: dict[str, int] = {}
+        while True:
+            time.sleep(5)
+            depth: dict[str, int] = {}
+            for model, q in admission.stats().items():
+                pool = table.route(model).name
+                depth[pool] = depth.get(pool, 0) + q["queue_depth"]
+            for pool, cls in POOL_CLASSES.items():
+                wanted = -(-depth.get(pool, 0) // OLLAMA_NUM_PARALLEL)
+                if buffers.get(pool, 0) != wanted:
+                    try:
+                        cls().update_autoscaler(buffer_containers=wanted)
+                    except Exception as exc:
+                        logger.warning(f"update_autoscaler({pool}) failed: {exc}")
+                        continue
+                    buffers[pool] = wanted
+                    logger.info(
+                        f"{pool}: queue depth {depth.get(pool, 0)}, "
+                        f"buffer_containers={wanted}"
+                    )
+
+    threading.Thread(target=scale_on_queue, daemon=True).start()
+
+    pools = {pool.name: pool for pool in POOLS}
+    pinned = [m for m in os.environ["ROUTER_PINNED_MODELS"].split(",") if m]
+    managers: dict[str, ResidencyManager] = {}
+
+    def footprint(model: str) -> int | None:
+        size = table.size(model)
+        if size is None:
+            return None
+        return size.footprint(table.default_num_ctx, OLLAMA_NUM_PARALLEL).total_bytes
+
+    # Only replicas listed in ROUTER_REPLICAS are single servers. A pool's own
+    # URL load-balances over its containers, so /api/ps, unloads and preloads
+    # would each land on a random container (and could wake an idle pool).
+    replica_urls = {url for replicas in replicas_by_pool.values() for url in replicas}
+
+    def residency(pool: str, upstream: str) -> ResidencyManager | None:
+        if os.environ["ROUTER_RESIDENCY"] != "1" or upstream not in replica_urls:
+            return None
+        if upstream not in managers:
+            managers[upstream] = ResidencyManager(
+                budget_bytes=int(pools[pool].vram_bytes * 0.92),
+                footprint=footprint,
+                control=OllamaControl(proxy.client, upstream),
+                pinned=pinned,
+                policy=os.environ["ROUTER_EVICTION_POLICY"],
+            )
+        return managers[upstream]
+
+    return create_router_app(
+        choose_upstream,
+        table.as_dict,
+        proxy=proxy,
+        coalescer=Coalescer(),
+        cache=cache,
+        model_digest=lambda model: manifest_digest(MODELS_DIR, model),
+        cache_by_default=os.environ.get("ROUTER_RESPONSE_CACHE") == "1",
+        embedder=embedder,
+        affinity=affinity,
+        admission=admission,
+        metrics=InferenceMetrics(),
+        residency=residency,
+    )
+
+
+@app.function(
+    secrets=[router_settings],
+    scaledown_window=300,
+    timeout=3600,
+    # Queue depth is counted from the requests passing through this container;
+    # with a second container each would see only part of the load.
+    max_containers=1,
+)
+@modal.concurrent(max_inputs=200)
+@modal.asgi_app()
+def gateway():
+    """One endpoint for both engines: the Ollama ``router`` and the vLLM deployment.
+
+    Each request for a model in ``GATEWAY_MODELS`` goes to whichever backend is
+    expected to answer first, given its in-flight requests, observed TTFT and
+    tokens/s, and whether it served the model recently (warm). Cold, saturated
+    or failing backends fall back to the other one. Clients may use either
+    the Ollama or the OpenAI API; ``GET /gateway/backends`` shows live state.
+
+    Streaming requests with no first token by the rolling p95 are hedged to
+    the next backend (``x-hedge: 1``, or ``GATEWAY_HEDGE=1`` for all).
+    """
+    import json
+
+    from loguru import logger
+
+    from ollama_modal.gateway import Gateway, OllamaBackend, VllmBackend
+    from ollama_modal.hedge import HedgePolicy
+    from ollama_modal.proxy import create_gateway_app
+
+    mapping = json.loads(os.environ["GATEWAY_MODELS"])
+    ollama_models = {
+        "*": "*",
+        **{m: names["ollama"] for m, names in mapping.items() if "ollama" in names},
+    }
+    backends = [
+        OllamaBackend(
+            "ollama",
+            router.get_web_url(),
+            ollama_models,
+            concurrency=OLLAMA_NUM_PARALLEL * POOL_MAX_CONTAINERS,
+        )
+    ]
+    try:
+        vllm_cls = modal.Cls.from_name(os.environ["GATEWAY_VLLM_APP"], "VllmServer")
+        vllm_url = vllm_cls().serve.get_web_url()
+    except modal.exception.NotFoundError:
+        logger.warning(
+            f"{os.environ['GATEWAY_VLLM_APP']} isn't deployed; serving Ollama only"
+        )
+    else:
+        vllm_models = {
+            m: names["vllm"] for m, names in mapping.items() if "vllm" in names
+        }
+        # vLLM first: it wins ties, e.g. before either backend has been measured.
+        backends.insert(0, VllmBackend("vllm", vllm_url, vllm_models))
+    return create_gateway_app(
+        Gateway(backends),
+        hedge=HedgePolicy(max_extra=float(os.environ["GATEWAY_HEDGE_MAX_EXTRA"])),
+        hedge_by_default=os.environ["GATEWAY_HEDGE"] == "1",
+    )
@@ -0,0 +1,5 @@
+"""Helpers shared by the Modal Ollama and vLLM deployments.
+
+Everything in this package is importable without Modal so it can be mounted into
+the container images (``add_local_python_source``) and unit tested locally.
+"""
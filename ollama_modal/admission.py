@@ -0,0 +1,163 @@
+"""Per-model admission control with a bounded FIFO queue in front of Ollama.
+
+Each model gets ``limit`` concurrent slots (match it to ``OLLAMA_NUM_PARALLEL``
+times the containers that can serve the model). Requests beyond that wait in
+a FIFO of at most ``max_queue`` entries for up to ``max_wait`` seconds.
+A full queue is rejected immediately with 429; a request whose wait runs out
+gets 503. Both carry a ``Retry-After`` estimated from recent service times, so
+clients back off instead of stacking up inside Ollama where TTFT grows without
+bound.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+class Rejected(Exception):
+    """The request was not admitted.
+
+    ``status_code`` is 429 when the queue is full, 503 when the wait expired.
+    """
+
+    def __init__(self, status_code: int, retry_after: int, reason: str) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+@dataclass
+class _ModelQueue:
+    limit: int
+    in_flight: int = 0
+    waiters: deque[asyncio.Future] = field(default_factory=deque)
+    admitted: int = 0
+    rejected_full: int = 0
+    rejected_timeout: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    # Exponentially weighted mean time a slot stays busy; drives Retry-After.
+    service_seconds: float = 5.0
+
+
+class AdmissionController:
+    """Slots and a bounded FIFO per model.
+
+    :param limit: Concurrent requests per model, or a callable ``model -> limit``
+    :param max_queue: Waiting requests per model before new ones get 429
+    :param max_wait: Seconds a request may wait for a slot before it gets 503
+    """
+
+    def __init__(
+        self,
+        limit: int | Callable[[str], int] = 4,
+        max_queue: int = 64,
+        max_wait: float = 30.0,
+    ) -> None:
+        self._limit = limit if callable(limit) else (lambda _model: limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._queues: dict[str, _ModelQueue] = {}
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(limit=max(1, self._limit(model)))
+        return queue
+
+    def _drop_if_idle(self, model: str, queue: _ModelQueue) -> None:
+        """Forget an idle model's queue, so arbitrary model names don't pile up."""
+        if queue.in_flight == 0 and not queue.waiters:
+            self._queues.pop(model, None)
+
+    def _retry_after(self, queue: _ModelQueue) -> int:
+        """Seconds until a request joining now would likely get a slot."""
+        rounds = (len(queue.waiters) + 1) / queue.limit
+        return max(1, math.ceil(rounds * queue.service_seconds))
+
+    async def acquire(self, model: str) -> float:
+        """Wait for a slot; returns the seconds spent queued.
+
+        :raises Rejected: If the queue is full or the wait exceeds ``max_wait``
+        """
+        queue = self._queue(model)
+        if queue.in_flight < queue.limit and not queue.waiters:
+            queue.in_flight += 1
+            queue.admitted += 1
+            return 0.0
+        if len(queue.waiters) >= self.max_queue:
+            queue.rejected_full += 1
+            raise Rejected(429, self._retry_after(queue), f"queue for {model} is full")
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        queue.waiters.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                queue.waiters.remove(future)
+                queue.rejected_timeout += 1
+                self._drop_if_idle(model, queue)
+                raise Rejected(
+                    503,
+                    self._retry_after(queue),
+                    f"no slot for {model} within {self.max_wait}s",
+                ) from None
+            # The slot was handed over just as the wait expired; keep it.
+        except BaseException:
+            # Caller went away while queued: give back a slot it may have just received.
+            if future.done() and not future.cancelled():
+                self.release(model)
+            else:
+                future.cancel()
+                if future in queue.waiters:
+                    queue.waiters.remove(future)
+                self._drop_if_idle(model, queue)
+            raise
+        waited = time.perf_counter() - start
+        queue.admitted += 1
+        queue.wait_seconds_total += waited
+        queue.wait_seconds_max = max(queue.wait_seconds_max, waited)
+        return waited
+
+    def release(self, model: str, service_seconds: float | None = None) -> None:
+        """Free a slot, handing it straight to the oldest waiter if there is one."""
+        queue = self._queue(model)
+        if service_seconds is not None:
+            queue.service_seconds = 0.8 * queue.service_seconds + 0.2 * service_seconds
+        while queue.waiters:
+            future = queue.waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # slot transfers; in_flight is unchanged
+                return
+        queue.in_flight = max(0, queue.in_flight - 1)
+        self._drop_if_idle(model, queue)
+
+    def queued(self) -> int:
+        return sum(len(q.waiters) for q in self._queues.values())
+
+    def stats(self) -> dict[str, Any]:
+        """Per model with requests in flight or queued; idle models are dropped."""
+        return {
+            model: {
+                "limit": q.limit,
+                "in_flight": q.in_flight,
+                "queue_depth": len(q.waiters),
+                "admitted": q.admitted,
+                "rejected_full": q.rejected_full,
+                "rejected_timeout": q.rejected_timeout,
+                "mean_wait_seconds": (
+                    round(q.wait_seconds_total / q.admitted, 4) if q.admitted else 0.0
+                ),
+                "max_wait_seconds": round(q.wait_seconds_max, 4),
+                "service_seconds_ewma": round(q.service_seconds, 3),
+            }
+            for model, q in self._queues.items()
+        }
@@ -0,0 +1,210 @@
+"""Send every turn of a conversation to the replica that already holds its KV prefix.
+
+A conversation is identified by the hash of its leading messages (system
+prompt(s) plus the first user turn), which stays the same as turns are
+appended. Keys are placed on a consistent-hash ring with virtual nodes, and
+the ring is walked with bounded loads (Mirrokni et al., 2018): a replica is
+skipped if it already carries more than ``(1 + epsilon)`` times the average
+in-flight load, so one hot conversation can't pile onto a single container.
+Adding or removing a replica only moves the keys that hashed to it, so a
+replica marked down after a failed request (and back up once a health check
+passes) only moves its own conversations.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any
+
+CHAT_PATHS = ("api/chat", "v1/chat/completions")
+GENERATE_PATHS = ("api/generate", "v1/completions")
+GENERATE_PREFIX_CHARS = 2048
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+def prefix_key(path: str, payload: dict[str, Any] | None) -> str | None:
+    """Stable per-conversation key, or ``None`` when there's no reusable prefix."""
+    if not payload:
+        return None
+    path = path.strip("/")
+    model = payload.get("model", "")
+    if path in CHAT_PATHS:
+        messages = payload.get("messages") or []
+        head = []
+        for message in messages:
+            head.append(message)
+            if isinstance(message, dict) and message.get("role") == "user":
+                break
+        if not head:
+            return None
+        leading = json.dumps([model, head], sort_keys=True, ensure_ascii=False)
+    elif path in GENERATE_PATHS:
+        prompt = payload.get("prompt")
+        if not isinstance(prompt, str):
+            return None
+        leading = json.dumps(
+            [model, payload.get("system", ""), prompt[:GENERATE_PREFIX_CHARS]]
+        )
+    else:
+        return None
+    return hashlib.sha256(leading.encode()).hexdigest()
+
+
+class PrefixAffinity:
+    """Consistent hashing with bounded loads over a set of replica URLs.
+
+    :param replicas: Upstream base URLs, one per addressable replica
+    :param epsilon: Load slack; a replica takes at most ``ceil((1 + epsilon) * avg)``
+        in-flight requests
+    :param vnodes: Virtual nodes per replica on the ring
+    :param enabled: With ``False`` requests go to the least-loaded replica instead,
+        but hit statistics are still recorded so the two modes can be compared
+    """
+
+    def __init__(
+        self,
+        replicas: list[str],
+        epsilon: float = 0.25,
+        vnodes: int = 64,
+        enabled: bool = True,
+        remembered_keys: int = 100_000,
+    ) -> None:
+        self.epsilon = epsilon
+        self.vnodes = vnodes
+        self.enabled = enabled
+        self.remembered_keys = remembered_keys
+        self._lock = threading.Lock()
+        self._ring: list[tuple[int, str]] = []
+        self._load: dict[str, int] = {}
+        self._down: set[str] = set()
+        self._last_replica: OrderedDict[str, str] = OrderedDict()
+        self.counters = {"requests": 0, "keyed": 0, "prefix_hits": 0, "spills": 0}
+        self._ttfb = {"hit": [0, 0.0], "miss": [0, 0.0]}
+        self.set_replicas(replicas)
+
+    def set_replicas(self, replicas: list[str]) -> None:
+        """Rebuild the ring; in-flight counts of surviving replicas are kept."""
+        with self._lock:
+            self._load = {r: self._load.get(r, 0) for r in replicas}
+            self._down &= set(replicas)
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._ring = sorted(
+            (_hash(f"{replica}#{i}"), replica)
+            for replica in self._live()
+            for i in range(self.vnodes)
+        )
+
+    def mark_down(self, replica: str) -> None:
+        """Take a replica off the ring, e.g. after a connection error or 5xx."""
+        with self._lock:
+            if replica in self._load and replica not in self._down:
+                self._down.add(replica)
+                self._rebuild()
+
+    def mark_up(self, replica: str) -> None:
+        """Put a replica marked down back on the ring once it answers again."""
+        with self._lock:
+            if replica in self._down:
+                self._down.discard(replica)
+                self._rebuild()
+
+    @property
+    def replicas(self) -> list[str]:
+        return list(self._load)
+
+    @property
+    def down(self) -> list[str]:
+        with self._lock:
+            return sorted(self._down)
+
+    def _live(self) -> list[str]:
+        # With every replica down, keep trying them all rather than failing outright.
+        return [r for r in self._load if r not in self._down] or list(self._load)
+
+    def _capacity(self, live: list[str]) -> int:
+        total = sum(self._load[r] for r in live) + 1
+        return math.ceil((1 + self.epsilon) * total / len(live))
+
+    def _walk(self, key: str, live: list[str]) -> str:
+        capacity = self._capacity(live)
+        start = bisect.bisect(self._ring, (_hash(key), ""))
+        first = None
+        for offset in range(len(self._ring)):
+            replica = self._ring[(start + offset) % len(self._ring)][1]
+            first = first or replica
+            if self._load[replica] < capacity:
+                if replica != first:
+                    self.counters["spills"] += 1
+                return replica
+        return first
+
+    def acquire(self, key: str | None) -> tuple[str, bool]:
+        """Pick a replica for a request and count it in flight.
+
+        :return: ``(replica, prefix_hit)``; ``prefix_hit`` means the previous turn
+            of this conversation went to the same replica
+        """
+        with self._lock:
+            if not self._load:
+                raise RuntimeError("no replicas configured")
+            self.counters["requests"] += 1
+            live = self._live()
+            if key is not None and self.enabled:
+                replica = self._walk(key, live)
+            else:
+                replica = min(live, key=self._load.get)
+            hit = False
+            if key is not None:
+                self.counters["keyed"] += 1
+                hit = self._last_replica.get(key) == replica
+                self.counters["prefix_hits"] += hit
+                self._last_replica[key] = replica
+                self._last_replica.move_to_end(key)
+                while len(self._last_replica) > self.remembered_keys:
+                    self._last_replica.popitem(last=False)
+            self._load[replica] += 1
+            return replica, hit
+
+    def release(
+        self, replica: str, hit: bool | None = None, ttfb: float | None = None
+    ) -> None:
+        """Mark a request finished.
+
+        ``ttfb`` (seconds to first byte) feeds the hit/miss comparison.
+        """
+        with self._lock:
+            if replica in self._load:
+                self._load[replica] = max(0, self._load[replica] - 1)
+            if hit is not None and ttfb is not None:
+                bucket = self._ttfb["hit" if hit else "miss"]
+                bucket[0] += 1
+                bucket[1] += ttfb
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            keyed = self.counters["keyed"]
+            return {
+                **self.counters,
+                "enabled": self.enabled,
+                "prefix_hit_rate": (
+                    round(self.counters["prefix_hits"] / keyed, 4) if keyed else 0.0
+                ),
+                "in_flight": dict(self._load),
+                "down": sorted(self._down),
+                "mean_ttfb_seconds": {
+                    name: round(total / n, 4) if n else None
+                    for name, (n, total) in self._ttfb.items()
+                },
+            }
@@ -0,0 +1,373 @@
+"""Offline search over vLLM serving parameters for the best goodput under an SLO.
+
+A backend runs one configuration against a workload at each concurrency
+level and returns per-request samples. Each (configuration, level) is scored
+by goodput: completed requests per second that met the TTFT and inter-token
+latency SLO. A configuration scores its best level. The winner is written as
+a profile that ``VllmServer`` loads at start.
+
+Backends are pluggable. ``SimulatedBackend`` models a continuous-batching
+engine analytically, so the search and scoring can be tested without a GPU.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+
+@dataclass(frozen=True)
+class Workload:
+    """Requests of a fixed shape, ``requests`` of them at each concurrency level."""
+
+    prompt_tokens: int = 1024
+    output_tokens: int = 256
+    concurrency: tuple[int, ...] = (1, 2, 4, 8, 16, 32)
+    requests: int = 64
+
+
+@dataclass(frozen=True)
+class Slo:
+    """Per-request targets in seconds.
+
+    A request counts towards goodput only if it meets both; ``None`` disables
+    a target.
+    """
+
+    ttft: float | None = 2.0
+    itl: float | None = 0.1
+
+    def met(self, sample: "Sample") -> bool:
+        if not sample.ok:
+            return False
+        if self.ttft is not None and sample.ttft > self.ttft:
+            return False
+        return self.itl is None or sample.itl <= self.itl
+
+
+@dataclass(frozen=True)
+class Sample:
+    """One request: TTFT, mean inter-token latency, end to end, tokens out."""
+
+    ttft: float
+    itl: float
+    e2e: float
+    output_tokens: int
+    ok: bool = True
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    samples: list[Sample]
+    seconds: float
+
+    def percentile(self, attr: str, q: float) -> float | None:
+        values = sorted(getattr(s, attr) for s in self.samples if s.ok)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def goodput(self, slo: Slo) -> float:
+        """Requests per second that completed within the SLO."""
+        good = sum(1 for s in self.samples if slo.met(s))
+        return good / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self, slo: Slo) -> dict[str, Any]:
+        ok = [s for s in self.samples if s.ok]
+        return {
+            "concurrency": self.concurrency,
+            "requests": len(self.samples),
+            "errors": len(self.samples) - len(ok),
+            "ttft_p95": self.percentile("ttft", 0.95),
+            "itl_p95": self.percentile("itl", 0.95),
+            "e2e_p50": self.percentile("e2e", 0.5),
+            "output_tokens_per_second": (
+                round(sum(s.output_tokens for s in ok) / self.seconds, 2)
+                if self.seconds > 0
+                else 0.0
+            ),
+            "goodput": round(self.goodput(slo), 4),
+        }
+
+
+class NoViableConfig(RuntimeError):
+    """No configuration in the grid started and met the SLO; ``trials`` says why."""
+
+    def __init__(self, trials: list["Trial"]) -> None:
+        super().__init__(f"none of {len(trials)} configurations met the SLO")
+        self.trials = trials
+
+
+class Backend(Protocol):
+    def run(self, params: dict[str, Any], workload: Workload) -> list[LevelResult]:
+        """Launch ``params``, run every concurrency level of ``workload``, shut down.
+
+        Raises if the configuration can't start (e.g. it doesn't fit in memory).
+        """
+        ...
+
+
+@dataclass
+class Trial:
+    params: dict[str, Any]
+    score: float = 0.0
+    best_concurrency: int | None = None
+    levels: list[dict[str, Any]] = field(default_factory=list)
+    error: str | None = None
+
+
+@dataclass
+class TuneResult:
+    best: Trial
+    trials: list[Trial]
+    workload: Workload
+    slo: Slo
+
+    def profile(self) -> dict[str, Any]:
+        """The reusable profile: winning parameters plus how they were chosen."""
+        return {
+            "params": self.best.params,
+            "goodput": self.best.score,
+            "best_concurrency": self.best.best_concurrency,
+            "slo": asdict(self.slo),
+            "workload": asdict(self.workload),
+            "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "trials": [asdict(t) for t in self.trials],
+        }
+
+
+def expand_grid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    """Every combination of the grid's values, in a stable order."""
+    keys = sorted(grid)
+    return [
+        dict(zip(keys, values))
+        for values in itertools.product(*(grid[k] for k in keys))
+    ]
+
+
+def tune(
+    backend: Backend, grid: dict[str, list[Any]], workload: Workload, slo: Slo
+) -> TuneResult:
+    """Run every configuration in ``grid`` and pick the one with the highest goodput.
+
+    Configurations that fail to launch score 0. Ties go to the configuration
+    listed first by ``expand_grid``.
+
+    :raises NoViableConfig: If every configuration failed or none served a
+        single request within the SLO; there is then no profile to write
+    """
+    trials = []
+    for params in expand_grid(grid):
+        trial = Trial(params)
+        try:
+            levels = backend.run(params, workload)
+        except Exception as exc:
+            trial.error = f"{type(exc).__name__}: {exc}"
+            trials.append(trial)
+            continue
+        trial.levels = [level.as_dict(slo) for level in levels]
+        for level in levels:
+            if level.goodput(slo) > trial.score:
+                trial.score = level.goodput(slo)
+                trial.best_concurrency = level.concurrency
+        trials.append(trial)
+    viable = [t for t in trials if t.error is None and t.score > 0]
+    if not viable:
+        raise NoViableConfig(trials)
+    best = max(viable, key=lambda t: t.score)
+    return TuneResult(best, trials, workload, slo)
+
+
+def write_profile(path: str | os.PathLike, result: TuneResult) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(result.profile(), indent=2))
+    os.replace(tmp, path)
+
+
+def load_profile(path: str | os.PathLike) -> dict[str, Any]:
+    """The tuned parameters in a profile, or ``{}`` if there is none."""
+    try:
+        return json.loads(Path(path).read_text())["params"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return {}
+
+
+def cli_args(params: dict[str, Any]) -> list[str]:
+    """``vllm serve`` flags for tuned parameters.
+
+    ``{"max_num_seqs": 8}`` becomes ``--max-num-seqs 8``.
+    """
+    args = []
+    for key, value in sorted(params.items()):
+        args += [f"--{key.replace('_', '-')}", str(value)]
+    return args
+
+
+class SimulatedBackend:
+    """Analytical continuous-batching engine for testing the search without a GPU.
+
+    A decode step over ``b`` sequences takes ``step_seconds * (1 + b * batch_cost)``,
+    and the other sequences' prefills stall it. A prompt is prefilled in
+    ``max_num_batched_tokens`` chunks, one per step. The KV cache is what
+    ``gpu_memory_utilization`` leaves after the weights. It caps how many
+    sequences run at once, and a ``max_model_len`` it can't hold fails to start.
+    Requests beyond the running batch wait for a slot.
+    """
+
+    def __init__(
+        self,
+        gpu_bytes: float = 48e9,
+        weights_bytes: float = 17e9,
+        kv_bytes_per_token: float = 128e3,
+        step_seconds: float = 0.02,
+        batch_cost: float = 0.04,
+        prefill_tokens_per_second: float = 8000.0,
+    ) -> None:
+        self.gpu_bytes = gpu_bytes
+        self.weights_bytes = weights_bytes
+        self.kv_bytes_per_token = kv_bytes_per_token
+        self.step_seconds = step_seconds
+        self.batch_cost = batch_cost
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+
+    def run(self, params: dict[str, Any], workload: Workload) -> list[LevelResult]:
+        max_num_seqs = int(params.get("max_num_seqs", 8))
+        budget = int(params.get("max_num_batched_tokens", 8192))
+        max_model_len = int(params.get("max_model_len", 32768))
+        utilization = float(params.get("gpu_memory_utilization", 0.9))
+        kv_tokens = (
+            self.gpu_bytes * utilization - self.weights_bytes
+        ) / self.kv_bytes_per_token
+        if kv_tokens < max_model_len:
+            raise MemoryError(
+                f"KV cache holds {int(kv_tokens)} tokens"
+                f" < max_model_len {max_model_len}"
+            )
+        resident = max(
+            1, int(kv_tokens // (workload.prompt_tokens + workload.output_tokens))
+        )
+        prefill = workload.prompt_tokens / self.prefill_tokens_per_second
+        chunks = -(-workload.prompt_tokens // budget)
+
+        results = []
+        for concurrency in workload.concurrency:
+            batch = min(concurrency, max_num_seqs, resident)
+            step = self.step_seconds * (1 + batch * self.batch_cost)
+            itl = step + (batch - 1) * prefill / workload.output_tokens
+            first_token = prefill + (chunks - 1) * step
+            service = first_token + itl * workload.output_tokens
+            samples = []
+            for i in range(workload.requests):
+                wait = service * ((i % concurrency) // batch)
+                ttft = wait + first_token
+                samples.append(
+                    Sample(
+                        ttft,
+                        itl,
+                        ttft + itl * workload.output_tokens,
+                        workload.output_tokens,
+                    )
+                )
+            seconds = (
+                service * -(-concurrency // batch) * workload.requests / concurrency
+            )
+            results.append(LevelResult(concurrency, samples, seconds))
+        return results
+
+
+async def openai_load_sweep(
+    url: str, model: str, workload: Workload
+) -> list[LevelResult]:
+    """Run ``workload`` against an OpenAI server, one concurrency level at a time.
+
+    Each request streams ``output_tokens`` tokens (``ignore_eos``) from a
+    unique ``prompt_tokens``-long prompt, so no prefix is cached between requests.
+    """
+    import asyncio
+
+    import httpx
+
+    from ollama_modal.warmup import make_prompt
+
+    async def one(client: httpx.AsyncClient, seed: int) -> Sample:
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": make_prompt(workload.prompt_tokens, seed)}
+            ],
+            "max_tokens": workload.output_tokens,
+            "ignore_eos": True,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            "chat_template_kwargs": {"enable_thinking": False},
+        }
+        start = time.perf_counter()
+        arrivals: list[float] = []
+        tokens = 0
+        try:
+            async with client.stream(
+                "POST", f"{url.rstrip('/')}/v1/chat/completions", json=payload
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data: ") or line == "data: [DONE]":
+                        continue
+                    chunk = json.loads(line[len("data: ") :])
+                    if chunk.get("usage"):
+                        tokens = chunk["usage"].get("completion_tokens", tokens)
+                    if chunk.get("choices") and any(
+                        chunk["choices"][0].get("delta", {}).values()
+                    ):
+                        arrivals.append(time.perf_counter())
+        except httpx.HTTPError:
+            return Sample(0.0, 0.0, time.perf_counter() - start, 0, ok=False)
+        if not arrivals:
+            return Sample(0.0, 0.0, time.perf_counter() - start, 0, ok=False)
+        itl = (
+            (arrivals[-1] - arrivals[0]) / (len(arrivals) - 1)
+            if len(arrivals) > 1
+            else 0.0
+        )
+        return Sample(
+            arrivals[0] - start, itl, arrivals[-1] - start, tokens or len(arrivals)
+        )
+
+    results = []
+    seed = int(time.time())
+    async with httpx.AsyncClient(timeout=httpx.Timeout(600.0, connect=30.0)) as client:
+        for concurrency in workload.concurrency:
+            gate = asyncio.Semaphore(concurrency)
+
+            async def gated(i: int) -> Sample:
+                async with gate:
+                    return await one(client, seed + i)
+
+            start = time.perf_counter()
+            samples = await asyncio.gather(
+                *(gated(i) for i in range(workload.requests))
+            )
+            results.append(
+                LevelResult(concurrency, list(samples), time.perf_counter() - start)
+            )
+            seed += workload.requests
+    return results
+
+
+def summarize(result: TuneResult) -> str:
+    """One line per trial, best first."""
+    lines = []
+    for trial in sorted(result.trials, key=lambda t: -t.score):
+        detail = (
+            trial.error
+            or f"goodput {trial.score:.3f} req/s at c={trial.best_concurrency}"
+        )
+        lines.append(f"{json.dumps(trial.params, sort_keys=True)}: {detail}")
+    return "\n".join(lines)
@@ -0,0 +1,233 @@
+"""Two-tier cache of complete responses to deterministic requests.
+
+Keys combine the model's manifest digest with the canonical request hash from
+``ollama_modal.coalesce``, so re-pulling a model (new digest) makes its old
+entries unreachable; the disk tier additionally drops a model's stale digest
+directories the first time it sees the new one. Responses are stored as the
+exact bytes the upstream sent, so a cached stream replays as the same valid
+NDJSON or SSE. A stream whose final object carries ``error`` failed midway
+despite its 200 status, and is not cached.
+
+Disk layout (one directory per model digest; models are keyed by a hash of
+their exact name, since names like ``a:b`` and ``a_b`` can't share a path)::
+
+    <root>/<sha256(model)>/<digest-hex>/<key>.json
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+
+from ollama_modal.metrics import TAIL_BYTES, final_object
+
+REPLAY_CONTENT_TYPES = ("application/x-ndjson", "text/event-stream")
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    content_type: str
+    body: bytes
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body)
+
+    def chunks(self) -> Iterator[bytes]:
+        """Replay streams line by line so clients still see incremental events."""
+        if self.content_type.startswith(REPLAY_CONTENT_TYPES):
+            yield from self.body.splitlines(keepends=True)
+        else:
+            yield self.body
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "status_code": self.status_code,
+                "content_type": self.content_type,
+                "body": base64.b64encode(self.body).decode(),
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(
+            data["status_code"], data["content_type"], base64.b64decode(data["body"])
+        )
+
+
+class ResponseCache:
+    """In-memory LRU bounded by bytes in front of an optional directory on a Volume.
+
+    :param memory_bytes: Budget for the in-memory tier
+    :param disk_root: Directory for the persistent tier, or ``None`` for memory only
+    :param max_entry_bytes: Responses larger than this are not cached
+    :param on_disk_write: Called after each disk write (e.g. to schedule a
+        ``volume.commit()``)
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = 256 * 1024 * 1024,
+        disk_root: str | os.PathLike | None = None,
+        max_entry_bytes: int = 8 * 1024 * 1024,
+        on_disk_write: Callable[[], None] | None = None,
+    ) -> None:
+        self.memory_bytes = memory_bytes
+        self.disk_root = Path(disk_root) if disk_root else None
+        self.max_entry_bytes = max_entry_bytes
+        self.on_disk_write = on_disk_write
+        self._lru: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self._digests: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def key(model: str, model_digest: str, request_key: str) -> str:
+        return f"{model}\0{model_digest}\0{request_key}"
+
+    def _disk_path(self, key: str) -> Path:
+        model, digest, request_key = key.split("\0")
+        return (
+            self.disk_root
+            / hashlib.sha256(model.encode()).hexdigest()
+            / digest.replace(":", "-")
+            / f"{request_key}.json"
+        )
+
+    def _invalidate_stale(self, model: str, model_digest: str) -> None:
+        """Drop entries of ``model`` cached under any other digest."""
+        with self._lock:
+            if self._digests.get(model) == model_digest:
+                return
+            self._digests[model] = model_digest
+            prefix, current = f"{model}\0", f"{model}\0{model_digest}\0"
+            stale = [
+                k
+                for k in self._lru
+                if k.startswith(prefix) and not k.startswith(current)
+            ]
+            for k in stale:
+                self._bytes -= self._lru.pop(k).nbytes
+            self.counters["invalidations"] += len(stale)
+        if self.disk_root is None:
+            return
+        current = self._disk_path(self.key(model, model_digest, "x")).parent
+        if current.parent.is_dir():
+            for sibling in current.parent.iterdir():
+                if sibling != current:
+                    shutil.rmtree(sibling, ignore_errors=True)
+                    self.counters["invalidations"] += 1
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            if key in self._lru:
+                self._bytes -= self._lru.pop(key).nbytes
+            self._lru[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.memory_bytes and self._lru:
+                _, evicted = self._lru.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.counters["evictions"] += 1
+
+    def get(
+        self, model: str, model_digest: str, request_key: str
+    ) -> CachedResponse | None:
+        """Look up memory, then disk (promoting disk hits).
+
+        Blocking; call off the event loop.
+        """
+        self._invalidate_stale(model, model_digest)
+        key = self.key(model, model_digest, request_key)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry
+        if self.disk_root is not None:
+            try:
+                entry = CachedResponse.from_json(self._disk_path(key).read_text())
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                with self._lock:
+                    self.counters["disk_hits"] += 1
+                return entry
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(
+        self, model: str, model_digest: str, request_key: str, entry: CachedResponse
+    ) -> None:
+        """Store a complete, successful 200 response in both tiers.
+
+        Blocking; call off the event loop.
+        """
+        if entry.status_code != 200 or entry.nbytes > self.max_entry_bytes:
+            return
+        final = final_object(entry.body[-TAIL_BYTES:])
+        if final is not None and "error" in final:
+            return
+        key = self.key(model, model_digest, request_key)
+        self._remember(key, entry)
+        with self._lock:
+            self.counters["stores"] += 1
+        if self.disk_root is not None:
+            path = self._disk_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # One temp file per write: concurrent puts of a key mustn't share it.
+            with tempfile.NamedTemporaryFile(
+                "w", dir=path.parent, suffix=".tmp", delete=False
+            ) as tmp:
+                tmp.write(entry.to_json())
+            os.replace(tmp.name, path)
+            if self.on_disk_write is not None:
+                self.on_disk_write()
+
+    async def tee(
+        self,
+        stream: AsyncIterator[bytes],
+        status_code: int,
+        content_type: str,
+        store: Callable[[CachedResponse], Awaitable[None]],
+    ) -> AsyncIterator[bytes]:
+        """Pass ``stream`` through, then hand the full body to ``store``."""
+        chunks = []
+        size = 0
+        async for chunk in stream:
+            size += len(chunk)
+            if size <= self.max_entry_bytes:
+                chunks.append(chunk)
+            yield chunk
+        if size <= self.max_entry_bytes:
+            await store(CachedResponse(status_code, content_type, b"".join(chunks)))
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self._lru),
+                "memory_bytes": self._bytes,
+            }
@@ -0,0 +1,184 @@
+"""Model catalog built from the on-Volume manifests, without ``ollama serve``.
+
+Each model's details (family, parameter count, quantization) come from its
+config blob, the small JSON document ``ollama show`` reads; the GGUF header is
+only consulted when the config lacks them. Entries are kept in a JSON index
+next to the manifests, keyed by manifest path and ``(size, mtime_ns)``, so a
+refresh stats the manifest tree and re-reads only models that changed.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from ollama_modal.gguf import read_metadata
+from ollama_modal.manifests import ModelRef, blob_path, iter_manifests, manifest_layers
+from ollama_modal.routing import MODEL_MEDIA_TYPE
+
+INDEX_FILENAME = ".catalog.json"
+
+# llama.cpp ``general.file_type`` values, for GGUFs whose config blob has no
+# ``file_type``.
+FILE_TYPES = {
+    0: "F32",
+    1: "F16",
+    2: "Q4_0",
+    3: "Q4_1",
+    7: "Q8_0",
+    8: "Q5_0",
+    9: "Q5_1",
+    10: "Q2_K",
+    11: "Q3_K_S",
+    12: "Q3_K_M",
+    13: "Q3_K_L",
+    14: "Q4_K_S",
+    15: "Q4_K_M",
+    16: "Q5_K_S",
+    17: "Q5_K_M",
+    18: "Q6_K",
+    32: "BF16",
+}
+
+
+@dataclass
+class ModelInfo:
+    """One ``ollama list`` row, plus what ``ollama show`` would add."""
+
+    name: str
+    digest: str
+    size: int
+    modified_at: str
+    family: str | None = None
+    families: list[str] = field(default_factory=list)
+    parameter_size: str | None = None
+    quantization: str | None = None
+    format: str | None = None
+    layers: list[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _gguf_details(root: Path, digest: str) -> dict:
+    try:
+        metadata = read_metadata(blob_path(root, digest))
+    except (OSError, ValueError):
+        return {}
+    arch = metadata.get("general.architecture")
+    file_type = metadata.get("general.file_type")
+    return {
+        "family": arch,
+        "parameter_size": metadata.get("general.size_label"),
+        "quantization": FILE_TYPES.get(
+            file_type, None if file_type is None else str(file_type)
+        ),
+        "format": "gguf",
+    }
+
+
+def read_model_info(
+    root: str | os.PathLike, ref: ModelRef, manifest_path: Path
+) -> ModelInfo:
+    """Build the catalog entry for one manifest."""
+    root = Path(root)
+    raw = manifest_path.read_bytes()
+    manifest = json.loads(raw)
+    layers = manifest_layers(manifest)
+    modified = datetime.datetime.fromtimestamp(
+        manifest_path.stat().st_mtime, tz=datetime.timezone.utc
+    )
+    info = ModelInfo(
+        name=ref.short,
+        digest="sha256:" + hashlib.sha256(raw).hexdigest(),
+        size=sum(layer.size for layer in layers),
+        modified_at=modified.isoformat(),
+        layers=[
+            {"digest": layer.digest, "media_type": layer.media_type, "size": layer.size}
+            for layer in layers
+        ],
+    )
+    config = manifest.get("config") or {}
+    try:
+        details = json.loads(blob_path(root, config["digest"]).read_text())
+    except (KeyError, OSError, ValueError):
+        details = {}
+    info.family = details.get("model_family")
+    info.families = details.get("model_families") or []
+    info.parameter_size = details.get("model_type")
+    info.quantization = details.get("file_type")
+    info.format = details.get("model_format")
+    if not (info.family and info.parameter_size and info.quantization):
+        weights = next(
+            (layer for layer in layers if layer.media_type == MODEL_MEDIA_TYPE), None
+        )
+        if weights is not None:
+            for key, value in _gguf_details(root, weights.digest).items():
+                if getattr(info, key) is None:
+                    setattr(info, key, value)
+    if info.family and not info.families:
+        info.families = [info.family]
+    return info
+
+
+class Catalog:
+    """Incrementally maintained index of every model under ``root``.
+
+    :param root: The ``OLLAMA_MODELS`` directory
+    :param index_path: Where the index is persisted; defaults to
+        ``<root>/.catalog.json``
+    """
+
+    def __init__(
+        self, root: str | os.PathLike, index_path: str | os.PathLike | None = None
+    ) -> None:
+        self.root = Path(root)
+        self.index_path = Path(index_path) if index_path else self.root / INDEX_FILENAME
+        self._lock = threading.Lock()
+        self.dirty = False
+        try:
+            self._entries: dict[str, dict] = json.loads(self.index_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def refresh(self) -> list[ModelInfo]:
+        """Re-read changed manifests, drop removed ones; every model, sorted by name."""
+        with self._lock:
+            seen = set()
+            for ref, path in iter_manifests(self.root):
+                key = str(path.relative_to(self.root))
+                seen.add(key)
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                stamp = [stat.st_size, stat.st_mtime_ns]
+                cached = self._entries.get(key)
+                if cached and cached["stamp"] == stamp:
+                    continue
+                try:
+                    info = read_model_info(self.root, ref, path)
+                except (OSError, ValueError):
+                    continue
+                self._entries[key] = {"stamp": stamp, "model": info.as_dict()}
+                self.dirty = True
+            for key in set(self._entries) - seen:
+                del self._entries[key]
+                self.dirty = True
+            models = [ModelInfo(**entry["model"]) for entry in self._entries.values()]
+        return sorted(models, key=lambda info: info.name)
+
+    def save(self) -> None:
+        """Write atomically; a no-op when nothing changed."""
+        with self._lock:
+            if not self.dirty:
+                return
+            tmp = self.index_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._entries))
+            os.replace(tmp, self.index_path)
+            self.dirty = False
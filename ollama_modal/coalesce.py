@@ -0,0 +1,150 @@
+"""Collapse byte-identical deterministic requests that are in flight at the same time.
+
+The first request for a key opens the upstream call; a background task pumps
+the upstream body into a shared buffer, and every caller (the first one
+included) replays that buffer as it grows. A waiter that joins mid-stream
+starts from the first chunk, so streaming and non-streaming responses fan out
+the same way. Once the upstream response completes, the key is released and
+the next identical request goes upstream again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+GENERATIVE_PATHS = ("api/generate", "api/chat", "v1/chat/completions", "v1/completions")
+EMBEDDING_PATHS = ("api/embed", "api/embeddings", "v1/embeddings")
+
+
+def is_deterministic(path: str, payload: dict[str, Any]) -> bool:
+    """Embeddings always are; generations are with temperature 0 or a fixed seed."""
+    path = path.strip("/")
+    if path in EMBEDDING_PATHS:
+        return True
+    if path not in GENERATIVE_PATHS:
+        return False
+    options = payload.get("options") if isinstance(payload.get("options"), dict) else {}
+    temperature = options.get("temperature", payload.get("temperature"))
+    seed = options.get("seed", payload.get("seed"))
+    return temperature == 0 or seed is not None
+
+
+def canonical_key(path: str, payload: dict[str, Any] | None) -> str | None:
+    """Hash of the path and the key-sorted request JSON.
+
+    ``None`` if the request is not coalescable.
+    """
+    if not payload or not is_deterministic(path, payload):
+        return None
+    canonical = json.dumps(
+        {"path": path.strip("/"), "body": payload},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class Upstream:
+    """What a coalesced flight needs from the upstream response."""
+
+    status_code: int
+    headers: dict[str, str]
+    body: AsyncIterator[bytes]
+    close: Callable[[], Awaitable[None]]
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.head: asyncio.Future[tuple[int, dict[str, str]]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.changed = asyncio.Condition()
+
+    async def pump(self, open_upstream: Callable[[], Awaitable[Upstream]]) -> None:
+        upstream = None
+        try:
+            upstream = await open_upstream()
+            self.head.set_result((upstream.status_code, upstream.headers))
+            async for chunk in upstream.body:
+                async with self.changed:
+                    self.chunks.append(chunk)
+                    self.changed.notify_all()
+        except BaseException as exc:
+            self.error = exc
+            if not self.head.done():
+                self.head.set_exception(exc)
+        finally:
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+            if upstream is not None:
+                await upstream.close()
+
+    async def replay(self) -> AsyncIterator[bytes]:
+        sent = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(
+                    lambda: sent < len(self.chunks) or self.done
+                )
+                batch = self.chunks[sent:]
+                finished = self.done
+            for chunk in batch:
+                yield chunk
+            sent += len(batch)
+            if finished and sent == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class Coalescer:
+    """Share one upstream call among concurrent identical requests."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def open(
+        self, key: str, open_upstream: Callable[[], Awaitable[Upstream]]
+    ) -> tuple[int, dict[str, str], AsyncIterator[bytes], bool]:
+        """Join (or start) the flight for ``key``.
+
+        :return: ``(status, headers, body, shared)``; ``shared`` is true for callers
+            that piggy-backed on someone else's upstream call
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            self.upstream_calls += 1
+            task = asyncio.create_task(flight.pump(open_upstream))
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: self._release(key, flight, t))
+        else:
+            self.coalesced += 1
+        status, headers = await asyncio.shield(flight.head)
+        return status, headers, flight.replay(), shared
+
+    def _release(self, key: str, flight: _Flight, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,260 @@
+"""Micro-batch concurrent embedding requests into one upstream ``/api/embed`` call.
+
+Requests for the same model and embedding parameters that arrive within
+``window`` seconds of each other (up to ``max_batch`` texts) are merged into a
+single ``input`` list; each caller gets back its own slice. Vectors are also
+cached by content hash (model digest + parameters + text), so re-embedding an
+unchanged document never reaches the GPU.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+EMBED_PATHS = ("api/embed", "v1/embeddings")
+# Request fields that change the vectors; requests only share a batch if these match.
+PARAM_FIELDS = ("truncate", "dimensions", "options", "keep_alive")
+
+
+class UpstreamError(Exception):
+    """The upstream embed call failed; carries its status and body for every caller."""
+
+    def __init__(self, status_code: int, body: bytes) -> None:
+        super().__init__(f"upstream returned {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+def batchable(path: str, payload: dict[str, Any] | None) -> bool:
+    if not payload or path.strip("/") not in EMBED_PATHS or not payload.get("model"):
+        return False
+    if payload.get("encoding_format") not in (None, "float"):
+        return False
+    texts = payload.get("input")
+    return isinstance(texts, str) or (
+        isinstance(texts, list)
+        and bool(texts)
+        and all(isinstance(t, str) for t in texts)
+    )
+
+
+def split_request(payload: dict[str, Any]) -> tuple[str, list[str], dict[str, Any]]:
+    """``(model, texts, params)`` of an Ollama or OpenAI embedding request."""
+    texts = payload["input"]
+    params = {k: payload[k] for k in PARAM_FIELDS if k in payload}
+    return payload["model"], [texts] if isinstance(texts, str) else list(texts), params
+
+
+def ollama_response(
+    model: str, vectors: list[list[float]], tokens: int, seconds: float
+) -> dict:
+    return {
+        "model": model,
+        "embeddings": vectors,
+        "total_duration": int(seconds * 1e9),
+        "prompt_eval_count": tokens,
+    }
+
+
+def openai_response(model: str, vectors: list[list[float]], tokens: int) -> dict:
+    return {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "embedding": v, "index": i}
+            for i, v in enumerate(vectors)
+        ],
+        "model": model,
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@dataclass
+class _Batch:
+    texts: list[str] = field(default_factory=list)
+    waiters: list[tuple[list[int], asyncio.Future]] = field(default_factory=list)
+    flush: asyncio.TimerHandle | None = None
+
+
+class EmbeddingBatcher:
+    """Gather concurrent embedding calls and send them upstream together.
+
+    Calls are batched per ``(upstream, model, params)``.
+
+    :param send: ``(upstream, payload) -> response JSON`` for one ``/api/embed`` call;
+        raise ``UpstreamError`` on failure
+    :param window: Seconds to wait for more requests after the first one of a batch
+    :param max_batch: Flush as soon as a batch holds this many distinct texts
+    :param cache_entries: Size of the content-hash vector cache (0 disables it)
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, dict[str, Any]], Awaitable[dict[str, Any]]],
+        window: float = 0.005,
+        max_batch: int = 64,
+        cache_entries: int = 50_000,
+    ) -> None:
+        self.send = send
+        self.window = window
+        self.max_batch = max_batch
+        self.cache_entries = cache_entries
+        self._cache: OrderedDict[str, tuple[list[float], int]] = OrderedDict()
+        self._batches: dict[str, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.counters = {
+            "requests": 0,
+            "texts": 0,
+            "cache_hits": 0,
+            "upstream_calls": 0,
+            "upstream_texts": 0,
+        }
+
+    @staticmethod
+    def _text_key(
+        model: str, digest: str | None, params: dict[str, Any], text: str
+    ) -> str:
+        blob = json.dumps(
+            [model, digest, params, text], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    async def embed(
+        self,
+        upstream: str,
+        model: str,
+        texts: list[str],
+        params: dict[str, Any],
+        digest: str | None = None,
+    ) -> tuple[list[list[float]], int]:
+        """Vectors for ``texts`` (in order) and the prompt tokens attributed to them."""
+        self.counters["requests"] += 1
+        self.counters["texts"] += len(texts)
+        keys = [self._text_key(model, digest, params, t) for t in texts]
+        results: list[tuple[list[float], int] | None] = []
+        for key in keys:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+            results.append(hit)
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            fetched = await self._enqueue(
+                upstream, model, [texts[i] for i in missing], params
+            )
+            for i, item in zip(missing, fetched):
+                results[i] = item
+                self._store(keys[i], item)
+        return [r[0] for r in results], sum(r[1] for r in results)
+
+    def _store(self, key: str, item: tuple[list[float], int]) -> None:
+        if not self.cache_entries:
+            return
+        self._cache[key] = item
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+    def _enqueue(
+        self, upstream: str, model: str, texts: list[str], params: dict[str, Any]
+    ) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        batch_key = json.dumps([upstream, model, params], sort_keys=True)
+        batch = self._batches.get(batch_key)
+        if batch is None:
+            batch = self._batches[batch_key] = _Batch()
+            batch.flush = loop.call_later(
+                self.window, self._flush, batch_key, upstream, model, params
+            )
+        positions = []
+        for text in texts:
+            # Identical texts within a batch are embedded once.
+            try:
+                positions.append(batch.texts.index(text))
+            except ValueError:
+                batch.texts.append(text)
+                positions.append(len(batch.texts) - 1)
+        future = loop.create_future()
+        batch.waiters.append((positions, future))
+        if len(batch.texts) >= self.max_batch:
+            batch.flush.cancel()
+            self._flush(batch_key, upstream, model, params)
+        return future
+
+    def _flush(
+        self, batch_key: str, upstream: str, model: str, params: dict[str, Any]
+    ) -> None:
+        batch = self._batches.pop(batch_key, None)
+        if batch is not None:
+            task = asyncio.get_running_loop().create_task(
+                self._run(batch, upstream, model, params)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, batch: _Batch, upstream: str, model: str, params: dict[str, Any]
+    ) -> None:
+        self.counters["upstream_calls"] += 1
+        self.counters["upstream_texts"] += len(batch.texts)
+        try:
+            response = await self.send(
+                upstream, {"model": model, "input": batch.texts, **params}
+            )
+            vectors = response["embeddings"]
+            if len(vectors) != len(batch.texts):
+                raise ValueError(
+                    f"{len(vectors)} embeddings for {len(batch.texts)} inputs"
+                )
+            # Ollama reports one token count per call; attribute it by text length.
+            total_tokens = response.get("prompt_eval_count") or 0
+            total_chars = sum(len(t) for t in batch.texts) or 1
+            tokens = [round(total_tokens * len(t) / total_chars) for t in batch.texts]
+            results = [
+                [(vectors[p], tokens[p]) for p in positions]
+                for positions, _ in batch.waiters
+            ]
+        except Exception as exc:
+            if not isinstance(exc, UpstreamError):
+                # Unreachable upstream or malformed answer: every caller gets a 502.
+                message = f"embed call failed: {type(exc).__name__}: {exc}"
+                exc = UpstreamError(502, json.dumps({"error": message}).encode())
+            for _, future in batch.waiters:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch.waiters, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict[str, Any]:
+        calls = self.counters["upstream_calls"]
+        return {
+            **self.counters,
+            "cache_entries": len(self._cache),
+            "mean_batch_size": (
+                round(self.counters["upstream_texts"] / calls, 2) if calls else 0.0
+            ),
+        }
+
+
+async def handle_embed(
+    batcher: EmbeddingBatcher,
+    upstream: str,
+    path: str,
+    payload: dict[str, Any],
+    digest: str | None = None,
+) -> dict[str, Any]:
+    """Serve one ``/api/embed`` or ``/v1/embeddings`` request through ``batcher``."""
+    start = time.perf_counter()
+    model, texts, params = split_request(payload)
+    vectors, tokens = await batcher.embed(upstream, model, texts, params, digest)
+    if path.strip("/") == "v1/embeddings":
+        return openai_response(model, vectors, tokens)
+    return ollama_response(model, vectors, tokens, time.perf_counter() - start)
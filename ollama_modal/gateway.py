@@ -0,0 +1,220 @@
+"""Send each request to the engine deployment expected to answer it fastest.
+
+A *logical* model (what clients ask for, e.g. ``qwen3.6-27b``) can be served by
+several backends under different names (``qwen3.6:27b`` on Ollama, the AWQ
+build on vLLM). For every request the gateway estimates, per backend that
+serves the model::
+
+    expected = queue wait
+             + (TTFT if warm else cold start)
+             + output tokens / tokens-per-second
+
+from its own view of each backend: requests in flight against the backend's
+concurrency, exponentially weighted TTFT and decode speed observed on recent
+responses, and whether the backend answered for this model recently enough
+that its containers are probably still up. Saturated backends are tried last,
+and a backend that fails to connect or answers 429/5xx is skipped in favour
+of the next candidate.
+
+Queue depth is only what passes through this gateway: requests sent to a
+backend directly, or through another gateway process, are not counted, so
+deploy the gateway as a single container.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from ollama_modal.metrics import final_object, timings
+
+DEFAULT_OUTPUT_TOKENS = 256
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+WILDCARD = "*"
+
+
+def output_tokens(payload: dict[str, Any] | None) -> int:
+    """Requested generation length (``max_tokens`` or ``options.num_predict``)."""
+    if not payload:
+        return DEFAULT_OUTPUT_TOKENS
+    options = payload.get("options") if isinstance(payload.get("options"), dict) else {}
+    for value in (
+        payload.get("max_tokens"),
+        payload.get("max_completion_tokens"),
+        options.get("num_predict"),
+    ):
+        if isinstance(value, int) and value > 0:
+            return value
+    return DEFAULT_OUTPUT_TOKENS
+
+
+@dataclass
+class Backend:
+    """One engine deployment behind the gateway.
+
+    :param models: Logical model -> the backend's own name for it; a ``"*"`` key
+        means any other model name is passed through unchanged
+    :param concurrency: Requests the backend runs at once before queueing
+    :param max_queue: Queued requests beyond ``concurrency`` before it counts as
+        saturated
+    :param cold_start_seconds: Expected time to first token when no container is up
+    :param warm_window: Seconds after a success that the backend counts as warm
+        (its containers' ``scaledown_window``)
+    """
+
+    name: str
+    url: str
+    models: dict[str, str]
+    engine: str = "ollama"
+    concurrency: int = 4
+    max_queue: int = 16
+    cold_start_seconds: float = 60.0
+    warm_window: float = 120.0
+    ttft_seconds: float = 1.0
+    tokens_per_second: float = 30.0
+    in_flight: int = 0
+    last_ok: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(
+        default_factory=lambda: {
+            "requests": 0,
+            "failures": 0,
+            "fallbacks_to": 0,
+            "hedges_to": 0,
+        }
+    )
+
+    def engine_model(self, model: str) -> str | None:
+        if model in self.models:
+            return self.models[model]
+        return model if WILDCARD in self.models else None
+
+    def warm(self, model: str, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return now - self.last_ok.get(model, float("-inf")) < self.warm_window
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.concurrency + self.max_queue
+
+    def expected_seconds(
+        self, model: str, tokens: int = DEFAULT_OUTPUT_TOKENS, now: float | None = None
+    ) -> float:
+        decode = tokens / max(self.tokens_per_second, 1e-3)
+        queued = max(0, self.in_flight + 1 - self.concurrency)
+        wait = queued / self.concurrency * (self.ttft_seconds + decode)
+        start = self.ttft_seconds if self.warm(model, now) else self.cold_start_seconds
+        return wait + start + decode
+
+    def observe(
+        self, model: str, ttft: float | None, tokens_per_second: float | None
+    ) -> None:
+        self.last_ok[model] = time.monotonic()
+        if ttft is not None:
+            self.ttft_seconds = 0.8 * self.ttft_seconds + 0.2 * ttft
+        if tokens_per_second:
+            self.tokens_per_second = (
+                0.8 * self.tokens_per_second + 0.2 * tokens_per_second
+            )
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "engine": self.engine,
+            "url": self.url,
+            "in_flight": self.in_flight,
+            "saturated": self.saturated,
+            "ttft_seconds_ewma": round(self.ttft_seconds, 3),
+            "tokens_per_second_ewma": round(self.tokens_per_second, 1),
+            "warm_models": sorted(m for m in self.last_ok if self.warm(m, now)),
+            **self.counters,
+        }
+
+
+@dataclass
+class OllamaBackend(Backend):
+    """An Ollama deployment (native NDJSON API), e.g. the ``router`` endpoint."""
+
+    engine: str = "ollama"
+
+
+@dataclass
+class VllmBackend(Backend):
+    """A vLLM deployment (OpenAI-compatible SSE API).
+
+    Snapshot restores keep its cold starts short.
+    """
+
+    engine: str = "openai"
+    concurrency: int = 8
+    cold_start_seconds: float = 30.0
+
+
+class Gateway:
+    """Rank backends per request and keep their live state.
+
+    :param backends: In order of preference; ties in expected latency go to the
+        earlier one
+    """
+
+    def __init__(self, backends: list[Backend]) -> None:
+        self.backends = backends
+        self._lock = threading.Lock()
+
+    def models(self) -> list[str]:
+        return sorted({m for b in self.backends for m in b.models if m != WILDCARD})
+
+    def candidates(
+        self, model: str, tokens: int = DEFAULT_OUTPUT_TOKENS
+    ) -> list[tuple[Backend, str]]:
+        """Backends serving ``model`` (with their name for it), best first."""
+        now = time.monotonic()
+        with self._lock:
+            ranked = [
+                (b.saturated, b.expected_seconds(model, tokens, now), i, b, name)
+                for i, b in enumerate(self.backends)
+                if (name := b.engine_model(model)) is not None
+            ]
+        ranked.sort(key=lambda r: r[:3])
+        return [(b, name) for *_, b, name in ranked]
+
+    def acquire(
+        self, backend: Backend, fallback: bool = False, hedge: bool = False
+    ) -> None:
+        with self._lock:
+            backend.in_flight += 1
+            backend.counters["requests"] += 1
+            backend.counters["fallbacks_to"] += fallback
+            backend.counters["hedges_to"] += hedge
+
+    def release(self, backend: Backend) -> None:
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+
+    def failed(self, backend: Backend) -> None:
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+            backend.counters["failures"] += 1
+
+    def completed(
+        self,
+        backend: Backend,
+        model: str,
+        tail: bytes,
+        ttfb: float | None,
+        elapsed: float,
+    ) -> None:
+        """Fold a finished response (its tail) into the backend's speed estimates."""
+        obj = final_object(tail)
+        observed = timings(obj, ttfb, elapsed) if obj else {}
+        with self._lock:
+            backend.observe(
+                model,
+                observed.get("ollama_ttft_seconds", ttfb),
+                observed.get("ollama_decode_tokens_per_second"),
+            )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {b.name: b.stats() for b in self.backends}
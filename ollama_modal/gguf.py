@@ -0,0 +1,110 @@
+"""Minimal GGUF header reader: just enough metadata to size a model's KV cache."""
+
+from __future__ import annotations
+
+import os
+import struct
+from typing import Any, BinaryIO
+
+GGUF_MAGIC = b"GGUF"
+
+_SCALARS = {
+    0: "<B",
+    1: "<b",
+    2: "<H",
+    3: "<h",
+    4: "<I",
+    5: "<i",
+    6: "<f",
+    7: "<?",
+    10: "<Q",
+    11: "<q",
+    12: "<d",
+}
+SMALL_ARRAY = 1024
+_STRING = 8
+_ARRAY = 9
+
+
+def _read(f: BinaryIO, fmt: str) -> Any:
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated GGUF header")
+    return struct.unpack(fmt, data)[0]
+
+
+def _read_string(f: BinaryIO) -> str:
+    return f.read(_read(f, "<Q")).decode("utf-8", errors="replace")
+
+
+def _read_value(f: BinaryIO, vtype: int, keep: bool) -> Any:
+    if vtype in _SCALARS:
+        return _read(f, _SCALARS[vtype])
+    if vtype == _STRING:
+        return _read_string(f)
+    if vtype == _ARRAY:
+        item_type = _read(f, "<I")
+        count = _read(f, "<Q")
+        if not keep and item_type in _SCALARS and count > SMALL_ARRAY:
+            # Skip big arrays (token scores, types) without decoding them.
+            f.seek(count * struct.calcsize(_SCALARS[item_type]), os.SEEK_CUR)
+            return None
+        if not keep and item_type == _STRING and count > SMALL_ARRAY:
+            for _ in range(count):
+                f.seek(_read(f, "<Q"), os.SEEK_CUR)
+            return None
+        items = [_read_value(f, item_type, keep) for _ in range(count)]
+        return items if keep or count <= SMALL_ARRAY else None
+    raise ValueError(f"unknown GGUF value type {vtype}")
+
+
+def read_metadata(path: str | os.PathLike, keep_arrays: bool = False) -> dict[str, Any]:
+    """Return the key/value metadata of a GGUF file.
+
+    Arrays longer than ``SMALL_ARRAY`` (the tokenizer vocabulary, mostly) come
+    back as ``None`` unless ``keep_arrays`` is set.
+
+    :raises ValueError: If the file isn't GGUF
+    """
+    with open(path, "rb") as f:
+        if f.read(4) != GGUF_MAGIC:
+            raise ValueError(f"{path} is not a GGUF file")
+        version = _read(f, "<I")
+        count_fmt = "<I" if version == 1 else "<Q"
+        _read(f, count_fmt)  # tensor count
+        kv_count = _read(f, count_fmt)
+        metadata = {}
+        for _ in range(kv_count):
+            key = _read_string(f)
+            vtype = _read(f, "<I")
+            metadata[key] = _read_value(f, vtype, keep_arrays)
+        return metadata
+
+
+def kv_bytes_per_token(
+    metadata: dict[str, Any], bytes_per_element: int = 2
+) -> int | None:
+    """K+V cache bytes per token of context (f16 cache by default).
+
+    ``None`` if the header doesn't say enough.
+    """
+    arch = metadata.get("general.architecture")
+    if not arch:
+        return None
+    layers = metadata.get(f"{arch}.block_count")
+    heads = metadata.get(f"{arch}.attention.head_count")
+    kv_heads = metadata.get(f"{arch}.attention.head_count_kv") or heads
+    key_len = metadata.get(f"{arch}.attention.key_length")
+    value_len = metadata.get(f"{arch}.attention.value_length")
+    if key_len is None or value_len is None:
+        embd = metadata.get(f"{arch}.embedding_length")
+        if not (embd and heads):
+            return None
+        key_len = value_len = embd // heads
+    if not layers:
+        return None
+    # head_count_kv may be a per-layer array in some architectures; take the max.
+    if isinstance(kv_heads, list):
+        kv_heads = max(kv_heads)
+    return layers * kv_heads * (key_len + value_len) * bytes_per_element
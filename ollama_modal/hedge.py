@@ -0,0 +1,330 @@
+"""Hedged requests: send a slow-to-start request again and keep the first to answer.
+
+Time to first token has a long tail: the same prompt takes anywhere from
+0.5s to 1.6s on a warm Ollama container, and tens of seconds when it lands on
+a cold one. Past a threshold (the rolling p95 of time to first chunk) the same
+request goes to a second replica or backend. The first attempt to produce a
+body chunk wins; the other is cancelled and its connection closed, which
+makes Ollama and vLLM abort the generation.
+
+Each request earns ``max_extra`` of a hedge, so at most that fraction of
+requests is ever duplicated, however slow the upstreams get.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from ollama_modal.coalesce import Upstream
+from ollama_modal.gateway import RETRY_STATUSES
+
+
+def is_streaming(path: str, payload: dict[str, Any] | None) -> bool:
+    """Whether a request streams its reply.
+
+    Ollama's native API streams unless told not to.
+    """
+    if not payload:
+        return False
+    return bool(payload.get("stream", path.strip("/").startswith("api/")))
+
+
+@dataclass
+class Attempt:
+    """One upstream call started by ``race``.
+
+    :param index: Which upstream (``start`` argument) answered
+    :param opened: The response; its body still yields the first chunk
+    :param started: ``time.perf_counter()`` when this attempt was sent
+    :param ttft: Seconds from ``started`` to the first body chunk
+    :param hedge: Whether this attempt was the hedge rather than the original request
+    """
+
+    index: int
+    opened: Upstream
+    started: float
+    ttft: float
+    hedge: bool = False
+
+
+class HedgePolicy:
+    """When to hedge, how often it is allowed to, and what it has bought.
+
+    :param quantile: Hedge once the wait exceeds this quantile of recent times to
+        first chunk
+    :param window: Recent times to first chunk to take the quantile over
+    :param min_samples: Use ``initial_seconds`` until this many have been observed
+    :param min_seconds: Never hedge sooner than this
+    :param max_extra: Fraction of requests that may be duplicated
+    :param burst: Hedges that may be spent at once after a quiet spell
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        window: int = 500,
+        min_samples: int = 20,
+        initial_seconds: float = 2.0,
+        min_seconds: float = 0.1,
+        max_extra: float = 0.1,
+        burst: float = 3.0,
+    ) -> None:
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial_seconds = initial_seconds
+        self.min_seconds = min_seconds
+        self.max_extra = max_extra
+        self.burst = burst
+        self._credit = burst
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "over_budget": 0}
+        self.saved_seconds = 0.0
+
+    def threshold(self) -> float:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.initial_seconds
+            ordered = sorted(self._samples)
+        return max(
+            self.min_seconds,
+            ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))],
+        )
+
+    def admit(self) -> None:
+        """Count a hedge-eligible request; each one adds ``max_extra`` to the budget."""
+        with self._lock:
+            self.counters["requests"] += 1
+            self._credit = min(self.burst, self._credit + self.max_extra)
+
+    def try_hedge(self) -> bool:
+        with self._lock:
+            if self._credit < 1:
+                self.counters["over_budget"] += 1
+                return False
+            self._credit -= 1
+            self.counters["hedged"] += 1
+            return True
+
+    def observe(self, ttft: float) -> None:
+        with self._lock:
+            self._samples.append(ttft)
+
+    def won(self, waited: float) -> None:
+        """A hedge answered first, ``waited`` seconds after the original was sent.
+
+        The original would have taken at least that long; the saving is
+        estimated as its expected remaining time, the mean excess over
+        ``waited`` of recent times to first chunk that were longer.
+        """
+        with self._lock:
+            self.counters["hedge_wins"] += 1
+            slower = [s for s in self._samples if s > waited]
+            if slower:
+                self.saved_seconds += statistics.fmean(slower) - waited
+
+    def stats(self) -> dict[str, Any]:
+        threshold = self.threshold()
+        with self._lock:
+            requests, hedged, wins = (
+                self.counters[k] for k in ("requests", "hedged", "hedge_wins")
+            )
+            return {
+                **self.counters,
+                "threshold_seconds": round(threshold, 3),
+                "samples": len(self._samples),
+                "hedge_rate": round(hedged / requests, 4) if requests else 0.0,
+                "hedge_win_rate": round(wins / hedged, 4) if hedged else 0.0,
+                "latency_saved_seconds": round(self.saved_seconds, 3),
+                "latency_saved_per_win_seconds": (
+                    round(self.saved_seconds / wins, 3) if wins else 0.0
+                ),
+            }
+
+
+async def _prepend(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if first:
+        yield first
+    async for chunk in rest:
+        yield chunk
+
+
+async def _first_chunk(
+    start: Callable[[int, bool], Awaitable[Upstream]],
+    index: int,
+    hedge: bool,
+    retryable: Callable[[Upstream], bool],
+) -> Attempt:
+    started = time.perf_counter()
+    opened = await start(index, hedge)
+    if retryable(opened):
+        return Attempt(index, opened, started, time.perf_counter() - started, hedge)
+    try:
+        first = await opened.body.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except BaseException:
+        await opened.close()
+        raise
+    ttft = time.perf_counter() - started
+    opened.body = _prepend(first, opened.body)
+    return Attempt(index, opened, started, ttft, hedge)
+
+
+async def race(
+    start: Callable[[int, bool], Awaitable[Upstream]],
+    count: int,
+    policy: HedgePolicy | None = None,
+    hedge: bool = True,
+    retryable: Callable[[Upstream], bool] = lambda opened: opened.status_code
+    in RETRY_STATUSES,
+) -> Attempt:
+    """Call ``start(0, False)``, falling back on failure and hedging when slow.
+
+    Upstreams ``1..count-1`` are tried in order when an attempt raises or gets a
+    ``retryable`` response and nothing else is in flight. With a ``policy`` and
+    ``hedge``, one extra attempt is started (on the next untried upstream, or on
+    upstream 0 again if it is the only one) once the threshold passes without a
+    first chunk, budget permitting. If every upstream fails, the last retryable
+    response is returned, or the last error raised.
+
+    :param start: ``(index, is_hedge) -> Upstream``; the body must not have been read
+    :param policy: Learns times to first chunk even when ``hedge`` is off
+    """
+    if policy is not None and hedge:
+        policy.admit()
+    sent = time.perf_counter()
+    tasks: dict[asyncio.Task[Attempt], int] = {}
+    losers: list[Attempt] = []
+    fallback: Attempt | None = None
+    error: BaseException | None = None
+    hedged = not (policy is not None and hedge)
+
+    def launch(index: int, is_hedge: bool = False) -> asyncio.Task[Attempt]:
+        task = asyncio.create_task(_first_chunk(start, index, is_hedge, retryable))
+        tasks[task] = index
+        return task
+
+    original = launch(0)
+    tried = 1
+    try:
+        while tasks:
+            timeout = (
+                None
+                if hedged
+                else max(0.0, sent + policy.threshold() - time.perf_counter())
+            )
+            done, _ = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                hedged = True
+                target = tried if tried < count else (0 if count == 1 else None)
+                if target is not None and policy.try_hedge():
+                    launch(target, is_hedge=True)
+                    tried = max(tried, target + 1)
+                continue
+            winner = None
+            for task in sorted(done, key=lambda t: tasks[t]):
+                del tasks[task]
+                try:
+                    outcome = task.result()
+                except Exception as exc:
+                    error = exc
+                    continue
+                if winner is None and not retryable(outcome.opened):
+                    winner = outcome
+                elif retryable(outcome.opened):
+                    if fallback is not None:
+                        losers.append(fallback)
+                    fallback = outcome
+                else:
+                    losers.append(outcome)
+            if winner is not None:
+                if policy is not None and winner.opened.status_code == 200:
+                    waited = time.perf_counter() - sent
+                    if winner.hedge:
+                        policy.won(waited)
+                    policy.observe(winner.ttft)
+                    if original in tasks:
+                        # The slow original is the tail sample that matters; it
+                        # took at least this long, so keep it as a lower bound
+                        # rather than letting the threshold drift down.
+                        policy.observe(waited)
+                if fallback is not None:
+                    losers.append(fallback)
+                return winner
+            if not tasks and tried < count:
+                launch(tried)
+                tried += 1
+        if fallback is not None:
+            return fallback
+        assert error is not None
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(outcome, Attempt):
+                losers.append(outcome)
+        for loser in losers:
+            await loser.opened.close()
+
+
+class HedgedClient:
+    """Client-side hedging for latency-critical callers.
+
+    ``urls`` are base URLs serving the same model: replicas of one deployment
+    (as listed in ``ROUTER_REPLICAS``), different deployments, or a single
+    URL, in which case the hedge is a second request to the same Modal
+    endpoint and is usually placed on another container.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        policy: HedgePolicy | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        if not urls:
+            raise ValueError("HedgedClient needs at least one URL")
+        self.urls = urls
+        self.policy = policy or HedgePolicy()
+        self.client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(600.0, connect=30.0), follow_redirects=True
+        )
+
+    async def open(
+        self, path: str, payload: dict[str, Any], headers: dict[str, str] | None = None
+    ) -> Attempt:
+        """POST ``payload`` and return the winning attempt.
+
+        Iterate ``.opened.body``, then ``await .opened.close()``.
+        """
+
+        async def start(index: int, _hedge: bool) -> Upstream:
+            request = self.client.build_request(
+                "POST",
+                f"{self.urls[index].rstrip('/')}/{path.lstrip('/')}",
+                json=payload,
+                headers=headers,
+            )
+            response = await self.client.send(request, stream=True)
+            return Upstream(
+                status_code=response.status_code,
+                headers=dict(response.headers),
+                body=response.aiter_raw(),
+                close=response.aclose,
+            )
+
+        return await race(
+            start, len(self.urls), self.policy, hedge=is_streaming(path, payload)
+        )
@@ -0,0 +1,154 @@
+"""Sleep/wake lifecycle of a vLLM engine around Modal GPU snapshots.
+
+vLLM's sleep mode offloads the weights to CPU memory and frees the KV cache
+(level 1), or drops the weights entirely (level 2). ``VllmServer`` can put
+the engine to sleep right before the snapshot, so the snapshot holds a quiet
+engine, and wake it on restore. An idle container can also go to sleep
+before Modal scales it down, and is woken by its next request.
+
+Every transition is timed and kept, so ``/lifecycle`` and ``lifecycle_report``
+can show what each one cost.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+AWAKE = "awake"
+ASLEEP = "asleep"
+
+
+class EngineLifecycle:
+    """Tracks whether the engine is asleep and wakes it for incoming requests.
+
+    :param sleep: Puts the engine to sleep at the given level
+    :param wake: Wakes the engine (and, after a level 2 sleep, reloads the weights)
+    :param level: Sleep level used for every transition
+    :param idle_after: Seconds without requests after which ``maybe_sleep`` sleeps
+        the engine; ``None`` never sleeps on idle
+    """
+
+    def __init__(
+        self,
+        sleep: Callable[[int], None],
+        wake: Callable[[], None],
+        level: int = 1,
+        idle_after: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if level not in (1, 2):
+            raise ValueError(f"sleep level must be 1 or 2, not {level}")
+        self._sleep = sleep
+        self._wake = wake
+        self.level = level
+        self.idle_after = idle_after
+        self.clock = clock
+        self.state = AWAKE
+        self.in_flight = 0
+        self.last_active = clock()
+        self.transitions: deque[dict[str, Any]] = deque(maxlen=100)
+        self.totals: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def _transition(self, name: str, reason: str, fn: Callable[[], None]) -> float:
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        self.transitions.append(
+            {
+                "transition": name,
+                "reason": reason,
+                "seconds": round(seconds, 4),
+                "at": time.time(),
+            }
+        )
+        count, total = self.totals.get(name, [0, 0.0])
+        self.totals[name] = [count + 1, total + seconds]
+        return seconds
+
+    def sleep(self, reason: str) -> float:
+        """Put the engine to sleep; returns the seconds it took (0 if asleep)."""
+        with self._lock:
+            if self.state == ASLEEP:
+                return 0.0
+            seconds = self._transition("sleep", reason, lambda: self._sleep(self.level))
+            self.state = ASLEEP
+            return seconds
+
+    def wake(self, reason: str) -> float:
+        """Wake the engine; returns the seconds it took (0 if already awake)."""
+        with self._lock:
+            return self._wake_locked(reason)
+
+    def _wake_locked(self, reason: str) -> float:
+        if self.state == AWAKE:
+            return 0.0
+        seconds = self._transition("wake", reason, self._wake)
+        self.state = AWAKE
+        return seconds
+
+    def begin(self) -> float:
+        """Mark a request as started, waking the engine first if needed.
+
+        Concurrent requests that arrive while it wakes wait for the same wake.
+        :return: Seconds this request spent waiting for the engine to wake
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._wake_locked("request")
+            self.in_flight += 1
+            self.last_active = self.clock()
+        return time.perf_counter() - start
+
+    def end(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.last_active = self.clock()
+
+    def maybe_sleep(self) -> bool:
+        """Sleep if nothing has run for ``idle_after`` seconds; called periodically."""
+        with self._lock:
+            idle = (
+                self.state == AWAKE
+                and self.in_flight == 0
+                and self.idle_after is not None
+            )
+            if not idle or self.clock() - self.last_active < self.idle_after:
+                return False
+            self._transition("sleep", "idle", lambda: self._sleep(self.level))
+            self.state = ASLEEP
+            return True
+
+    def watch(self, interval: float = 1.0) -> threading.Thread:
+        """Start a daemon thread calling ``maybe_sleep`` every ``interval`` seconds."""
+
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.maybe_sleep()
+                except Exception:
+                    # The engine refused (e.g. mid-shutdown); try again next tick.
+                    pass
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "level": self.level,
+                "in_flight": self.in_flight,
+                "idle_seconds": round(self.clock() - self.last_active, 3),
+                "idle_after": self.idle_after,
+                "totals": {
+                    name: {"count": count, "mean_seconds": round(total / count, 4)}
+                    for name, (count, total) in self.totals.items()
+                },
+                "transitions": list(self.transitions),
+            }
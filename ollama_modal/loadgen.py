@@ -0,0 +1,288 @@
+"""Open- and closed-loop load generation for streaming chat endpoints.
+
+Open loop sends requests at arrival times drawn up front (Poisson or fixed
+rate), whether or not earlier requests have finished. This shows how queues
+build once the offered rate passes what the engine can serve. Closed loop
+keeps a fixed number of requests in flight, like ``concurrency`` users
+sending again as soon as their last answer arrives.
+
+Each step (one rate or one concurrency) gets TTFT, inter-token and
+end-to-end percentiles, output tokens/s, error rate, and goodput: requests
+per second that met the SLO. ``find_knee`` picks the step where goodput
+stops growing.
+
+``StreamRecorder`` timestamps every chunk of a stream and counts tokens from
+the server's ``usage`` block when there is one. Otherwise it counts them with
+a tokenizer, or, failing that, one per chunk. Reasoning and content tokens
+are counted separately.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable
+
+from ollama_modal.autotune import Slo
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+@dataclass
+class RequestResult:
+    """One streamed request: TTFT, the gaps between chunks, end to end, tokens out.
+
+    ``token_source`` says where ``output_tokens`` came from: ``usage``,
+    ``tokenizer`` or ``chunks``.
+    """
+
+    ttft: float
+    e2e: float
+    output_tokens: int
+    itls: list[float] = field(default_factory=list)
+    ok: bool = True
+    error: str | None = None
+    reasoning_tokens: int = 0
+    content_tokens: int = 0
+    token_source: str = "chunks"
+
+    @property
+    def itl(self) -> float:
+        """Mean inter-token latency, which is what ``Slo`` checks."""
+        return sum(self.itls) / len(self.itls) if self.itls else 0.0
+
+    @property
+    def tpot(self) -> float | None:
+        """Time per output token after the first.
+
+        Unlike the chunk gaps, this stays right when one chunk carries
+        several tokens.
+        """
+        if not self.ok or self.output_tokens < 2:
+            return None
+        return (self.e2e - self.ttft) / (self.output_tokens - 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        record = asdict(self)
+        record["itls"] = [round(gap, 6) for gap in self.itls]
+        record["tpot"] = None if self.tpot is None else round(self.tpot, 6)
+        return record
+
+
+def failed(start: float, exc: BaseException) -> RequestResult:
+    return RequestResult(
+        0.0,
+        time.perf_counter() - start,
+        0,
+        ok=False,
+        error=f"{type(exc).__name__}: {exc}",
+    )
+
+
+class StreamRecorder:
+    """Timestamps the chunks of one OpenAI chat completion stream.
+
+    Create it just before sending the request, ``feed`` it every decoded
+    ``data:`` chunk, and call ``result`` once the stream ends.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.start = clock()
+        self.arrivals: list[float] = []
+        self.text: dict[str, list[str]] = {"reasoning": [], "content": []}
+        self.chunks = {"reasoning": 0, "content": 0}
+        self.usage: dict[str, Any] = {}
+
+    def feed(self, chunk: dict[str, Any]) -> None:
+        now = self.clock()
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        choices = chunk.get("choices") or []
+        if not choices:
+            return
+        delta = choices[0].get("delta") or {}
+        # vLLM and SGLang send ``reasoning_content`` (newer vLLM ``reasoning``);
+        # Ollama sends ``reasoning``.
+        parts = {
+            "reasoning": delta.get("reasoning_content") or delta.get("reasoning"),
+            "content": delta.get("content"),
+        }
+        for kind, text in parts.items():
+            if text:
+                self.text[kind].append(text)
+                self.chunks[kind] += 1
+        if any(parts.values()):
+            self.arrivals.append(now)
+
+    def result(self, count_tokens: Callable[[str], int] | None = None) -> RequestResult:
+        """The timings and token counts of the finished stream.
+
+        :param count_tokens: Tokenizer used when the server sent no ``usage``;
+            also splits the server's total between reasoning and content when
+            it doesn't report ``reasoning_tokens`` itself
+        """
+        end = self.clock()
+        if not self.arrivals:
+            return RequestResult(
+                end - self.start, end - self.start, 0, ok=False, error="no tokens"
+            )
+        if count_tokens is not None:
+            source = "tokenizer"
+            estimate = {
+                kind: count_tokens("".join(text)) for kind, text in self.text.items()
+            }
+        else:
+            source = "chunks"
+            estimate = dict(self.chunks)
+        reasoning, content = estimate["reasoning"], estimate["content"]
+        total = self.usage.get("completion_tokens")
+        if total:
+            source = "usage"
+            reported = (self.usage.get("completion_tokens_details") or {}).get(
+                "reasoning_tokens"
+            )
+            if reported is not None:
+                reasoning = reported
+            elif reasoning + content:
+                reasoning = round(total * reasoning / (reasoning + content))
+            content = total - reasoning
+        return RequestResult(
+            ttft=self.arrivals[0] - self.start,
+            e2e=end - self.start,
+            output_tokens=reasoning + content,
+            itls=[b - a for a, b in zip(self.arrivals, self.arrivals[1:])],
+            reasoning_tokens=reasoning,
+            content_tokens=content,
+            token_source=source,
+        )
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+
+def arrivals(
+    rate: float, n: int, process: str = "poisson", seed: int | None = None
+) -> list[float]:
+    """Offsets in seconds of ``n`` arrivals at ``rate`` requests per second.
+
+    ``poisson`` draws exponential gaps; ``fixed`` spaces them evenly.
+    """
+    if rate <= 0:
+        raise ValueError(f"rate must be positive, not {rate}")
+    if process not in ("poisson", "fixed"):
+        raise ValueError(f"unknown arrival process {process!r}")
+    rng = random.Random(seed)
+    offsets, t = [], 0.0
+    for _ in range(n):
+        offsets.append(t)
+        t += rng.expovariate(rate) if process == "poisson" else 1 / rate
+    return offsets
+
+
+@dataclass
+class Step:
+    """All requests of one load level; ``mode`` is ``"rate"`` or ``"concurrency"``."""
+
+    mode: str
+    level: float
+    results: list[RequestResult]
+    seconds: float
+
+    def goodput(self, slo: Slo) -> float:
+        good = sum(1 for r in self.results if slo.met(r))
+        return good / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self, slo: Slo) -> dict[str, Any]:
+        ok = [r for r in self.results if r.ok]
+        summary: dict[str, Any] = {
+            "mode": self.mode,
+            "level": self.level,
+            "requests": len(self.results),
+            "seconds": round(self.seconds, 3),
+            "error_rate": (
+                round(1 - len(ok) / len(self.results), 4) if self.results else 0.0
+            ),
+            "requests_per_second": (
+                round(len(ok) / self.seconds, 4) if self.seconds > 0 else 0.0
+            ),
+            "output_tokens_per_second": (
+                round(sum(r.output_tokens for r in ok) / self.seconds, 2)
+                if self.seconds > 0
+                else 0.0
+            ),
+            "goodput": round(self.goodput(slo), 4),
+            "reasoning_tokens": sum(r.reasoning_tokens for r in ok),
+            "content_tokens": sum(r.content_tokens for r in ok),
+            "token_sources": sorted({r.token_source for r in ok}),
+        }
+        metrics = {
+            "ttft": [r.ttft for r in ok],
+            "itl": [gap for r in ok for gap in r.itls],
+            "tpot": [r.tpot for r in ok if r.tpot is not None],
+            "e2e": [r.e2e for r in ok],
+        }
+        for name, values in metrics.items():
+            for q in PERCENTILES:
+                summary[f"{name}_p{int(q * 100)}"] = percentile(values, q)
+        return summary
+
+
+Send = Callable[[int], Awaitable[RequestResult]]
+
+
+async def open_loop(
+    send: Send, rate: float, n: int, process: str = "poisson", seed: int | None = None
+) -> Step:
+    """Send ``n`` requests at ``rate`` per second without waiting for earlier ones.
+
+    :param send: Sends request ``i`` and returns its result; it must not raise
+    """
+    start = time.perf_counter()
+
+    async def at(i: int, offset: float) -> RequestResult:
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        return await send(i)
+
+    results = await asyncio.gather(
+        *(at(i, t) for i, t in enumerate(arrivals(rate, n, process, seed)))
+    )
+    return Step("rate", rate, list(results), time.perf_counter() - start)
+
+
+async def closed_loop(send: Send, concurrency: int, n: int) -> Step:
+    """Send ``n`` requests keeping ``concurrency`` in flight."""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def gated(i: int) -> RequestResult:
+        async with gate:
+            return await send(i)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(gated(i) for i in range(n)))
+    return Step("concurrency", concurrency, list(results), time.perf_counter() - start)
+
+
+def find_knee(
+    steps: list[Step], slo: Slo, tolerance: float = 0.05
+) -> dict[str, Any] | None:
+    """The lowest load whose goodput is within ``tolerance`` of the best.
+
+    This is the saturation knee: past it, more load only adds queueing (or
+    errors), so goodput stays flat or falls.
+    """
+    if not steps:
+        return None
+    best = max(step.goodput(slo) for step in steps)
+    if best <= 0:
+        return None
+    for step in sorted(steps, key=lambda s: s.level):
+        if step.goodput(slo) >= best * (1 - tolerance):
+            return step.summary(slo)
+    return None
@@ -0,0 +1,180 @@
+"""Serve many LoRA adapters on one vLLM base model, loaded on demand from a Volume.
+
+Adapters live in ``<root>/<name>/`` (``adapter_config.json`` plus weights)
+and are requested by name in the ``model`` field. The first request for an
+adapter registers it with the engine (``/v1/load_lora_adapter``). At most
+``capacity`` adapters stay registered; past that, the least recently used
+idle one is unloaded.
+
+vLLM runs at most ``--max-loras`` distinct adapters in one batch. A request
+for an adapter that is already running joins its batch straight away.
+Requests for other adapters wait for a free slot, so requests for the same
+adapter run together instead of swapping adapters every step. Once a
+waiter has waited ``hold_seconds``, new requests for running adapters stop
+jumping ahead of it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+
+class UnknownAdapter(KeyError):
+    """No adapter of that name on the Volume."""
+
+
+class AdapterManager:
+    """Registration LRU and batch slots for LoRA adapters.
+
+    :param root: Directory holding one subdirectory per adapter
+    :param load: Registers ``(name, path)`` with the engine
+    :param unload: Unregisters ``name``
+    :param capacity: Adapters kept registered (vLLM's ``--max-cpu-loras``)
+    :param slots: Distinct adapters running at once (vLLM's ``--max-loras``)
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike,
+        load: Callable[[str, str], Awaitable[None]],
+        unload: Callable[[str], Awaitable[None]],
+        capacity: int = 16,
+        slots: int = 4,
+        hold_seconds: float = 1.0,
+    ) -> None:
+        self.root = Path(root)
+        self._load = load
+        self._unload = unload
+        self.capacity = capacity
+        self.slots = slots
+        self.hold_seconds = hold_seconds
+        self.registered: OrderedDict[str, None] = OrderedDict()
+        self.running: dict[str, int] = {}
+        self._waiting: deque[list[float]] = deque()
+        self._loading: dict[str, asyncio.Future] = {}
+        self._unloading: dict[str, asyncio.Future] = {}
+        self._cond = asyncio.Condition()
+        self.hits = 0
+        self.misses = 0
+        self.load_seconds: deque[float] = deque(maxlen=256)
+        self.unloads = 0
+
+    def path(self, name: str) -> Path | None:
+        """The adapter's directory; ``None`` if ``name`` isn't one on the Volume."""
+        if not name or "/" in name or name.startswith("."):
+            return None
+        path = self.root / name
+        return path if (path / "adapter_config.json").is_file() else None
+
+    def available(self) -> list[str]:
+        try:
+            return sorted(p.name for p in self.root.iterdir() if self.path(p.name))
+        except FileNotFoundError:
+            return []
+
+    def _may_run(self, name: str, ticket: list[float]) -> bool:
+        first = not self._waiting or self._waiting[0] is ticket
+        if name in self.running:
+            # Join the running batch unless someone has waited too long for a slot.
+            return first or time.monotonic() - self._waiting[0][0] < self.hold_seconds
+        return len(self.running) < self.slots and first
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a batch slot for ``name``, registering it first if needed.
+
+        :return: Seconds spent loading the adapter (0 on a hit)
+        :raises UnknownAdapter: If there is no such adapter on the Volume
+        """
+        path = self.path(name)
+        if path is None:
+            raise UnknownAdapter(name)
+        ticket = [time.monotonic()]
+        async with self._cond:
+            self._waiting.append(ticket)
+            try:
+                await self._cond.wait_for(lambda: self._may_run(name, ticket))
+            finally:
+                self._waiting = deque(t for t in self._waiting if t is not ticket)
+                self._cond.notify_all()
+            self.running[name] = self.running.get(name, 0) + 1
+        try:
+            return await self._ensure_registered(name, str(path))
+        except BaseException:
+            await self.release(name)
+            raise
+
+    async def _ensure_registered(self, name: str, path: str) -> float:
+        while True:
+            if name in self.registered:
+                self.registered.move_to_end(name)
+                self.hits += 1
+                return 0.0
+            # Another request is loading it, or it is being evicted; wait and look
+            # again.
+            pending = self._loading.get(name) or self._unloading.get(name)
+            if pending is None:
+                break
+            await asyncio.shield(pending)
+        self.misses += 1
+        self._loading[name] = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        try:
+            await self._make_room()
+            await self._load(name, path)
+            self.registered[name] = None
+            self._loading.pop(name).set_result(None)
+        except BaseException as exc:
+            failed = self._loading.pop(name)
+            failed.set_exception(exc)
+            failed.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        seconds = time.perf_counter() - start
+        self.load_seconds.append(seconds)
+        return seconds
+
+    async def _make_room(self) -> None:
+        """Unload idle adapters until those registered or loading fit ``capacity``."""
+        while len(self.registered) + len(self._loading) > self.capacity:
+            victim = next((n for n in self.registered if n not in self.running), None)
+            if victim is None:
+                return
+            # Out of ``registered`` before the await, so no request joins an
+            # adapter that is being removed; they wait on ``_unloading`` instead.
+            del self.registered[victim]
+            done = self._unloading[victim] = asyncio.get_running_loop().create_future()
+            try:
+                await self._unload(victim)
+            except BaseException:
+                self.registered[victim] = None
+                raise
+            finally:
+                del self._unloading[victim]
+                done.set_result(None)
+            self.unloads += 1
+
+    async def release(self, name: str) -> None:
+        async with self._cond:
+            self.running[name] -= 1
+            if not self.running[name]:
+                del self.running[name]
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        loads = sorted(self.load_seconds)
+        return {
+            "registered": list(self.registered),
+            "running": dict(self.running),
+            "waiting": len(self._waiting),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "unloads": self.unloads,
+            "load_seconds_mean": round(sum(loads) / len(loads), 4) if loads else None,
+            "load_seconds_max": round(loads[-1], 4) if loads else None,
+        }
@@ -0,0 +1,148 @@
+"""Read the Ollama model store (``$OLLAMA_MODELS``) without going through ``ollama``.
+
+Layout, as written by ``ollama pull``::
+
+    <root>/manifests/<host>/<namespace>/<repo>/<tag>   # OCI-style JSON manifest
+    <root>/blobs/sha256-<hex>                         # content-addressed layers
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+DEFAULT_MODELS_DIR = "/usr/share/ollama/.ollama/models"
+DEFAULT_HOST = "registry.ollama.ai"
+DEFAULT_NAMESPACE = "library"
+DEFAULT_TAG = "latest"
+
+
+@dataclass(frozen=True)
+class ModelRef:
+    """A fully qualified model name, e.g. ``registry.ollama.ai/library/gemma4:12b``."""
+
+    host: str
+    namespace: str
+    repo: str
+    tag: str
+
+    @classmethod
+    def parse(cls, name: str) -> "ModelRef":
+        """Parse names the way ``ollama`` does.
+
+        E.g. ``llama3.2``, ``x/flux2-klein`` or ``hf.co/org/repo:q4``.
+        """
+        tag = DEFAULT_TAG
+        path = name
+        last = name.rsplit("/", 1)[-1]
+        if ":" in last:
+            path, tag = name.rsplit(":", 1)
+        parts = path.split("/")
+        if len(parts) == 1:
+            return cls(DEFAULT_HOST, DEFAULT_NAMESPACE, parts[0], tag)
+        if len(parts) == 2:
+            return cls(DEFAULT_HOST, parts[0], parts[1], tag)
+        return cls(parts[0], "/".join(parts[1:-1]), parts[-1], tag)
+
+    @property
+    def short(self) -> str:
+        """The name as ``ollama list`` prints it."""
+        if self.host == DEFAULT_HOST and self.namespace == DEFAULT_NAMESPACE:
+            return f"{self.repo}:{self.tag}"
+        if self.host == DEFAULT_HOST:
+            return f"{self.namespace}/{self.repo}:{self.tag}"
+        return f"{self.host}/{self.namespace}/{self.repo}:{self.tag}"
+
+    def manifest_path(self, root: str | os.PathLike) -> Path:
+        return Path(root, "manifests", self.host, self.namespace, self.repo, self.tag)
+
+
+@dataclass(frozen=True)
+class Layer:
+    """One blob referenced by a manifest (the config blob included)."""
+
+    digest: str
+    size: int
+    media_type: str
+
+
+def blob_path(root: str | os.PathLike, digest: str) -> Path:
+    """Path of a blob on disk; Ollama stores ``sha256:<hex>`` as ``sha256-<hex>``."""
+    return Path(root, "blobs", digest.replace(":", "-"))
+
+
+def models_dir() -> Path:
+    return Path(os.environ.get("OLLAMA_MODELS", DEFAULT_MODELS_DIR))
+
+
+def read_manifest(root: str | os.PathLike, model: str) -> dict | None:
+    """Return the parsed manifest for ``model`` or ``None`` if it isn't on disk."""
+    path = ModelRef.parse(model).manifest_path(root)
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def manifest_layers(manifest: dict) -> list[Layer]:
+    """All blobs a manifest references, config first."""
+    entries = []
+    if manifest.get("config"):
+        entries.append(manifest["config"])
+    entries.extend(manifest.get("layers") or [])
+    return [
+        Layer(
+            digest=e["digest"],
+            size=int(e.get("size", 0)),
+            media_type=e.get("mediaType", ""),
+        )
+        for e in entries
+    ]
+
+
+def model_blob_paths(root: str | os.PathLike, model: str) -> list[Path] | None:
+    """Blob paths for ``model`` if its manifest and every blob (at full size) exist.
+
+    This is the cheap presence check; ``ollama_modal.verify`` does the digest check.
+    """
+    manifest = read_manifest(root, model)
+    if manifest is None:
+        return None
+    paths = []
+    for layer in manifest_layers(manifest):
+        path = blob_path(root, layer.digest)
+        try:
+            if path.stat().st_size != layer.size:
+                return None
+        except FileNotFoundError:
+            return None
+        paths.append(path)
+    return paths
+
+
+def manifest_digest(root: str | os.PathLike, model: str) -> str | None:
+    """``sha256:<hex>`` of the manifest file: the digest ``ollama list`` shows."""
+    try:
+        raw = ModelRef.parse(model).manifest_path(root).read_bytes()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return "sha256:" + hashlib.sha256(raw).hexdigest()
+
+
+def iter_manifests(root: str | os.PathLike) -> Iterator[tuple[ModelRef, Path]]:
+    """Every model in the store as ``(ref, manifest path)``, in path order."""
+    base = Path(root, "manifests")
+    for dirpath, dirnames, filenames in os.walk(base):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith(".tmp"):
+                continue
+            parts = Path(dirpath, name).relative_to(base).parts
+            if len(parts) < 4:
+                continue
+            ref = ModelRef(parts[0], "/".join(parts[1:-2]), parts[-2], parts[-1])
+            yield ref, Path(dirpath, name)
@@ -0,0 +1,221 @@
+"""Per-model inference histograms from Ollama timing fields and OpenAI ``usage`` blocks.
+
+The router only keeps the tail of each response while it streams (references
+to its last ``TAIL_BYTES``, no parsing); once the stream has been fully sent
+the tail is parsed for the final NDJSON object or SSE event and folded into the
+histograms. ``render`` produces the Prometheus text exposition format.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable
+
+NS = 1e9
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+TPS_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320, 640, 1280, 2560, 5120)
+LOAD_BUCKETS = (0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+# Bytes kept from the end of a response: enough for a final object split across
+# reads plus an SSE ``[DONE]`` after the usage event, or a whole non-streaming
+# answer of several thousand tokens. Longer non-streaming bodies go unrecorded.
+TAIL_BYTES = 64 * 1024
+# Distinct ``model`` label values; clients name models freely, so later ones
+# share OTHER_MODEL to keep the series count bounded.
+MAX_MODELS = 64
+OTHER_MODEL = "other"
+
+
+def escape_label(value: str) -> str:
+    """A label value escaped for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Fixed-bucket histogram.
+
+    ``counts[i]`` holds observations ``<= buckets[i]``, the last slot the rest.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+METRICS = {
+    "ollama_ttft_seconds": ("Time to first token", TTFT_BUCKETS),
+    "ollama_prefill_tokens_per_second": ("Prompt evaluation throughput", TPS_BUCKETS),
+    "ollama_decode_tokens_per_second": ("Generation throughput", TPS_BUCKETS),
+    "ollama_load_seconds": ("Model load time reported by Ollama", LOAD_BUCKETS),
+}
+
+
+def final_object(tail: bytes) -> dict[str, Any] | None:
+    """Last JSON object in an NDJSON, SSE or plain JSON body tail."""
+    for line in reversed(tail.splitlines()):
+        line = line.strip()
+        if line.startswith(b"data:"):
+            line = line[5:].strip()
+        if not line or line == b"[DONE]":
+            continue
+        try:
+            obj = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        return obj if isinstance(obj, dict) else None
+    return None
+
+
+def timings(
+    obj: dict[str, Any], ttfb: float | None, elapsed: float
+) -> dict[str, float]:
+    """Histogram observations from a final response object.
+
+    Ollama-native responses carry nanosecond durations; OpenAI-style responses
+    (vLLM, Ollama's ``/v1``) only carry ``usage``, so timing falls back to what
+    the router measured.
+    """
+    out: dict[str, float] = {}
+    if "eval_count" in obj or "prompt_eval_count" in obj:
+        load = obj.get("load_duration", 0) / NS
+        prompt_eval = obj.get("prompt_eval_duration", 0) / NS
+        if obj.get("load_duration") is not None:
+            out["ollama_load_seconds"] = load
+        out["ollama_ttft_seconds"] = (
+            load + prompt_eval if prompt_eval else (ttfb or elapsed)
+        )
+        if obj.get("prompt_eval_count") and prompt_eval:
+            out["ollama_prefill_tokens_per_second"] = (
+                obj["prompt_eval_count"] / prompt_eval
+            )
+        if obj.get("eval_count") and obj.get("eval_duration"):
+            out["ollama_decode_tokens_per_second"] = obj["eval_count"] / (
+                obj["eval_duration"] / NS
+            )
+        return out
+    usage = obj.get("usage")
+    if isinstance(usage, dict):
+        if ttfb is not None:
+            out["ollama_ttft_seconds"] = ttfb
+            if usage.get("prompt_tokens") and ttfb > 0:
+                out["ollama_prefill_tokens_per_second"] = usage["prompt_tokens"] / ttfb
+        decode = elapsed - (ttfb or 0.0)
+        if usage.get("completion_tokens") and decode > 0:
+            out["ollama_decode_tokens_per_second"] = usage["completion_tokens"] / decode
+    return out
+
+
+async def tap(
+    stream: AsyncIterator[bytes],
+    started: float,
+    on_done: Callable[[bytes, float | None, float], None],
+) -> AsyncIterator[bytes]:
+    """Pass ``stream`` through, then call ``on_done(tail, ttfb, elapsed)``.
+
+    Per chunk this only appends a reference to a deque holding at most the last
+    ``TAIL_BYTES``; ``on_done`` is scheduled on the loop after the stream ends,
+    never between chunks.
+    """
+    tail: deque[bytes] = deque()
+    size = 0
+    ttfb = None
+    complete = False
+    try:
+        async for chunk in stream:
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            tail.append(chunk[-TAIL_BYTES:] if len(chunk) > TAIL_BYTES else chunk)
+            size += len(tail[-1])
+            while size - len(tail[0]) >= TAIL_BYTES:
+                size -= len(tail.popleft())
+            yield chunk
+        complete = True
+    finally:
+        if complete:
+            elapsed = time.perf_counter() - started
+            asyncio.get_running_loop().call_soon(on_done, b"".join(tail), ttfb, elapsed)
+
+
+class InferenceMetrics:
+    """Histograms keyed by model, filled from completed responses."""
+
+    def __init__(self, max_models: int = MAX_MODELS) -> None:
+        self._lock = threading.Lock()
+        self._hist: dict[tuple[str, str], Histogram] = {}
+        self.responses: dict[str, int] = {}
+        self.max_models = max_models
+
+    def _label(self, model: str) -> str:
+        """``model``, or ``OTHER_MODEL`` once ``max_models`` names are in use."""
+        if model in self.responses or len(self.responses) < self.max_models:
+            return model
+        return OTHER_MODEL
+
+    def observe(self, model: str, name: str, value: float) -> None:
+        with self._lock:
+            model = self._label(model)
+            hist = self._hist.get((name, model))
+            if hist is None:
+                hist = self._hist[(name, model)] = Histogram(METRICS[name][1])
+            hist.observe(value)
+
+    def record(
+        self, model: str, tail: bytes, ttfb: float | None, elapsed: float
+    ) -> None:
+        """Fold one finished response into the histograms."""
+        obj = final_object(tail)
+        with self._lock:
+            model = self._label(model)
+            self.responses[model] = self.responses.get(model, 0) + 1
+        if obj is None:
+            return
+        for name, value in timings(obj, ttfb, elapsed).items():
+            self.observe(model, name, value)
+
+    def watch(
+        self, stream: AsyncIterator[bytes], model: str, started: float
+    ) -> AsyncIterator[bytes]:
+        """Pass ``stream`` through, recording it once the last chunk has gone out."""
+        return tap(
+            stream,
+            started,
+            lambda tail, ttfb, elapsed: self.record(model, tail, ttfb, elapsed),
+        )
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = [
+            "# HELP ollama_responses_total"
+            " Completed generative responses seen by the router",
+            "# TYPE ollama_responses_total counter",
+        ]
+        with self._lock:
+            for model, n in sorted(self.responses.items()):
+                model = escape_label(model)
+                lines.append(f'ollama_responses_total{{model="{model}"}} {n}')
+            for name, (help_text, buckets) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, model), hist in sorted(self._hist.items()):
+                    if metric != name:
+                        continue
+                    model = escape_label(model)
+                    cumulative = 0
+                    for bound, count in zip((*buckets, "+Inf"), hist.counts):
+                        cumulative += count
+                        labels = f'model="{model}",le="{bound}"'
+                        lines.append(f"{name}_bucket{{{labels}}} {cumulative}")
+                    lines.append(f'{name}_sum{{model="{model}"}} {hist.sum:.6f}')
+                    lines.append(f'{name}_count{{model="{model}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,765 @@
+"""Streaming HTTP pass-through to Ollama upstreams, for the ``router`` endpoint."""
+
+from __future__ import annotations
+
+import json
+import posixpath
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from ollama_modal.admission import AdmissionController, Rejected
+from ollama_modal.affinity import PrefixAffinity, prefix_key
+from ollama_modal.cache import CachedResponse, ResponseCache
+from ollama_modal.coalesce import GENERATIVE_PATHS, Coalescer, Upstream, canonical_key
+from ollama_modal.embed import EmbeddingBatcher, UpstreamError, batchable, handle_embed
+from ollama_modal.gateway import RETRY_STATUSES, Gateway, output_tokens
+from ollama_modal.hedge import HedgePolicy, is_streaming, race
+from ollama_modal.lifecycle import EngineLifecycle
+from ollama_modal.lora import AdapterManager
+from ollama_modal.metrics import InferenceMetrics, tap
+from ollama_modal.residency import ResidencyManager
+from ollama_modal.translate import (
+    ndjson_to_sse,
+    ollama_to_openai_response,
+    openai_to_ollama_response,
+    serves,
+    sse_to_ndjson,
+    translate_request,
+)
+
+HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+    "content-length",
+}
+
+
+# vLLM's ``VLLM_SERVER_DEV_MODE`` and runtime LoRA endpoints: only code in the
+# container may call them, on the engine's localhost port.
+ENGINE_PRIVATE_PATHS = frozenset(
+    {
+        "sleep",
+        "wake_up",
+        "is_sleeping",
+        "reset_prefix_cache",
+        "reset_mm_cache",
+        "collective_rpc",
+        "server_info",
+        "pause",
+        "resume",
+        "is_paused",
+        # ``VLLM_ALLOW_RUNTIME_LORA_UPDATING``: only ``AdapterManager`` may
+        # register adapters, or its LRU would drift from what the engine holds.
+        "v1/load_lora_adapter",
+        "v1/unload_lora_adapter",
+    }
+)
+
+
+def parse_body(body: bytes) -> dict[str, Any] | None:
+    """The JSON object in a request body, or ``None`` for empty/non-JSON bodies."""
+    if not body:
+        return None
+    try:
+        payload = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def requested_context(payload: dict[str, Any] | None) -> int | None:
+    """``options.num_ctx`` of an Ollama-native request, if set."""
+    if not payload:
+        return None
+    options = payload.get("options") or {}
+    num_ctx = options.get("num_ctx") if isinstance(options, dict) else None
+    return int(num_ctx) if num_ctx else None
+
+
+def forward_headers(headers: Any, drop: frozenset[str] = frozenset()) -> dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP | drop}
+
+
+class UpstreamProxy:
+    """Forward requests to an upstream base URL, streaming responses back unbuffered."""
+
+    def __init__(self, client: httpx.AsyncClient | None = None) -> None:
+        self.client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(600.0, connect=30.0), follow_redirects=True
+        )
+
+    async def open(
+        self, request: Request, upstream: str, path: str, body: bytes
+    ) -> Upstream:
+        upstream_request = self.client.build_request(
+            request.method,
+            f"{upstream.rstrip('/')}/{path}",
+            params=request.query_params,
+            # Ask for identity encoding: bodies may be shared between coalesced
+            # callers or replayed from the cache, so they must not depend on
+            # one client's Accept-Encoding.
+            headers={
+                **forward_headers(request.headers, drop=frozenset({"accept-encoding"})),
+                "accept-encoding": "identity",
+            },
+            content=body,
+        )
+        response = await self.client.send(upstream_request, stream=True)
+        return Upstream(
+            status_code=response.status_code,
+            headers=forward_headers(response.headers),
+            body=response.aiter_raw(),
+            close=response.aclose,
+        )
+
+    async def post_json(
+        self, upstream: str, path: str, payload: dict[str, Any]
+    ) -> dict[str, Any]:
+        """POST a JSON body and return the decoded reply.
+
+        :raises UpstreamError: If the upstream answers anything but 200
+        """
+        response = await self.client.post(
+            f"{upstream.rstrip('/')}/{path}", json=payload
+        )
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response.content)
+        return response.json()
+
+    async def forward(
+        self, request: Request, upstream: str, path: str, body: bytes
+    ) -> StreamingResponse:
+        opened = await self.open(request, upstream, path, body)
+        return StreamingResponse(
+            opened.body,
+            status_code=opened.status_code,
+            headers=opened.headers,
+            background=BackgroundTask(opened.close),
+        )
+
+
+def _admitted(
+    admission: AdmissionController,
+    model: str,
+    open_upstream: Callable[[], Awaitable[Upstream]],
+    queued: list[float],
+) -> Callable[[], Awaitable[Upstream]]:
+    """``open_upstream`` holding an admission slot until its response is closed.
+
+    Handed to ``Coalescer.open``, it only runs for the caller that leads a
+    flight, so each upstream call takes exactly one slot however many callers
+    join it. The seconds spent queued are appended to ``queued``.
+
+    :raises Rejected: If no slot is granted
+    """
+
+    async def open_admitted() -> Upstream:
+        queued.append(await admission.acquire(model))
+        started = time.perf_counter()
+        try:
+            opened = await open_upstream()
+        except BaseException:
+            admission.release(model, time.perf_counter() - started)
+            raise
+        close = opened.close
+
+        async def release_and_close() -> None:
+            admission.release(model, time.perf_counter() - started)
+            await close()
+
+        opened.close = release_and_close
+        return opened
+
+    return open_admitted
+
+
+async def _watch(
+    stream: AsyncIterator[bytes],
+    started: float,
+    on_close: list[Callable[[float | None, float], None]],
+) -> AsyncIterator[bytes]:
+    """Pass ``stream`` through; when it ends call each ``on_close(ttfb, elapsed)``."""
+    ttfb = None
+    try:
+        async for chunk in stream:
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            yield chunk
+    finally:
+        elapsed = time.perf_counter() - started
+        for callback in on_close:
+            callback(ttfb, elapsed)
+
+
+def create_router_app(
+    choose_upstream: Callable[[str | None, int | None], tuple[str, str]],
+    routes: Callable[[], dict],
+    proxy: UpstreamProxy | None = None,
+    coalescer: Coalescer | None = None,
+    cache: ResponseCache | None = None,
+    model_digest: Callable[[str], str | None] | None = None,
+    cache_by_default: bool = False,
+    embedder: EmbeddingBatcher | None = None,
+    affinity: dict[str, PrefixAffinity] | None = None,
+    admission: AdmissionController | None = None,
+    metrics: InferenceMetrics | None = None,
+    residency: Callable[[str, str], ResidencyManager | None] | None = None,
+) -> FastAPI:
+    """Build the front app that sends each request to the pool chosen for its ``model``.
+
+    :param choose_upstream: ``(model, num_ctx) -> (pool_name, base_url)``
+    :param routes: Returns the current routing table, served at ``/router/routes``
+    :param coalescer: Share one upstream call among identical in-flight deterministic
+        requests
+    :param cache: Response cache for deterministic requests; needs ``model_digest``
+    :param model_digest: ``model -> manifest digest`` (``None`` if the model isn't on
+        the Volume)
+    :param cache_by_default: Use ``cache`` for every deterministic request; otherwise
+        only for requests sending ``x-response-cache: 1`` (``x-response-cache: 0``
+        always opts out)
+    :param embedder: Micro-batch ``/api/embed`` and ``/v1/embeddings`` calls
+    :param affinity: Per-pool prefix-affinity routers; pools listed here are served by
+        the replica chosen for the conversation instead of the pool's base URL. A
+        replica that fails to connect or answers 5xx is marked down until it passes a
+        health check
+    :param admission: Per-model concurrency limits and bounded queue; requests that
+        can't be admitted get 429/503 with ``Retry-After``. A coalesced flight
+        takes one slot, acquired by the caller that leads it
+    :param metrics: Per-model TTFT/prefill/decode/load histograms, served at
+        ``/metrics``
+    :param residency: ``(pool, upstream) -> ResidencyManager`` (or ``None`` to leave
+        the upstream unmanaged); consulted before each generative request
+    """
+    proxy = proxy or UpstreamProxy()
+    app = FastAPI(title="ollama-router")
+    managers: dict[str, ResidencyManager] = {}
+
+    @app.get("/router/routes")
+    async def current_routes():
+        return JSONResponse(routes())
+
+    @app.get("/router/stats")
+    async def stats():
+        return JSONResponse(
+            {
+                "coalescing": coalescer.stats() if coalescer else None,
+                "cache": cache.stats() if cache else None,
+                "embeddings": embedder.stats() if embedder else None,
+                "affinity": {pool: a.stats() for pool, a in (affinity or {}).items()},
+                "admission": admission.stats() if admission else None,
+                "residency": {upstream: m.stats() for upstream, m in managers.items()},
+            }
+        )
+
+    @app.get("/router/queue")
+    async def queue():
+        """Queue depth and wait times per model, for autoscalers and clients."""
+        return JSONResponse(admission.stats() if admission else {})
+
+    @app.get("/metrics")
+    async def prometheus():
+        return PlainTextResponse(
+            metrics.render() if metrics else "", media_type="text/plain; version=0.0.4"
+        )
+
+    @app.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
+    )
+    async def route(request: Request, path: str):
+        body = await request.body()
+        payload = parse_body(body)
+        model = payload.get("model") if payload else None
+        # First sight of a model reads its GGUF header; keep that off the event loop.
+        pool, upstream = await run_in_threadpool(
+            choose_upstream, model, requested_context(payload)
+        )
+        if (
+            embedder is not None
+            and request.method == "POST"
+            and batchable(path, payload)
+        ):
+            headers = {"x-ollama-pool": pool}
+            if admission is not None and model:
+                try:
+                    queued = await admission.acquire(model)
+                except Rejected as exc:
+                    return JSONResponse(
+                        {"error": exc.reason},
+                        status_code=exc.status_code,
+                        headers={"Retry-After": str(exc.retry_after), **headers},
+                    )
+                headers["x-queue-wait-ms"] = str(round(queued * 1000))
+            started = time.perf_counter()
+            try:
+                digest = (
+                    await run_in_threadpool(model_digest, model)
+                    if model_digest
+                    else None
+                )
+                result = await handle_embed(embedder, upstream, path, payload, digest)
+            except UpstreamError as exc:
+                return Response(
+                    exc.body,
+                    status_code=exc.status_code,
+                    media_type="application/json",
+                    headers=headers,
+                )
+            finally:
+                if admission is not None and model:
+                    admission.release(model, time.perf_counter() - started)
+            return JSONResponse(result, headers=headers)
+
+        key = canonical_key(path, payload) if request.method == "POST" else None
+        digest = None
+        if key and cache is not None and model_digest is not None:
+            opt = request.headers.get("x-response-cache")
+            if opt == "1" or (cache_by_default and opt != "0"):
+                digest = await run_in_threadpool(model_digest, model)
+        if digest is not None:
+            hit = await run_in_threadpool(cache.get, model, digest, key)
+            if hit is not None:
+                response = StreamingResponse(
+                    iter(list(hit.chunks())),
+                    status_code=hit.status_code,
+                    media_type=hit.content_type,
+                )
+                response.headers["x-cache"] = "hit"
+                response.headers["x-ollama-pool"] = pool
+                return response
+
+        on_close: list[Callable[[float | None, float], None]] = []
+        queued_seconds = None
+        coalesced = key is not None and coalescer is not None
+        # A coalesced request is admitted by whichever caller leads its flight.
+        if admission is not None and model and not coalesced:
+            try:
+                queued_seconds = await admission.acquire(model)
+            except Rejected as exc:
+                return JSONResponse(
+                    {"error": exc.reason},
+                    status_code=exc.status_code,
+                    headers={
+                        "Retry-After": str(exc.retry_after),
+                        "x-ollama-pool": pool,
+                    },
+                )
+            on_close.append(lambda _ttfb, elapsed: admission.release(model, elapsed))
+        pool_affinity = None
+        if affinity and pool in affinity:
+            conversation = prefix_key(path, payload)
+            upstream, prefix_hit = affinity[pool].acquire(conversation)
+            replica, pool_affinity = upstream, affinity[pool]
+            on_close.append(
+                lambda ttfb, _elapsed: pool_affinity.release(
+                    replica, prefix_hit if conversation else None, ttfb
+                )
+            )
+        manager = None
+        if residency is not None and model and path.strip("/") in GENERATIVE_PATHS:
+            manager = residency(pool, upstream)
+        resident = None
+        started = time.perf_counter()
+        try:
+            if manager is not None:
+                managers[upstream] = manager
+                resident = await manager.before_request(model)
+                on_close.append(
+                    lambda ttfb, _elapsed: manager.after_request(model, resident, ttfb)
+                )
+            if not coalesced:
+                opened = await proxy.open(request, upstream, path, body)
+                status, headers, stream = (
+                    opened.status_code,
+                    opened.headers,
+                    opened.body,
+                )
+                background = BackgroundTask(opened.close)
+                shared = None
+            else:
+                queued: list[float] = []
+
+                def open_upstream() -> Awaitable[Upstream]:
+                    return proxy.open(request, upstream, path, body)
+
+                if admission is not None and model:
+                    open_upstream = _admitted(admission, model, open_upstream, queued)
+                status, headers, stream, shared = await coalescer.open(
+                    key, open_upstream
+                )
+                background = None
+                queued_seconds = queued[0] if queued else None
+        except BaseException as exc:
+            if pool_affinity is not None and isinstance(exc, httpx.HTTPError):
+                pool_affinity.mark_down(upstream)
+            for callback in on_close:
+                callback(None, time.perf_counter() - started)
+            if isinstance(exc, Rejected):
+                return JSONResponse(
+                    {"error": exc.reason},
+                    status_code=exc.status_code,
+                    headers={
+                        "Retry-After": str(exc.retry_after),
+                        "x-ollama-pool": pool,
+                    },
+                )
+            raise
+        if pool_affinity is not None and status >= 500:
+            pool_affinity.mark_down(upstream)
+        if metrics is not None and model and status == 200 and not shared:
+            if path.strip("/") in GENERATIVE_PATHS:
+                stream = metrics.watch(stream, model, started)
+        if on_close:
+            stream = _watch(stream, started, on_close)
+        if digest is not None and status == 200:
+            # Coalesced waiters all see the same bytes; only the caller that
+            # went upstream needs to store them.
+            if not shared:
+
+                async def store(entry: CachedResponse) -> None:
+                    await run_in_threadpool(cache.put, model, digest, key, entry)
+
+                stream = cache.tee(
+                    stream, status, headers.get("content-type", ""), store
+                )
+        response = StreamingResponse(
+            stream, status_code=status, headers=headers, background=background
+        )
+        if shared is not None:
+            response.headers["x-coalesced"] = "1" if shared else "0"
+        if digest is not None:
+            response.headers["x-cache"] = "miss"
+        if resident is not None:
+            response.headers["x-model-resident"] = "1" if resident else "0"
+        if queued_seconds is not None:
+            response.headers["x-queue-wait-ms"] = str(round(queued_seconds * 1000))
+        response.headers["x-ollama-pool"] = pool
+        return response
+
+    return app
+
+
+def passthrough_response(opened: Upstream) -> StreamingResponse:
+    return StreamingResponse(
+        opened.body,
+        status_code=opened.status_code,
+        headers=opened.headers,
+        background=BackgroundTask(opened.close),
+    )
+
+
+async def translated_response(
+    opened: Upstream,
+    engine: str,
+    path: str,
+    converted: dict[str, Any],
+    model: str,
+    started: float,
+) -> Response:
+    """The client-protocol response for an upstream sent a ``translate_request`` body.
+
+    :param model: Model name to report back (what the client asked for)
+    """
+    if opened.status_code != 200:
+        return passthrough_response(opened)
+    chat = path.strip("/") in ("api/chat", "v1/chat/completions")
+    if converted["stream"]:
+        if engine == "ollama":
+            stream, media_type = (
+                ndjson_to_sse(opened.body, model, chat),
+                "text/event-stream",
+            )
+        else:
+            stream, media_type = (
+                sse_to_ndjson(opened.body, model, chat),
+                "application/x-ndjson",
+            )
+        return StreamingResponse(
+            stream, media_type=media_type, background=BackgroundTask(opened.close)
+        )
+    try:
+        reply = json.loads(b"".join([chunk async for chunk in opened.body]))
+    finally:
+        await opened.close()
+    if engine == "ollama":
+        return JSONResponse(ollama_to_openai_response(reply, model, chat))
+    return JSONResponse(
+        openai_to_ollama_response(reply, model, chat, time.perf_counter() - started)
+    )
+
+
+def create_translation_app(
+    upstream: str, engine: str, proxy: UpstreamProxy | None = None
+) -> FastAPI:
+    """Serve both Ollama's native API and the OpenAI API in front of a single engine.
+
+    Requests already in the engine's protocol (and every other path) are
+    passed through untouched; the other protocol's chat/generate calls are
+    translated, streaming chunk by chunk.
+
+    :param upstream: Base URL of the engine
+    :param engine: ``"ollama"`` (native NDJSON API) or ``"openai"`` (OpenAI-compatible
+        SSE, e.g. vLLM)
+    """
+    if engine not in ("ollama", "openai"):
+        raise ValueError(f"unknown engine {engine!r}")
+    proxy = proxy or UpstreamProxy()
+    app = FastAPI(title="ollama-translate")
+
+    @app.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
+    )
+    async def route(request: Request, path: str):
+        body = await request.body()
+        payload = parse_body(body)
+        plan = (
+            translate_request(engine, path, payload)
+            if request.method == "POST"
+            else None
+        )
+        if plan is None:
+            return await proxy.forward(request, upstream, path, body)
+        target, converted = plan
+        started = time.perf_counter()
+        opened = await proxy.open(
+            request, upstream, target, json.dumps(converted).encode()
+        )
+        return await translated_response(
+            opened, engine, path, converted, payload["model"], started
+        )
+
+    return app
+
+
+def create_gateway_app(
+    gateway: Gateway,
+    proxy: UpstreamProxy | None = None,
+    hedge: HedgePolicy | None = None,
+    hedge_by_default: bool = False,
+) -> FastAPI:
+    """One endpoint for every engine; each request goes to the fastest backend.
+
+    Clients may speak either protocol; requests are translated when the chosen
+    backend speaks the other one; backends that can't answer the path at all
+    (``/api/embed`` on vLLM) are skipped, and requests without a model go to
+    the first backend that can. ``GET /gateway/backends`` shows each backend's
+    live state.
+
+    :param hedge: Hedge slow streaming requests to the next-best backend; learns
+        from every streaming request, and its stats are under ``hedging`` in
+        ``/gateway/backends``
+    :param hedge_by_default: Hedge every streaming request; otherwise only those
+        sending ``x-hedge: 1`` (``x-hedge: 0`` always opts out)
+    """
+    proxy = proxy or UpstreamProxy()
+    app = FastAPI(title="ollama-gateway")
+
+    @app.get("/gateway/backends")
+    async def backends():
+        return JSONResponse(
+            {**gateway.stats(), "hedging": hedge.stats() if hedge else None}
+        )
+
+    @app.get("/v1/models")
+    async def models():
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": [
+                    {"id": m, "object": "model", "owned_by": "gateway"}
+                    for m in gateway.models()
+                ],
+            }
+        )
+
+    @app.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
+    )
+    async def route(request: Request, path: str):
+        body = await request.body()
+        payload = parse_body(body)
+        model = payload.get("model") if payload else None
+        if not model:
+            # /api/tags, /api/version, ...: the first backend speaking the protocol.
+            backend = next(
+                (b for b in gateway.backends if serves(b.engine, path)), None
+            )
+            if backend is None:
+                return JSONResponse(
+                    {"error": f"no backend serves /{path}"}, status_code=404
+                )
+            return await proxy.forward(request, backend.url, path, body)
+        candidates = [
+            (backend, name)
+            for backend, name in gateway.candidates(model, output_tokens(payload))
+            if serves(backend.engine, path)
+        ]
+        if not candidates:
+            return JSONResponse(
+                {"error": f"no backend serves {model!r} on /{path}"}, status_code=404
+            )
+
+        plans: dict[int, tuple[str, dict[str, Any]] | None] = {}
+
+        async def start(index: int, is_hedge: bool) -> Upstream:
+            backend, engine_model = candidates[index]
+            renamed = {**payload, "model": engine_model}
+            plans[index] = translate_request(backend.engine, path, renamed)
+            target, outgoing = plans[index] or (path, renamed)
+            gateway.acquire(
+                backend, fallback=index > 0 and not is_hedge, hedge=is_hedge
+            )
+            try:
+                opened = await proxy.open(
+                    request, backend.url, target, json.dumps(outgoing).encode()
+                )
+            except httpx.HTTPError:
+                gateway.failed(backend)
+                raise
+            except BaseException:
+                gateway.release(backend)
+                raise
+            if opened.status_code in RETRY_STATUSES:
+                gateway.failed(backend)
+                return opened
+            close = opened.close
+
+            async def release_and_close() -> None:
+                gateway.release(backend)
+                await close()
+
+            opened.close = release_and_close
+            return opened
+
+        streaming = is_streaming(path, payload)
+        opt = request.headers.get("x-hedge")
+        winner = await race(
+            start,
+            len(candidates),
+            hedge if streaming else None,
+            hedge=opt == "1" or (hedge_by_default and opt != "0"),
+        )
+        backend, opened, plan = (
+            candidates[winner.index][0],
+            winner.opened,
+            plans[winner.index],
+        )
+        if opened.status_code == 200:
+            opened.body = tap(
+                opened.body,
+                winner.started,
+                lambda tail, ttfb, elapsed: gateway.completed(
+                    backend, model, tail, ttfb, elapsed
+                ),
+            )
+        if plan is None:
+            response = passthrough_response(opened)
+        else:
+            response = await translated_response(
+                opened, backend.engine, path, plan[1], model, winner.started
+            )
+        response.headers["x-gateway-backend"] = backend.name
+        if winner.hedge:
+            response.headers["x-hedged"] = "1"
+        return response
+
+    return app
+
+
+def create_engine_app(
+    upstream: str,
+    lifecycle: EngineLifecycle | None = None,
+    adapters: AdapterManager | None = None,
+    proxy: UpstreamProxy | None = None,
+) -> FastAPI:
+    """Pass-through in front of a vLLM engine in the same container.
+
+    With ``lifecycle``, every POST counts as activity and wakes a sleeping
+    engine before it is forwarded; responses that had to wait carry
+    ``x-wake-ms``. Health checks and other GETs pass through without waking
+    it. ``GET /lifecycle`` shows the sleep/wake transitions.
+
+    With ``adapters``, a request whose ``model`` names a LoRA adapter on the
+    Volume waits for a batch slot and registers the adapter first if needed
+    (``x-lora-load-ms``). ``GET /lora/adapters`` lists them with the cache's
+    hit rate and load times.
+
+    ``ENGINE_PRIVATE_PATHS`` answer 404: putting the engine to sleep or
+    swapping adapters behind ``lifecycle``'s or ``adapters``' back would leave
+    them tracking an engine that no longer matches.
+    """
+    proxy = proxy or UpstreamProxy()
+    app = FastAPI(title="vllm-engine")
+
+    @app.get("/lifecycle")
+    async def lifecycle_state():
+        return JSONResponse(lifecycle.as_dict() if lifecycle else None)
+
+    @app.get("/lora/adapters")
+    async def adapter_state():
+        if adapters is None:
+            return JSONResponse(None)
+        return JSONResponse({"available": adapters.available(), **adapters.stats()})
+
+    @app.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS"]
+    )
+    async def route(request: Request, path: str):
+        if posixpath.normpath(f"/{path}").strip("/") in ENGINE_PRIVATE_PATHS:
+            return JSONResponse({"error": "not found"}, status_code=404)
+        body = await request.body()
+        if request.method != "POST":
+            return await proxy.forward(request, upstream, path, body)
+        payload = parse_body(body)
+        model = payload.get("model") if payload else None
+        adapter = model if adapters is not None and adapters.path(model or "") else None
+        waited = await run_in_threadpool(lifecycle.begin) if lifecycle else 0.0
+        loaded = 0.0
+        acquired = False
+
+        async def end() -> None:
+            if lifecycle:
+                lifecycle.end()
+            if acquired:
+                await adapters.release(adapter)
+
+        try:
+            if adapter:
+                loaded = await adapters.acquire(adapter)
+                acquired = True
+            opened = await proxy.open(request, upstream, path, body)
+        except BaseException:
+            await end()
+            raise
+        close = opened.close
+
+        async def end_and_close() -> None:
+            await end()
+            await close()
+
+        opened.close = end_and_close
+        response = passthrough_response(opened)
+        if waited >= 0.001:
+            response.headers["x-wake-ms"] = str(round(waited * 1000))
+        if loaded:
+            response.headers["x-lora-load-ms"] = str(round(loaded * 1000))
+        return response
+
+    return app
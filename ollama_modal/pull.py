@@ -0,0 +1,498 @@
+"""Pull Ollama models into the model store with parallel, resumable range requests.
+
+Each blob is downloaded to ``blobs/sha256-<hex>-partial`` in fixed-size chunks
+fetched concurrently with HTTP ``Range`` requests. Finished chunk indices are
+recorded in a ``-partial.json`` sidecar after every chunk, so a pull cut off by
+the container timeout picks up where it stopped. A hasher follows the
+contiguous finished prefix while chunks are still arriving, so the sha256 check
+is done by the time the last byte lands. The manifest is written last: a model
+only becomes visible to ``ollama`` once all of its blobs are in place.
+
+``pull_many`` pulls several models at once: manifests are resolved first, the
+blobs they share are fetched once, and a per-digest lock makes a second pull of
+a blob that is already downloading wait for it instead of fetching it again.
+``collect_garbage`` deletes blobs that no manifest references.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from ollama_modal.manifests import (
+    Layer,
+    ModelRef,
+    blob_path,
+    iter_manifests,
+    manifest_layers,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+MANIFEST_ACCEPT = "application/vnd.docker.distribution.manifest.v2+json"
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+class DigestMismatch(RuntimeError):
+    """A downloaded blob didn't hash to the digest the manifest promised."""
+
+
+@dataclass
+class Progress:
+    """Snapshot passed to the progress callback."""
+
+    model: str
+    digest: str
+    completed: int
+    total: int
+    seconds: float
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.completed / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class PullResult:
+    model: str
+    downloaded: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    bytes_downloaded: int = 0
+    seconds: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_downloaded / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "downloaded": self.downloaded,
+            "skipped": self.skipped,
+            "bytes_downloaded": self.bytes_downloaded,
+            "seconds": round(self.seconds, 3),
+            "mb_per_second": round(self.bytes_per_second / 1e6, 2),
+        }
+
+
+@dataclass
+class PullPlan:
+    """What a batch pull has to do: resolved manifests and the blobs still missing.
+
+    ``missing`` is keyed by digest, so a layer shared by several models appears once.
+    """
+
+    manifests: dict[str, tuple[dict, bytes]]
+    missing: dict[str, Layer] = field(default_factory=dict)
+    present: set[str] = field(default_factory=set)
+
+    @property
+    def shared(self) -> set[str]:
+        """Digests referenced by more than one of the requested models."""
+        seen: set[str] = set()
+        shared = set()
+        for manifest, _ in self.manifests.values():
+            digests = {layer.digest for layer in manifest_layers(manifest)}
+            shared |= seen & digests
+            seen |= digests
+        return shared
+
+    def as_dict(self) -> dict:
+        return {
+            "models": sorted(self.manifests),
+            "missing": sorted(self.missing),
+            "present": len(self.present),
+            "shared": len(self.shared),
+            "bytes_missing": sum(layer.size for layer in self.missing.values()),
+        }
+
+
+@dataclass
+class BatchPullResult:
+    models: list[str]
+    downloaded: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    shared: int = 0
+    bytes_downloaded: int = 0
+    seconds: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_downloaded / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "models": self.models,
+            "downloaded": self.downloaded,
+            "skipped": self.skipped,
+            "shared": self.shared,
+            "bytes_downloaded": self.bytes_downloaded,
+            "seconds": round(self.seconds, 3),
+            "mb_per_second": round(self.bytes_per_second / 1e6, 2),
+        }
+
+
+@dataclass
+class GarbageReport:
+    removed: list[str] = field(default_factory=list)
+    bytes_freed: int = 0
+    kept: int = 0
+    dry_run: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            "removed": self.removed,
+            "bytes_freed": self.bytes_freed,
+            "kept": self.kept,
+            "dry_run": self.dry_run,
+        }
+
+
+class BlobLocks:
+    """One lock per digest, so concurrent pulls in a process download each blob once."""
+
+    def __init__(self) -> None:
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, digest: str) -> Iterator[None]:
+        with self._guard:
+            lock = self._locks.setdefault(digest, threading.Lock())
+        with lock:
+            yield
+
+
+# Shared by every puller in the process unless one is passed in.
+BLOB_LOCKS = BlobLocks()
+
+
+def registry_base(ref: ModelRef, registry_url: str | None = None) -> str:
+    base = registry_url or f"https://{ref.host}"
+    return f"{base.rstrip('/')}/v2/{ref.namespace}/{ref.repo}"
+
+
+class _StreamingHasher:
+    """sha256 over the contiguous prefix of finished chunks, updated as they finish."""
+
+    def __init__(self, path: Path, chunk_size: int, n_chunks: int) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        self.n_chunks = n_chunks
+        self.done = [False] * n_chunks
+        self.next = 0
+        self._sha = hashlib.sha256()
+        self._lock = threading.Lock()
+
+    def complete(self, index: int) -> None:
+        with self._lock:
+            self.done[index] = True
+            if self.next >= self.n_chunks or not self.done[self.next]:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self.next * self.chunk_size)
+                while self.next < self.n_chunks and self.done[self.next]:
+                    self._sha.update(f.read(self.chunk_size))
+                    self.next += 1
+
+    def hexdigest(self) -> str:
+        with self._lock:
+            assert (
+                self.next == self.n_chunks
+            ), "hash requested before all chunks finished"
+            return self._sha.hexdigest()
+
+
+class RegistryPuller:
+    """Download models from an Ollama (OCI) registry into ``root``.
+
+    :param root: The ``OLLAMA_MODELS`` directory (the mounted Volume)
+    :param registry_url: Override the registry origin (defaults to ``https://<host>``);
+        used to point tests at a local stand-in registry
+    :param chunk_size: Bytes per range request
+    :param max_connections: Concurrent range requests per blob
+    :param max_blobs: Blobs ``pull_many`` downloads concurrently
+    :param progress: Called from worker threads after every finished chunk
+    :param locks: Per-digest locks; defaults to the process-wide ``BLOB_LOCKS``
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike,
+        registry_url: str | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        max_connections: int = 8,
+        max_blobs: int = 4,
+        progress: Callable[[Progress], None] | None = None,
+        client: httpx.Client | None = None,
+        locks: BlobLocks | None = None,
+    ) -> None:
+        import httpx
+
+        self.root = Path(root)
+        self.registry_url = registry_url
+        self.chunk_size = chunk_size
+        self.max_connections = max_connections
+        self.max_blobs = max_blobs
+        self.progress = progress
+        self.locks = locks or BLOB_LOCKS
+        self.client = client or httpx.Client(
+            follow_redirects=True,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections * max(2, max_blobs)),
+        )
+
+    def fetch_manifest(self, model: str) -> tuple[dict, bytes]:
+        ref = ModelRef.parse(model)
+        response = self.client.get(
+            f"{registry_base(ref, self.registry_url)}/manifests/{ref.tag}",
+            headers={"Accept": MANIFEST_ACCEPT},
+        )
+        response.raise_for_status()
+        return response.json(), response.content
+
+    def pull(self, model: str, only: set[str] | None = None) -> PullResult:
+        """Pull ``model``, skipping blobs already on disk at the expected size.
+
+        :param only: Restrict downloads to these digests (e.g. the blobs a
+            verifier reported as missing or corrupt)
+        """
+        start = time.perf_counter()
+        ref = ModelRef.parse(model)
+        manifest, raw = self.fetch_manifest(model)
+        result = PullResult(model)
+        for layer in manifest_layers(manifest):
+            path = blob_path(self.root, layer.digest)
+            wanted = only is None or layer.digest in only
+            if not wanted or (path.exists() and path.stat().st_size == layer.size):
+                result.skipped.append(layer.digest)
+                continue
+            result.bytes_downloaded += self.download_blob(ref, layer)
+            result.downloaded.append(layer.digest)
+        self.write_manifest(ref, raw)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def write_manifest(self, ref: ModelRef, raw: bytes) -> None:
+        manifest_path = ref.manifest_path(self.root)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per writer: concurrent pulls of one model each rename their own file.
+        tmp = manifest_path.with_name(
+            f"{manifest_path.name}.{os.getpid()}-{threading.get_ident()}.tmp"
+        )
+        tmp.write_bytes(raw)
+        os.replace(tmp, manifest_path)
+
+    def is_present(self, layer: Layer) -> bool:
+        path = blob_path(self.root, layer.digest)
+        try:
+            return path.stat().st_size == layer.size
+        except FileNotFoundError:
+            return False
+
+    def plan(self, models: list[str]) -> PullPlan:
+        """Resolve every manifest (concurrently) and find the blobs not yet on disk."""
+        models = list(dict.fromkeys(models))
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(models)))) as pool:
+            manifests = dict(zip(models, pool.map(self.fetch_manifest, models)))
+        plan = PullPlan(manifests)
+        for manifest, _ in manifests.values():
+            for layer in manifest_layers(manifest):
+                if layer.digest in plan.missing or layer.digest in plan.present:
+                    continue
+                if self.is_present(layer):
+                    plan.present.add(layer.digest)
+                else:
+                    plan.missing[layer.digest] = layer
+        return plan
+
+    def pull_many(self, models: list[str] | PullPlan) -> BatchPullResult:
+        """Pull several models, downloading each missing blob once.
+
+        Up to ``max_blobs`` blobs download at a time.
+
+        Manifests are written only after every blob is in place, so a failed
+        batch leaves no half-pulled model visible; rerunning it resumes the
+        partial blobs.
+
+        :param models: Model names, or a ``plan`` computed earlier
+        """
+        start = time.perf_counter()
+        plan = models if isinstance(models, PullPlan) else self.plan(models)
+        result = BatchPullResult(list(plan.manifests), shared=len(plan.shared))
+        result.skipped.extend(sorted(plan.present))
+        refs = {
+            layer.digest: ModelRef.parse(model)
+            for model, (manifest, _) in plan.manifests.items()
+            for layer in manifest_layers(manifest)
+        }
+        lock = threading.Lock()
+
+        def fetch(layer: Layer) -> None:
+            with self.locks.hold(layer.digest):
+                # Another pull may have finished this blob while we waited.
+                if self.is_present(layer):
+                    with lock:
+                        result.skipped.append(layer.digest)
+                    return
+                nbytes = self.download_blob(refs[layer.digest], layer)
+            with lock:
+                result.downloaded.append(layer.digest)
+                result.bytes_downloaded += nbytes
+
+        with ThreadPoolExecutor(max_workers=self.max_blobs) as pool:
+            # Largest first, so the long downloads start right away.
+            layers = sorted(plan.missing.values(), key=lambda layer: -layer.size)
+            for future in [pool.submit(fetch, layer) for layer in layers]:
+                future.result()
+        for model, (_, raw) in plan.manifests.items():
+            self.write_manifest(ModelRef.parse(model), raw)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def download_blob(self, ref: ModelRef, layer: Layer) -> int:
+        """Download one blob with resumable parallel range requests.
+
+        :return: Bytes fetched
+        """
+        final = blob_path(self.root, layer.digest)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        partial = final.with_name(final.name + "-partial")
+        sidecar = final.with_name(final.name + "-partial.json")
+        n_chunks = max(1, -(-layer.size // self.chunk_size))
+
+        finished: set[int] = set()
+        if partial.exists() and sidecar.exists():
+            state = json.loads(sidecar.read_text())
+            if (
+                state.get("size") == layer.size
+                and state.get("chunk_size") == self.chunk_size
+            ):
+                finished = set(state["chunks"])
+        if not finished:
+            with open(partial, "wb") as f:
+                f.truncate(layer.size)
+
+        url = f"{registry_base(ref, self.registry_url)}/blobs/{layer.digest}"
+        hasher = _StreamingHasher(partial, self.chunk_size, n_chunks)
+        lock = threading.Lock()
+        completed = sum(
+            min(self.chunk_size, layer.size - i * self.chunk_size) for i in finished
+        )
+        fetched = 0
+        start = time.perf_counter()
+
+        def record(index: int, nbytes: int, resumed: bool = False) -> None:
+            nonlocal completed, fetched
+            with lock:
+                finished.add(index)
+                if not resumed:
+                    completed += nbytes
+                    fetched += nbytes
+                    sidecar.write_text(
+                        json.dumps(
+                            {
+                                "size": layer.size,
+                                "chunk_size": self.chunk_size,
+                                "chunks": sorted(finished),
+                            }
+                        )
+                    )
+                snapshot = Progress(
+                    ref.short,
+                    layer.digest,
+                    completed,
+                    layer.size,
+                    time.perf_counter() - start,
+                )
+            hasher.complete(index)
+            if self.progress is not None and not resumed:
+                self.progress(snapshot)
+
+        def fetch(index: int) -> None:
+            lo = index * self.chunk_size
+            hi = min(layer.size, lo + self.chunk_size) - 1
+            headers = {"Range": f"bytes={lo}-{hi}"} if layer.size else {}
+            fd = os.open(partial, os.O_WRONLY)
+            try:
+                offset = lo
+                with self.client.stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206 and n_chunks > 1:
+                        raise RuntimeError(
+                            f"registry ignored Range request for {layer.digest}"
+                        )
+                    for data in response.iter_bytes(1024 * 1024):
+                        offset += os.pwrite(fd, data, offset)
+                if offset != hi + 1:
+                    raise RuntimeError(
+                        f"short read for {layer.digest} chunk {index}:"
+                        f" {offset - lo} bytes"
+                    )
+            finally:
+                os.close(fd)
+            record(index, hi + 1 - lo)
+
+        for index in sorted(finished):
+            record(index, 0, resumed=True)
+        todo = [i for i in range(n_chunks) if i not in finished]
+        with ThreadPoolExecutor(max_workers=self.max_connections) as pool:
+            for future in [pool.submit(fetch, i) for i in todo]:
+                future.result()
+
+        algo, _, expected = layer.digest.partition(":")
+        actual = hasher.hexdigest()
+        if algo != "sha256" or actual != expected:
+            partial.unlink(missing_ok=True)
+            sidecar.unlink(missing_ok=True)
+            raise DigestMismatch(
+                f"{layer.digest}: downloaded data hashes to sha256:{actual}"
+            )
+        os.replace(partial, final)
+        sidecar.unlink(missing_ok=True)
+        return fetched
+
+
+def collect_garbage(
+    root: str | os.PathLike, grace_seconds: float = 3600.0, dry_run: bool = False
+) -> GarbageReport:
+    """Delete blobs (and abandoned ``-partial`` downloads) that no manifest references.
+
+    A pull writes its manifest last, so blobs of a pull still in progress look
+    unreferenced; anything modified within ``grace_seconds`` is kept. An
+    unreadable manifest raises rather than letting its blobs be collected.
+    """
+    root = Path(root)
+    referenced = set()
+    for _, path in iter_manifests(root):
+        try:
+            manifest = json.loads(path.read_text())
+        except FileNotFoundError:
+            continue
+        referenced.update(layer.digest for layer in manifest_layers(manifest))
+    report = GarbageReport(dry_run=dry_run)
+    blobs = root / "blobs"
+    if not blobs.is_dir():
+        return report
+    cutoff = time.time() - grace_seconds
+    for path in sorted(blobs.iterdir()):
+        digest = path.name.split("-partial")[0].replace("-", ":", 1)
+        stat = path.stat()
+        # Partial downloads of referenced blobs are kept too: a retry resumes them.
+        if digest in referenced or stat.st_mtime > cutoff:
+            report.kept += 1
+            continue
+        report.removed.append(path.name)
+        report.bytes_freed += stat.st_size
+        if not dry_run:
+            path.unlink(missing_ok=True)
+    return report
@@ -0,0 +1,287 @@
+"""Decide which models stay loaded on an Ollama server with a fixed VRAM budget.
+
+Left alone, Ollama loads whatever a request asks for and unloads whatever it
+must to make room, so a container serving a mix of models can spend most of
+its time in ``load_duration``. ``ResidencyManager`` sits in front of one
+upstream and:
+
+* keeps its view of what is loaded in sync with ``/api/ps`` (using the
+  reported ``size_vram`` once a model has been loaded, the manifest-based
+  footprint before that);
+* on a miss, evicts least-recently (``policy="lru"``) or least-frequently
+  (``"lfu"``) used models with ``keep_alive: 0`` until the new one fits, never
+  touching pinned models, hot models (at least ``hot_share`` of recent
+  requests) or models with requests in flight;
+* after each request, preloads the most requested models of the recent window
+  that are not resident, if they fit without evicting anything.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+from ollama_modal.manifests import ModelRef
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def model_key(name: str) -> str:
+    """Normalise ``llama3.2`` and ``llama3.2:latest`` to the name ``/api/ps`` uses."""
+    return ModelRef.parse(name).short
+
+
+class OllamaControl:
+    """The three Ollama calls the manager needs, against one base URL."""
+
+    def __init__(self, client: "httpx.AsyncClient", base_url: str) -> None:
+        self.client = client
+        self.base_url = base_url.rstrip("/")
+
+    async def ps(self) -> dict[str, int]:
+        """Loaded models and their ``size_vram``."""
+        response = await self.client.get(f"{self.base_url}/api/ps")
+        response.raise_for_status()
+        return {
+            m["name"]: int(m.get("size_vram") or m.get("size") or 0)
+            for m in response.json()["models"]
+        }
+
+    async def load(self, model: str) -> None:
+        # A generate call without a prompt only loads the model.
+        response = await self.client.post(
+            f"{self.base_url}/api/generate", json={"model": model, "keep_alive": -1}
+        )
+        response.raise_for_status()
+
+    async def unload(self, model: str) -> None:
+        response = await self.client.post(
+            f"{self.base_url}/api/generate", json={"model": model, "keep_alive": 0}
+        )
+        response.raise_for_status()
+
+
+@dataclass
+class ModelStats:
+    hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    preloads: int = 0
+    evictions: int = 0
+    load_seconds: float = 0.0
+
+
+class ResidencyManager:
+    """VRAM-budgeted residency for the models served by one Ollama upstream.
+
+    :param budget_bytes: VRAM the loaded models may use together
+    :param footprint: ``model -> estimated bytes`` (``None`` if unknown) for models not
+        yet loaded
+    :param control: Issues ``/api/ps`` and load/unload calls, e.g. ``OllamaControl``
+    :param pinned: Models that are never evicted
+    :param policy: ``"lru"`` or ``"lfu"`` victim selection
+    :param window: Seconds of request history used for hotness and prediction
+    :param hot_share: Models with at least this share of the window are never evicted
+    :param preload_top: How many of the most requested models to keep preloaded
+    :param refresh_interval: Seconds before the ``/api/ps`` view is considered stale
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        footprint: Callable[[str], int | None],
+        control: OllamaControl,
+        pinned: Iterable[str] = (),
+        policy: str = "lru",
+        window: float = 300.0,
+        hot_share: float = 0.3,
+        preload_top: int = 2,
+        refresh_interval: float = 10.0,
+    ) -> None:
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"unknown eviction policy {policy!r}")
+        self.budget_bytes = budget_bytes
+        self.footprint = footprint
+        self.control = control
+        self.pinned = {model_key(m) for m in pinned}
+        self.policy = policy
+        self.window = window
+        self.hot_share = hot_share
+        self.preload_top = preload_top
+        self.refresh_interval = refresh_interval
+        self.resident: dict[str, int] = {}
+        self._measured: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+        self._in_flight: dict[str, int] = {}
+        self._recent: deque[tuple[float, str]] = deque()
+        self._refreshed = float("-inf")
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self.models: dict[str, ModelStats] = {}
+
+    def _stats(self, model: str) -> ModelStats:
+        return self.models.setdefault(model, ModelStats())
+
+    def _size(self, model: str) -> int:
+        size = self._measured.get(model) or self.footprint(model)
+        return size or 0
+
+    def _counts(self) -> dict[str, int]:
+        cutoff = time.monotonic() - self.window
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+        counts: dict[str, int] = {}
+        for _, model in self._recent:
+            counts[model] = counts.get(model, 0) + 1
+        return counts
+
+    def protected(self) -> set[str]:
+        """Models that can't be evicted right now: pinned, hot, or busy."""
+        counts = self._counts()
+        total = sum(counts.values())
+        hot = {m for m, n in counts.items() if total and n / total >= self.hot_share}
+        busy = {m for m, n in self._in_flight.items() if n}
+        return self.pinned | hot | busy
+
+    def _victims(self, needed: int) -> list[str]:
+        """Evictable models, in eviction order, until ``needed`` bytes would be free."""
+        free = self.budget_bytes - sum(self.resident.values())
+        if free >= needed:
+            return []
+        protected = self.protected()
+        counts = self._counts()
+        candidates = [m for m in self.resident if m not in protected]
+        if self.policy == "lfu":
+            candidates.sort(
+                key=lambda m: (counts.get(m, 0), self._last_used.get(m, 0.0))
+            )
+        else:
+            candidates.sort(key=lambda m: self._last_used.get(m, 0.0))
+        victims = []
+        for model in candidates:
+            if free >= needed:
+                break
+            victims.append(model)
+            free += self.resident[model]
+        return victims
+
+    async def refresh(self, force: bool = False) -> None:
+        """Re-read ``/api/ps`` if the cached view is older than ``refresh_interval``."""
+        if not force and time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        loaded = await self.control.ps()
+        self._measured.update(loaded)
+        self.resident = dict(loaded)
+        self._refreshed = time.monotonic()
+
+    async def _evict(self, model: str) -> None:
+        await self.control.unload(model)
+        self.resident.pop(model, None)
+        self._stats(model).evictions += 1
+
+    async def before_request(self, model: str) -> bool:
+        """Account a request for ``model`` and make room for it if it isn't loaded.
+
+        :return: Whether the model was already resident
+        """
+        model = model_key(model)
+        now = time.monotonic()
+        self._recent.append((now, model))
+        self._last_used[model] = now
+        self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        async with self._lock:
+            try:
+                await self.refresh()
+            except Exception:
+                # Can't see the server; let the request go through unmanaged.
+                return model in self.resident
+            stats = self._stats(model)
+            if model in self.resident:
+                stats.hits += 1
+                return True
+            stats.misses += 1
+            try:
+                for victim in self._victims(self._size(model)):
+                    await self._evict(victim)
+            except Exception:
+                self._refreshed = float("-inf")
+            # The request itself loads it; count it as resident so concurrent
+            # misses for other models don't plan with the same free space.
+            self.resident[model] = self._size(model)
+            self._refreshed = float("-inf")
+            return False
+
+    def after_request(self, model: str, hit: bool, ttfb: float | None) -> None:
+        """Finish a request; a miss's time to first byte is charged as load time."""
+        model = model_key(model)
+        self._in_flight[model] = max(0, self._in_flight.get(model, 0) - 1)
+        if not hit and ttfb is not None:
+            stats = self._stats(model)
+            stats.loads += 1
+            stats.load_seconds += ttfb
+        task = asyncio.get_running_loop().create_task(self.preload_predicted())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def predicted(self) -> list[str]:
+        """The window's most requested models that aren't loaded, hottest first."""
+        counts = self._counts()
+        top = sorted(counts, key=counts.get, reverse=True)[: self.preload_top]
+        return [m for m in top if m not in self.resident]
+
+    async def preload_predicted(self) -> list[str]:
+        """Load predicted models that fit in the free budget; returns those loaded."""
+        if self._lock.locked():
+            return []
+        loaded = []
+        async with self._lock:
+            try:
+                await self.refresh()
+                for model in self.predicted():
+                    size = self._size(model)
+                    if (
+                        not size
+                        or sum(self.resident.values()) + size > self.budget_bytes
+                    ):
+                        continue
+                    start = time.perf_counter()
+                    await self.control.load(model)
+                    stats = self._stats(model)
+                    stats.preloads += 1
+                    stats.load_seconds += time.perf_counter() - start
+                    self.resident[model] = size
+                    loaded.append(model)
+            except Exception:
+                # Preloading is opportunistic; the next request will retry.
+                self._refreshed = float("-inf")
+        return loaded
+
+    def stats(self) -> dict[str, Any]:
+        used = sum(self.resident.values())
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": used,
+            "resident": sorted(self.resident),
+            "pinned": sorted(self.pinned),
+            "policy": self.policy,
+            "models": {
+                model: {
+                    "hits": s.hits,
+                    "misses": s.misses,
+                    "loads": s.loads,
+                    "preloads": s.preloads,
+                    "evictions": s.evictions,
+                    "load_seconds": round(s.load_seconds, 3),
+                    "hit_rate": (
+                        round(s.hits / (s.hits + s.misses), 4)
+                        if s.hits + s.misses
+                        else 0.0
+                    ),
+                }
+                for model, s in self.models.items()
+            },
+        }
@@ -0,0 +1,159 @@
+"""Pick the cheapest GPU class that can hold a model, from on-Volume manifest sizes.
+
+A model's footprint is its weight blobs plus the KV cache Ollama allocates up
+front (``num_ctx`` tokens per parallel slot, sized from the GGUF header) plus a
+fixed allowance for the CUDA context and compute graph.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from ollama_modal.gguf import kv_bytes_per_token, read_metadata
+from ollama_modal.manifests import ModelRef, blob_path, manifest_layers, read_manifest
+
+GiB = 1024**3
+MODEL_MEDIA_TYPE = "application/vnd.ollama.image.model"
+PROJECTOR_MEDIA_TYPE = "application/vnd.ollama.image.projector"
+WEIGHT_MEDIA_TYPES = (MODEL_MEDIA_TYPE, PROJECTOR_MEDIA_TYPE)
+
+DEFAULT_NUM_CTX = 4096
+OVERHEAD_BYTES = 1 * GiB
+# Used when the GGUF header can't be read; roughly a 30B-class model with GQA.
+FALLBACK_KV_BYTES_PER_TOKEN = 256 * 1024
+
+
+@dataclass(frozen=True)
+class GpuPool:
+    """One GPU service class: a Modal class with its own container pool."""
+
+    name: str
+    gpu: str
+    vram_bytes: int
+    cost_per_hour: float
+
+
+POOLS = (
+    GpuPool("a10g", "A10G", 24 * GiB, 1.10),
+    GpuPool("h100", "H100", 80 * GiB, 3.95),
+)
+
+
+@dataclass(frozen=True)
+class Footprint:
+    weights_bytes: int
+    kv_bytes: int
+    overhead_bytes: int = OVERHEAD_BYTES
+
+    @property
+    def total_bytes(self) -> int:
+        return self.weights_bytes + self.kv_bytes + self.overhead_bytes
+
+
+@dataclass(frozen=True)
+class ModelSize:
+    """What the manifest tells us about a model, independent of context length."""
+
+    weights_bytes: int
+    kv_bytes_per_token: int
+
+    def footprint(self, num_ctx: int, num_parallel: int = 1) -> Footprint:
+        return Footprint(
+            self.weights_bytes, self.kv_bytes_per_token * num_ctx * num_parallel
+        )
+
+
+def model_size(root: str | os.PathLike, model: str) -> ModelSize | None:
+    """Weight sizes and KV geometry for ``model`` from the store; ``None`` if absent."""
+    manifest = read_manifest(root, model)
+    if manifest is None:
+        return None
+    weights = [
+        l for l in manifest_layers(manifest) if l.media_type in WEIGHT_MEDIA_TYPES
+    ]
+    kv = None
+    for layer in weights:
+        if layer.media_type != MODEL_MEDIA_TYPE:
+            continue
+        try:
+            kv = kv_bytes_per_token(read_metadata(blob_path(root, layer.digest)))
+        except (OSError, ValueError):
+            kv = None
+        break
+    return ModelSize(
+        weights_bytes=sum(l.size for l in weights),
+        kv_bytes_per_token=kv or FALLBACK_KV_BYTES_PER_TOKEN,
+    )
+
+
+def choose_pool(
+    footprint: Footprint, pools: tuple[GpuPool, ...] = POOLS, headroom: float = 0.92
+) -> GpuPool:
+    """Cheapest pool whose VRAM (times ``headroom``) fits; else the largest pool."""
+    fitting = [p for p in pools if footprint.total_bytes <= p.vram_bytes * headroom]
+    if fitting:
+        return min(fitting, key=lambda p: p.cost_per_hour)
+    return max(pools, key=lambda p: p.vram_bytes)
+
+
+class RoutingTable:
+    """Cached model -> pool decisions, recomputed when a model's manifest changes.
+
+    :param root: The ``OLLAMA_MODELS`` directory
+    :param pools: Candidate GPU classes
+    :param num_parallel: ``OLLAMA_NUM_PARALLEL`` on the GPU containers; each slot gets
+        its own KV cache
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike,
+        pools: tuple[GpuPool, ...] = POOLS,
+        num_parallel: int = 1,
+        default_num_ctx: int = DEFAULT_NUM_CTX,
+    ) -> None:
+        self.root = Path(root)
+        self.pools = pools
+        self.num_parallel = num_parallel
+        self.default_num_ctx = default_num_ctx
+        self._sizes: dict[str, tuple[int, ModelSize]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def default_pool(self) -> GpuPool:
+        return min(self.pools, key=lambda p: p.cost_per_hour)
+
+    def size(self, model: str) -> ModelSize | None:
+        path = ModelRef.parse(model).manifest_path(self.root)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._sizes.get(model)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        size = model_size(self.root, model)
+        if size is not None:
+            with self._lock:
+                self._sizes[model] = (mtime, size)
+        return size
+
+    def route(self, model: str | None, num_ctx: int | None = None) -> GpuPool:
+        """Pool for a request; unknown or missing models go to the cheapest pool."""
+        if not model:
+            return self.default_pool
+        size = self.size(model)
+        if size is None:
+            return self.default_pool
+        footprint = size.footprint(num_ctx or self.default_num_ctx, self.num_parallel)
+        return choose_pool(footprint, self.pools)
+
+    def as_dict(self) -> dict:
+        """Current decisions at the default context length, for inspection."""
+        with self._lock:
+            models = list(self._sizes)
+        return {model: self.route(model).name for model in models}
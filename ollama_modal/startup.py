@@ -0,0 +1,77 @@
+"""Cold-start instrumentation: record wall time per startup phase."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class Phase:
+    name: str
+    start: float
+    seconds: float
+    ok: bool = True
+    detail: dict[str, Any] = field(default_factory=dict)
+
+
+class StartupTimeline:
+    """Thread-safe record of named startup phases.
+
+    Phases may overlap (e.g. blob prefetch running while ``ollama serve`` boots);
+    ``start`` is relative to the timeline's creation so overlaps are visible.
+    """
+
+    def __init__(self) -> None:
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: list[Phase] = []
+
+    @contextmanager
+    def phase(self, name: str, **detail: Any) -> Iterator[dict[str, Any]]:
+        """Time a block; the yielded dict can be filled with extra detail."""
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield detail
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.phases.append(
+                    Phase(name, start - self._t0, end - start, ok, detail)
+                )
+
+    def timed(self, name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn`` inside a phase, e.g. ``executor.submit(timeline.timed, ...)``."""
+        with self.phase(name):
+            return fn(*args, **kwargs)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p.start)
+            return {
+                "total_seconds": round(self.elapsed(), 4),
+                "phases": [
+                    {
+                        **asdict(p),
+                        "start": round(p.start, 4),
+                        "seconds": round(p.seconds, 4),
+                    }
+                    for p in phases
+                ],
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict())
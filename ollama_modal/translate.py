@@ -0,0 +1,475 @@
+"""Translate between Ollama's native API (NDJSON) and the OpenAI API (SSE), streaming.
+
+Either protocol can be served in front of either engine: an OpenAI client can
+talk to ``ollama serve`` through ``/api/chat``, and an Ollama client can talk
+to vLLM through ``/v1/chat/completions``. Streams are converted line by line
+as they arrive (``LineSplitter`` only holds back an incomplete trailing line),
+and the translators are plain async generators, so the upstream is read only
+as fast as the client consumes and backpressure is preserved.
+
+Reasoning is carried both ways (Ollama ``thinking`` <-> OpenAI
+``reasoning_content``/``reasoning``), and token counts end up on the final
+chunk: ``usage`` for OpenAI clients, ``prompt_eval_count``/``eval_count`` and
+durations for Ollama clients.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
+
+# (ollama path, openai path); the first is the chat pair.
+PATH_PAIRS = (("api/chat", "v1/chat/completions"), ("api/generate", "v1/completions"))
+OLLAMA_TO_OPENAI = dict(PATH_PAIRS)
+OPENAI_TO_OLLAMA = {v: k for k, v in PATH_PAIRS}
+# OpenAI sampling parameter -> Ollama option.
+OPTION_NAMES = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "seed": "seed",
+    "stop": "stop",
+    "presence_penalty": "presence_penalty",
+    "frequency_penalty": "frequency_penalty",
+    "max_tokens": "num_predict",
+}
+
+
+class LineSplitter:
+    """Split a byte stream into complete lines, keeping only the unfinished tail."""
+
+    def __init__(self) -> None:
+        self._rest = b""
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        data = self._rest + chunk if self._rest else chunk
+        lines = data.split(b"\n")
+        self._rest = lines.pop()
+        return lines
+
+    def flush(self) -> list[bytes]:
+        rest, self._rest = self._rest, b""
+        return [rest] if rest.strip() else []
+
+
+def _sse(obj: dict[str, Any]) -> bytes:
+    return b"data: " + json.dumps(obj, separators=(",", ":")).encode() + b"\n\n"
+
+
+def _ndjson(obj: dict[str, Any]) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode() + b"\n"
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _text(content: Any) -> tuple[str, list[str]]:
+    """Text and base64 images of an OpenAI message ``content`` (string or parts)."""
+    if isinstance(content, str) or content is None:
+        return content or "", []
+    texts, images = [], []
+    for part in content:
+        if part.get("type") == "text":
+            texts.append(part.get("text", ""))
+        elif part.get("type") == "image_url":
+            url = part.get("image_url", {}).get("url", "")
+            images.append(url.split(",", 1)[-1])
+    return "".join(texts), images
+
+
+def openai_to_ollama_request(path: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """An OpenAI chat/completions request as the equivalent Ollama body.
+
+    The body is for ``/api/chat`` or ``/api/generate``.
+    """
+    out: dict[str, Any] = {
+        "model": payload["model"],
+        "stream": bool(payload.get("stream", False)),
+    }
+    options = {}
+    for name, option in OPTION_NAMES.items():
+        if payload.get(name) is not None:
+            options[option] = payload[name]
+    if payload.get("max_completion_tokens") is not None:
+        options["num_predict"] = payload["max_completion_tokens"]
+    if isinstance(options.get("stop"), str):
+        # OpenAI allows a single stop string; Ollama wants a list.
+        options["stop"] = [options["stop"]]
+    if options:
+        out["options"] = options
+    if payload.get("reasoning_effort") is not None:
+        out["think"] = payload["reasoning_effort"] != "none"
+    kwargs = payload.get("chat_template_kwargs") or {}
+    if "enable_thinking" in kwargs:
+        out["think"] = bool(kwargs["enable_thinking"])
+    if path.strip("/") == "v1/completions":
+        out["prompt"] = payload.get("prompt", "")
+        return out
+    messages = []
+    for message in payload.get("messages", []):
+        text, images = _text(message.get("content"))
+        converted = {
+            k: v
+            for k, v in message.items()
+            if k not in ("content", "reasoning_content")
+        }
+        converted["content"] = text
+        if images:
+            converted["images"] = images
+        if message.get("reasoning_content"):
+            converted["thinking"] = message["reasoning_content"]
+        if message.get("tool_calls"):
+            converted["tool_calls"] = _ollama_tool_calls(message["tool_calls"])
+        messages.append(converted)
+    out["messages"] = messages
+    if payload.get("tools"):
+        out["tools"] = payload["tools"]
+    return out
+
+
+def ollama_to_openai_request(path: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """An Ollama ``/api/chat`` or ``/api/generate`` body as the OpenAI request."""
+    stream = payload.get("stream", True)
+    out: dict[str, Any] = {"model": payload["model"], "stream": stream}
+    if stream:
+        out["stream_options"] = {"include_usage": True}
+    options = payload.get("options") or {}
+    for name, option in OPTION_NAMES.items():
+        if options.get(option) is not None:
+            out[name] = options[option]
+    if payload.get("think") is not None:
+        out["chat_template_kwargs"] = {"enable_thinking": bool(payload["think"])}
+    if path.strip("/") == "api/generate":
+        prompt = payload.get("prompt", "")
+        if payload.get("system"):
+            # The completions API has no system field; prepend it to the prompt.
+            out["prompt"] = f"{payload['system']}\n\n{prompt}"
+        else:
+            out["prompt"] = prompt
+        return out
+    messages = []
+    for message in payload.get("messages", []):
+        converted = {
+            k: v for k, v in message.items() if k not in ("images", "thinking")
+        }
+        if message.get("tool_calls"):
+            converted["tool_calls"] = _openai_tool_calls(
+                message["tool_calls"], streaming=False
+            )
+        if message.get("images"):
+            converted["content"] = [
+                {"type": "text", "text": message.get("content", "")}
+            ] + [
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/png;base64,{image}"},
+                }
+                for image in message["images"]
+            ]
+        messages.append(converted)
+    out["messages"] = messages
+    if payload.get("tools"):
+        out["tools"] = payload["tools"]
+    return out
+
+
+def serves(engine: str, path: str) -> bool:
+    """Whether an ``engine`` backend can answer ``path``, natively or translated.
+
+    Ollama also speaks the OpenAI API under ``/v1``; vLLM has no ``/api`` routes
+    beyond the ones ``translate_request`` maps.
+    """
+    path = path.strip("/")
+    return engine == "ollama" or not path.startswith("api/") or path in OLLAMA_TO_OPENAI
+
+
+def translate_request(
+    engine: str, path: str, payload: dict[str, Any] | None
+) -> tuple[str, dict[str, Any]] | None:
+    """``(engine path, engine payload)`` for a request in the other protocol.
+
+    ``None`` if the request needs no translation.
+
+    :param engine: ``"ollama"`` (native NDJSON API) or ``"openai"`` (OpenAI-compatible
+        SSE)
+    """
+    path = path.strip("/")
+    if not payload or "model" not in payload:
+        return None
+    if engine == "ollama" and path in OPENAI_TO_OLLAMA:
+        return OPENAI_TO_OLLAMA[path], openai_to_ollama_request(path, payload)
+    if engine == "openai" and path in OLLAMA_TO_OPENAI:
+        return OLLAMA_TO_OPENAI[path], ollama_to_openai_request(path, payload)
+    return None
+
+
+def _usage(obj: dict[str, Any]) -> dict[str, int]:
+    prompt = obj.get("prompt_eval_count") or 0
+    completion = obj.get("eval_count") or 0
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+def _openai_tool_calls(
+    tool_calls: list[dict[str, Any]], streaming: bool
+) -> list[dict[str, Any]]:
+    """Ollama tool calls (arguments as objects) in OpenAI form (as JSON strings)."""
+    calls = []
+    for i, call in enumerate(tool_calls):
+        function = call["function"]
+        converted = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {
+                "name": function["name"],
+                "arguments": json.dumps(function.get("arguments", {})),
+            },
+        }
+        calls.append({"index": i, **converted} if streaming else converted)
+    return calls
+
+
+def _ollama_tool_calls(tool_calls: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """OpenAI tool calls in Ollama form."""
+    return [
+        {
+            "function": {
+                "name": call["function"]["name"],
+                "arguments": json.loads(call["function"].get("arguments") or "{}"),
+            }
+        }
+        for call in tool_calls
+    ]
+
+
+def _ollama_delta(obj: dict[str, Any], chat: bool) -> tuple[str, str, Any]:
+    """``(content, thinking, tool_calls)`` of one Ollama chunk."""
+    if chat:
+        message = obj.get("message") or {}
+        return (
+            message.get("content") or "",
+            message.get("thinking") or "",
+            message.get("tool_calls"),
+        )
+    return obj.get("response") or "", obj.get("thinking") or "", None
+
+
+async def ndjson_to_sse(
+    stream: AsyncIterator[bytes], model: str, chat: bool = True
+) -> AsyncIterator[bytes]:
+    """Ollama NDJSON chunks -> OpenAI SSE events.
+
+    Events are ``chat.completion.chunk`` objects, or ``text_completion`` ones
+    when ``chat`` is false.
+    """
+    splitter = LineSplitter()
+    ident = (
+        f"chatcmpl-{uuid.uuid4().hex[:24]}" if chat else f"cmpl-{uuid.uuid4().hex[:24]}"
+    )
+    created = int(time.time())
+    base = {
+        "id": ident,
+        "object": "chat.completion.chunk" if chat else "text_completion",
+        "created": created,
+        "model": model,
+    }
+    first = True
+
+    def event(obj: dict[str, Any]) -> bytes | None:
+        nonlocal first
+        if "error" in obj:
+            return _sse({"error": {"message": obj["error"]}})
+        content, thinking, tool_calls = _ollama_delta(obj, chat)
+        done = obj.get("done", False)
+        if chat:
+            delta: dict[str, Any] = {}
+            if first:
+                delta["role"] = "assistant"
+            if content:
+                delta["content"] = content
+            if thinking:
+                delta["reasoning_content"] = thinking
+            if tool_calls:
+                delta["tool_calls"] = _openai_tool_calls(tool_calls, streaming=True)
+            choice: dict[str, Any] = {"index": 0, "delta": delta, "finish_reason": None}
+        else:
+            choice = {"index": 0, "text": content, "finish_reason": None}
+        if not done and not (content or thinking or tool_calls or first):
+            return None
+        first = False
+        out = {**base, "choices": [choice]}
+        if done:
+            reason = obj.get("done_reason") or "stop"
+            choice["finish_reason"] = "tool_calls" if tool_calls else reason
+            out["usage"] = _usage(obj)
+        return _sse(out)
+
+    async for chunk in stream:
+        for line in splitter.feed(chunk):
+            if line.strip():
+                encoded = event(json.loads(line))
+                if encoded is not None:
+                    yield encoded
+    for line in splitter.flush():
+        encoded = event(json.loads(line))
+        if encoded is not None:
+            yield encoded
+    yield b"data: [DONE]\n\n"
+
+
+async def sse_to_ndjson(
+    stream: AsyncIterator[bytes], model: str, chat: bool = True
+) -> AsyncIterator[bytes]:
+    """OpenAI SSE events -> Ollama NDJSON chunks.
+
+    The last chunk is a ``done: true`` object with counts and durations.
+    """
+    splitter = LineSplitter()
+    start = time.perf_counter_ns()
+    first_token = None
+    finish_reason = None
+    usage: dict[str, Any] = {}
+    # Streamed tool calls arrive as fragments keyed by index: the name first,
+    # then the JSON arguments a few characters at a time.
+    tool_calls: dict[int, dict[str, str]] = {}
+
+    def message(content: str, thinking: str) -> dict[str, Any]:
+        base = {"model": model, "created_at": _now_iso(), "done": False}
+        if chat:
+            msg: dict[str, Any] = {"role": "assistant", "content": content}
+            if thinking:
+                msg["thinking"] = thinking
+            return {**base, "message": msg}
+        out = {**base, "response": content}
+        if thinking:
+            out["thinking"] = thinking
+        return out
+
+    def convert(line: bytes) -> bytes | None:
+        nonlocal first_token, finish_reason, usage
+        if not line.startswith(b"data:"):
+            return None
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return None
+        obj = json.loads(data)
+        if "error" in obj:
+            error = obj["error"]
+            return _ndjson(
+                {"error": error.get("message") if isinstance(error, dict) else error}
+            )
+        if obj.get("usage"):
+            usage = obj["usage"]
+        choices = obj.get("choices") or []
+        if not choices:
+            return None
+        choice = choices[0]
+        finish_reason = choice.get("finish_reason") or finish_reason
+        if chat:
+            delta = choice.get("delta") or {}
+            content = delta.get("content") or ""
+            thinking = delta.get("reasoning_content") or delta.get("reasoning") or ""
+            for fragment in delta.get("tool_calls") or []:
+                call = tool_calls.setdefault(
+                    fragment.get("index", 0), {"name": "", "arguments": ""}
+                )
+                function = fragment.get("function") or {}
+                call["name"] += function.get("name") or ""
+                call["arguments"] += function.get("arguments") or ""
+        else:
+            content, thinking = choice.get("text") or "", ""
+        if not (content or thinking):
+            return None
+        if first_token is None:
+            first_token = time.perf_counter_ns()
+        return _ndjson(message(content, thinking))
+
+    async for chunk in stream:
+        for line in splitter.feed(chunk):
+            encoded = convert(line.strip())
+            if encoded is not None:
+                yield encoded
+    for line in splitter.flush():
+        encoded = convert(line.strip())
+        if encoded is not None:
+            yield encoded
+    end = time.perf_counter_ns()
+    first_token = first_token or end
+    final = message("", "")
+    if tool_calls:
+        calls = [{"function": tool_calls[i]} for i in sorted(tool_calls)]
+        final["message"]["tool_calls"] = _ollama_tool_calls(calls)
+        # Ollama has no "tool_calls" done reason; it stops with the calls attached.
+        finish_reason = "stop" if finish_reason == "tool_calls" else finish_reason
+    final.update(
+        {
+            "done": True,
+            "done_reason": finish_reason or "stop",
+            "total_duration": end - start,
+            "prompt_eval_count": usage.get("prompt_tokens", 0),
+            "prompt_eval_duration": first_token - start,
+            "eval_count": usage.get("completion_tokens", 0),
+            "eval_duration": end - first_token,
+        }
+    )
+    yield _ndjson(final)
+
+
+def ollama_to_openai_response(
+    obj: dict[str, Any], model: str, chat: bool = True
+) -> dict[str, Any]:
+    """A complete (``stream: false``) Ollama response as an OpenAI response."""
+    content, thinking, tool_calls = _ollama_delta(obj, chat)
+    reason = obj.get("done_reason") or "stop"
+    if chat:
+        message: dict[str, Any] = {"role": "assistant", "content": content}
+        if thinking:
+            message["reasoning_content"] = thinking
+        if tool_calls:
+            message["tool_calls"] = _openai_tool_calls(tool_calls, streaming=False)
+            reason = "tool_calls"
+        choice = {"index": 0, "message": message, "finish_reason": reason}
+    else:
+        choice = {"index": 0, "text": content, "finish_reason": reason}
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion" if chat else "text_completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [choice],
+        "usage": _usage(obj),
+    }
+
+
+def openai_to_ollama_response(
+    obj: dict[str, Any], model: str, chat: bool = True, seconds: float = 0.0
+) -> dict[str, Any]:
+    """A complete OpenAI response as an Ollama ``done: true`` response."""
+    choice = (obj.get("choices") or [{}])[0]
+    usage = obj.get("usage") or {}
+    out: dict[str, Any] = {
+        "model": model,
+        "created_at": _now_iso(),
+        "done": True,
+        "done_reason": choice.get("finish_reason") or "stop",
+        "total_duration": int(seconds * 1e9),
+        "prompt_eval_count": usage.get("prompt_tokens", 0),
+        "eval_count": usage.get("completion_tokens", 0),
+    }
+    if chat:
+        message = choice.get("message") or {}
+        out["message"] = {"role": "assistant", "content": message.get("content") or ""}
+        thinking = message.get("reasoning_content") or message.get("reasoning")
+        if thinking:
+            out["message"]["thinking"] = thinking
+        if message.get("tool_calls"):
+            out["message"]["tool_calls"] = _ollama_tool_calls(message["tool_calls"])
+    else:
+        out["response"] = choice.get("text") or ""
+    return out
@@ -0,0 +1,173 @@
+"""Check an on-Volume Ollama model's blobs (size + sha256) without running ``ollama``.
+
+Results are cached in a JSON file next to the blobs, keyed by digest and the
+blob's ``(size, mtime_ns)``, so a blob that passed once isn't re-hashed on every
+container start unless the file changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from ollama_modal.manifests import Layer, blob_path, manifest_layers, read_manifest
+
+CACHE_FILENAME = ".verified-blobs.json"
+HASH_CHUNK = 64 * 1024 * 1024
+
+
+class VerificationCache:
+    """``{digest: [size, mtime_ns]}`` of blobs whose sha256 already matched."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.dirty = False
+        try:
+            self._entries: dict[str, list[int]] = json.loads(self.path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    @classmethod
+    def for_root(cls, root: str | os.PathLike) -> "VerificationCache":
+        return cls(Path(root, CACHE_FILENAME))
+
+    def is_verified(self, digest: str, stat: os.stat_result) -> bool:
+        with self._lock:
+            return self._entries.get(digest) == [stat.st_size, stat.st_mtime_ns]
+
+    def mark(self, digest: str, stat: os.stat_result) -> None:
+        with self._lock:
+            self._entries[digest] = [stat.st_size, stat.st_mtime_ns]
+            self.dirty = True
+
+    def forget(self, digest: str) -> None:
+        with self._lock:
+            if self._entries.pop(digest, None) is not None:
+                self.dirty = True
+
+    def save(self) -> None:
+        """Write atomically; a no-op when nothing changed."""
+        with self._lock:
+            if not self.dirty:
+                return
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._entries))
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+
+def sha256_file(path: str | os.PathLike, chunk_size: int = HASH_CHUNK) -> str:
+    """Hex sha256 of a file via ``mmap``.
+
+    hashlib drops the GIL, so threads hash in parallel.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            for offset in range(0, len(mm), chunk_size):
+                h.update(mm[offset : offset + chunk_size])
+    return h.hexdigest()
+
+
+@dataclass
+class VerificationReport:
+    model: str
+    manifest_found: bool
+    layers: list[Layer] = field(default_factory=list)
+    missing: list[Layer] = field(default_factory=list)
+    corrupt: list[Layer] = field(default_factory=list)
+    hashed: list[Layer] = field(default_factory=list)
+    cached: list[Layer] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.manifest_found and not self.missing and not self.corrupt
+
+    @property
+    def bad(self) -> list[Layer]:
+        """Blobs a repair needs to fetch."""
+        return self.missing + self.corrupt
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "ok": self.ok,
+            "manifest_found": self.manifest_found,
+            "missing": [layer.digest for layer in self.missing],
+            "corrupt": [layer.digest for layer in self.corrupt],
+            "hashed": len(self.hashed),
+            "cached": len(self.cached),
+            "bytes_hashed": sum(layer.size for layer in self.hashed),
+            "seconds": round(self.seconds, 4),
+        }
+
+
+def _check_layer(root: Path, layer: Layer, cache: VerificationCache | None) -> str:
+    """Return one of ``missing``, ``corrupt``, ``cached`` or ``hashed``."""
+    path = blob_path(root, layer.digest)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return "missing"
+    if stat.st_size != layer.size:
+        return "corrupt"
+    if cache is not None and cache.is_verified(layer.digest, stat):
+        return "cached"
+    algo, _, expected = layer.digest.partition(":")
+    if algo != "sha256" or sha256_file(path) != expected:
+        if cache is not None:
+            cache.forget(layer.digest)
+        return "corrupt"
+    if cache is not None:
+        cache.mark(layer.digest, stat)
+    return "hashed"
+
+
+def verify_model(
+    root: str | os.PathLike,
+    model: str,
+    cache: VerificationCache | None = None,
+    max_workers: int = 8,
+) -> VerificationReport:
+    """Verify every blob ``model``'s manifest references, hashing in parallel.
+
+    :param root: The ``OLLAMA_MODELS`` directory
+    :param model: Model name as passed to ``ollama`` (e.g. ``gemma4:12b``)
+    :param cache: Skip blobs already verified at the same size/mtime; updated in place
+    :param max_workers: Number of blobs hashed concurrently
+    """
+    start = time.perf_counter()
+    root = Path(root)
+    manifest = read_manifest(root, model)
+    if manifest is None:
+        return VerificationReport(model, manifest_found=False)
+    report = VerificationReport(
+        model, manifest_found=True, layers=manifest_layers(manifest)
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            lambda layer: _check_layer(root, layer, cache), report.layers
+        )
+        for layer, status in zip(report.layers, results):
+            getattr(report, status).append(layer)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def remove_blobs(root: str | os.PathLike, layers: list[Layer]) -> None:
+    """Delete corrupt blobs so a subsequent pull re-fetches only those."""
+    for layer in layers:
+        blob_path(root, layer.digest).unlink(missing_ok=True)
@@ -0,0 +1,147 @@
+"""Warm a vLLM engine across the request shapes it will serve before it is snapshotted.
+
+vLLM captures CUDA graphs per decode batch size and compiles kernels lazily
+for new shapes. One short request warms one shape, so the first real batch of
+8 or the first 8k-token prefill after a restore pays for capture or
+compilation. ``sweep`` sends every shape twice (concurrently within a shape)
+and reports how much the second pass gained over the first.
+
+Shapes come from the engine limits (``default_shapes``) or from recorded
+traffic (``shapes_from_traffic``).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+SHORT_PROMPT_TOKENS = 32
+
+
+@dataclass(frozen=True)
+class Shape:
+    """``concurrency`` simultaneous requests with ``prompt_tokens`` each."""
+
+    concurrency: int
+    prompt_tokens: int
+    max_tokens: int = 8
+
+    @property
+    def name(self) -> str:
+        return f"c{self.concurrency}xp{self.prompt_tokens}"
+
+
+def _powers_of_two(limit: int, start: int = 1) -> list[int]:
+    values = []
+    value = start
+    while value < limit:
+        values.append(value)
+        value *= 2
+    return values + [limit]
+
+
+def default_shapes(max_num_seqs: int, max_num_batched_tokens: int) -> list[Shape]:
+    """Decode batch sizes up to ``max_num_seqs``, prefills up to a full token budget.
+
+    Batch sizes use short prompts; prompt lengths run alone; the last shape
+    fills every sequence slot and the whole ``max_num_batched_tokens`` budget.
+    """
+    shapes = [Shape(c, SHORT_PROMPT_TOKENS) for c in _powers_of_two(max_num_seqs)]
+    shapes += [Shape(1, p) for p in _powers_of_two(max_num_batched_tokens, start=256)]
+    shapes.append(Shape(max_num_seqs, max_num_batched_tokens // max_num_seqs))
+    return list(dict.fromkeys(shapes))
+
+
+def _bucket(value: int, limit: int) -> int:
+    """Round up to a power of two, capped at ``limit``."""
+    bucket = 1
+    while bucket < value:
+        bucket *= 2
+    return min(bucket, limit)
+
+
+def shapes_from_traffic(
+    records: Iterable[dict],
+    max_num_seqs: int,
+    max_num_batched_tokens: int,
+    top: int = 12,
+) -> list[Shape]:
+    """The ``top`` most common shapes in recorded requests.
+
+    Each record needs ``prompt_tokens`` (e.g. ``usage.prompt_tokens`` from a
+    response log) and may carry ``concurrency`` (requests in flight when it
+    arrived). Both are rounded up to powers of two within the engine limits.
+    """
+    counts: Counter[Shape] = Counter()
+    for record in records:
+        prompt = int(record.get("prompt_tokens") or 0)
+        if prompt <= 0:
+            continue
+        counts[
+            Shape(
+                _bucket(int(record.get("concurrency") or 1), max_num_seqs),
+                _bucket(prompt, max_num_batched_tokens),
+            )
+        ] += 1
+    return [shape for shape, _ in counts.most_common(top)]
+
+
+def load_traffic(path: str | os.PathLike) -> list[dict]:
+    """Records from a JSONL file; a missing file is no traffic."""
+    try:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def make_prompt(tokens: int, seed: int) -> str:
+    """Roughly ``tokens`` tokens of filler.
+
+    ``seed`` makes the start unique, so no prefix is cached.
+    """
+    return f"{seed}: " + " ".join(["the"] * max(1, tokens - 4))
+
+
+def run_shape(
+    send: Callable[[str, int], float], shape: Shape, seed: int
+) -> list[float]:
+    """Send ``shape.concurrency`` requests at once; returns each request's latency."""
+    prompts = [
+        make_prompt(shape.prompt_tokens, seed + i) for i in range(shape.concurrency)
+    ]
+    with ThreadPoolExecutor(max_workers=shape.concurrency) as pool:
+        return list(pool.map(lambda prompt: send(prompt, shape.max_tokens), prompts))
+
+
+def sweep(
+    send: Callable[[str, int], float], shapes: list[Shape], passes: int = 2
+) -> dict[str, dict]:
+    """Warm every shape ``passes`` times and report what its first pass cost extra.
+
+    :param send: Sends one request (prompt, max_tokens) and returns its latency in
+        seconds
+    :return: ``{shape name: {first_seconds, warm_seconds, dropped_seconds, ...}}``
+    """
+    report: dict[str, dict] = {}
+    seed = int(time.time())
+    for shape in shapes:
+        latencies = []
+        for _ in range(passes):
+            latencies.append(statistics.median(run_shape(send, shape, seed)))
+            seed += shape.concurrency
+        first, warm = latencies[0], latencies[-1]
+        report[shape.name] = {
+            "concurrency": shape.concurrency,
+            "prompt_tokens": shape.prompt_tokens,
+            "first_seconds": round(first, 4),
+            "warm_seconds": round(warm, 4),
+            "dropped_seconds": round(first - warm, 4),
+        }
+    return report
@@ -0,0 +1,159 @@
+"""Tune ``vllm serve`` parameters for the best goodput under a TTFT / ITL SLO.
+
+Each configuration in the grid gets its own GPU container, which starts
+``vllm serve`` with those flags and runs a closed-loop load sweep over the
+workload's concurrency levels. The winner is written to
+``serving-profile.json`` on the ``vllm-cache`` Volume, where ``VllmServer``
+reads it at start (redeploy so the next snapshot picks it up), and to
+``benchmark_results/``.
+
+Usage:
+    modal run scripts/autotune_vllm.py
+    modal run scripts/autotune_vllm.py --grid '{"max_num_seqs": [8, 16, 32]}' --ttft 1.5 --itl 0.08
+    modal run scripts/autotune_vllm.py --simulate      # SimulatedBackend, no GPU
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+import modal
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ollama_modal.autotune import (  # noqa: E402
+    LevelResult,
+    NoViableConfig,
+    Sample,
+    SimulatedBackend,
+    Slo,
+    Workload,
+    openai_load_sweep,
+    summarize,
+    tune,
+    write_profile,
+)
+from vllm_endpoint import (  # noqa: E402
+    ENGINE_HOST,
+    MINUTES,
+    SERVED_NAME,
+    VLLM_CACHE_DIR,
+    hf_cache_vol,
+    serve_command,
+    vllm_cache_vol,
+    vllm_image,
+)
+
+DEFAULT_GRID = {
+    "max_num_seqs": [8, 16, 32],
+    "max_num_batched_tokens": [4096, 8192, 16384],
+    "max_model_len": [32768],
+    "gpu_memory_utilization": [0.90, 0.95],
+}
+PORT = 8000
+OUTPUT_DIR = Path(__file__).parent.parent / "benchmark_results"
+
+app = modal.App("vllm-autotune")
+
+
+@app.function(
+    # `modal run` mounts only this script and ollama_modal; serve_command lives in
+    # vllm_endpoint.
+    image=vllm_image.add_local_python_source("vllm_endpoint"),
+    gpu="L40S",
+    volumes={"/root/.cache/huggingface": hf_cache_vol, VLLM_CACHE_DIR: vllm_cache_vol},
+    timeout=30 * MINUTES,
+)
+def run_config(params: dict, workload: dict) -> list[dict]:
+    """Start ``vllm serve`` with ``params`` and run the load sweep against it."""
+    import requests
+
+    proc = subprocess.Popen(serve_command(params, port=PORT))
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(
+                    f"vllm serve exited with {proc.returncode} for {params}"
+                )
+            try:
+                if (
+                    requests.get(
+                        f"http://{ENGINE_HOST}:{PORT}/health", timeout=2
+                    ).status_code
+                    == 200
+                ):
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(1)
+        levels = asyncio.run(
+            openai_load_sweep(
+                f"http://{ENGINE_HOST}:{PORT}", SERVED_NAME, Workload(**workload)
+            )
+        )
+        return [asdict(level) for level in levels]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=60)
+
+
+class ModalBackend:
+    """Runs each configuration through ``run_config`` on a fresh GPU container."""
+
+    def run(self, params: dict, workload: Workload) -> list[LevelResult]:
+        levels = run_config.remote(params, asdict(workload))
+        return [
+            LevelResult(
+                level["concurrency"],
+                [Sample(**s) for s in level["samples"]],
+                level["seconds"],
+            )
+            for level in levels
+        ]
+
+
+@app.local_entrypoint()
+def main(
+    grid: str = "",
+    ttft: float = 2.0,
+    itl: float = 0.1,
+    prompt_tokens: int = 1024,
+    output_tokens: int = 256,
+    requests: int = 64,
+    simulate: bool = False,
+):
+    workload = Workload(prompt_tokens, output_tokens, requests=requests)
+    slo = Slo(ttft=ttft, itl=itl)
+    backend = SimulatedBackend() if simulate else ModalBackend()
+    try:
+        result = tune(
+            backend, json.loads(grid) if grid else DEFAULT_GRID, workload, slo
+        )
+    except NoViableConfig as exc:
+        for trial in exc.trials:
+            detail = trial.error or "no request met the SLO"
+            print(f"{json.dumps(trial.params, sort_keys=True)}: {detail}")
+        raise SystemExit(
+            f"{exc}; no profile written. Loosen --ttft/--itl or change the grid."
+        )
+    print(summarize(result))
+    print(f"best: {json.dumps(result.best.params)}")
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    local = OUTPUT_DIR / f"vllm_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    write_profile(local, result)
+    print(f"Saved {local}")
+    if not simulate:
+        with vllm_cache_vol.batch_upload(force=True) as batch:
+            batch.put_file(str(local), "/serving-profile.json")
+        print(
+            "Uploaded serving-profile.json to the vllm-cache Volume; "
+            "redeploy vllm_endpoint.py to use it."
+        )
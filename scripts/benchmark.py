@@ -1,25 +1,50 @@
 # /// script
-# dependencies = ["httpx", "matplotlib", "numpy"]
+# dependencies = ["httpx", "matplotlib", "numpy", "tokenizers"]
 # ///
 """Benchmark Ollama vs vLLM vs SGLang deployments of Qwen3.6-27B on Modal.
 
 Runs N warm requests per engine, saves raw data to JSON, and generates
 a comparison plot showing every data point.
 
+``--load`` drives each engine with concurrent traffic instead: open-loop
+arrivals at each of ``--rates`` (Poisson or fixed spacing), or a closed-loop
+sweep over ``--concurrency``. Every step reports TTFT, inter-token and
+end-to-end percentiles, output tokens/s, error rate and goodput under the
+``--ttft``/``--itl`` SLO, and the saturation knee is recorded per engine.
+
 Usage:
     uv run scripts/benchmark.py                     # 6 warm runs + plot
     uv run scripts/benchmark.py --runs 10            # more runs
     uv run scripts/benchmark.py --no-plot            # skip plotting
+    uv run scripts/benchmark.py --load poisson --rates 0.5,1,2,4,8
+    uv run scripts/benchmark.py --load closed --concurrency 1,2,4,8,16,32
 """
 
 import argparse
+import asyncio
 import json
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
+from typing import Callable
 
 import httpx
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ollama_modal.autotune import Slo  # noqa: E402
+from ollama_modal.loadgen import (  # noqa: E402
+    RequestResult,
+    Step,
+    StreamRecorder,
+    closed_loop,
+    failed,
+    find_knee,
+    open_loop,
+    percentile,
+)
+
 ENDPOINTS = {
     "Ollama\n(Q4_K_M)": {
         "url": "https://ericmjl--ollama-service-ollamaservice-server.modal.run/v1/chat/completions",
@@ -40,60 +65,69 @@ MAX_TOKENS = 300
 OUTPUT_DIR = Path(__file__).parent.parent / "benchmark_results"
 
 
-def stream_request(url: str, model: str, *, timeout: float = 600) -> dict:
-    payload = {
+def chat_payload(model: str, prompt: str) -> dict:
+    return {
         "model": model,
-        "messages": [{"role": "user", "content": PROMPT}],
+        "messages": [{"role": "user", "content": prompt}],
         "max_tokens": MAX_TOKENS,
         "stream": True,
+        "stream_options": {"include_usage": True},
         "temperature": 0.0,
     }
 
-    t_request = time.perf_counter()
-    ttft = None
-    token_count = 0
-    first_token_time = None
 
+def sse_chunk(line: str) -> dict | None:
+    """The JSON chunk on an SSE ``data:`` line, or ``None`` for anything else."""
+    if not line.startswith("data: ") or line == "data: [DONE]":
+        return None
+    try:
+        return json.loads(line[len("data: ") :])
+    except json.JSONDecodeError:
+        return None
+
+
+def load_tokenizer(name: str | None) -> Callable[[str], int] | None:
+    """A token counter for servers that send no usage block.
+
+    ``None`` (no ``name``, or the tokenizer can't be loaded) means counting chunks.
+    """
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_pretrained(name)
+    except Exception as exc:
+        print(
+            f"tokenizer {name} unavailable ({exc}); "
+            "counting chunks when usage is missing"
+        )
+        return None
+    return lambda text: (
+        len(tokenizer.encode(text, add_special_tokens=False).ids) if text else 0
+    )
+
+
+def stream_request(
+    url: str, model: str, *, timeout: float = 600, count_tokens=None
+) -> dict:
+    recorder = StreamRecorder()
     with httpx.Client(timeout=timeout, follow_redirects=True) as client:
-        with client.stream("POST", url, json=payload) as resp:
+        with client.stream("POST", url, json=chat_payload(model, PROMPT)) as resp:
             resp.raise_for_status()
             for line in resp.iter_lines():
-                if not line or not line.startswith("data: "):
-                    continue
-                data = line[len("data: ") :]
-                if data == "[DONE]":
-                    break
-                try:
-                    chunk = json.loads(data)
-                except json.JSONDecodeError:
-                    continue
-                choices = chunk.get("choices") or []
-                if choices:
-                    delta = choices[0].get("delta", {})
-                    content = (
-                        delta.get("content")
-                        or delta.get("reasoning")
-                        or delta.get("reasoning_content")
-                    )
-                    if content:
-                        if ttft is None:
-                            ttft = time.perf_counter() - t_request
-                            first_token_time = time.perf_counter()
-                        token_count += 1
-                usage = chunk.get("usage")
-                if usage and usage.get("completion_tokens"):
-                    token_count = usage["completion_tokens"]
-
-    t_end = time.perf_counter()
-    total = t_end - t_request
-    gen_time = (t_end - first_token_time) if first_token_time else total
-    tps = token_count / gen_time if gen_time > 0 else 0.0
+                chunk = sse_chunk(line)
+                if chunk is not None:
+                    recorder.feed(chunk)
 
+    r = recorder.result(count_tokens)
+    gen_time = r.e2e - r.ttft if r.ok else r.e2e
     return {
-        "ttft": ttft if ttft is not None else total,
-        "total": total,
-        "tokens": token_count,
-        "tps": tps,
+        "ttft": r.ttft,
+        "total": r.e2e,
+        "tokens": r.output_tokens,
+        "tps": r.output_tokens / gen_time if gen_time > 0 else 0.0,
+        **r.as_dict(),
     }
 
 
@@ -106,13 +140,162 @@ def warmup(url: str, model: str) -> bool:
         return False
 
 
+async def astream_request(
+    client: httpx.AsyncClient, url: str, model: str, i: int, count_tokens=None
+) -> RequestResult:
+    """Stream one request, timestamping every chunk; never raises."""
+    # A distinct first line per request, so no two requests share a cached prefix.
+    payload = chat_payload(model, f"[{i}] {PROMPT}")
+    recorder = StreamRecorder()
+    try:
+        async with client.stream("POST", url, json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                chunk = sse_chunk(line)
+                if chunk is not None:
+                    recorder.feed(chunk)
+    except Exception as exc:
+        return failed(recorder.start, exc)
+    return recorder.result(count_tokens)
+
+
+async def load_engine(
+    url: str, model: str, args: argparse.Namespace, slo: Slo, count_tokens=None
+) -> list[Step]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(
+        timeout=600, follow_redirects=True, limits=limits
+    ) as client:
+        offset = 0
+
+        async def send(i: int) -> RequestResult:
+            return await astream_request(client, url, model, offset + i, count_tokens)
+
+        steps = []
+        levels = args.rates if args.load != "closed" else args.concurrency
+        for level in levels:
+            if args.load == "closed":
+                step = await closed_loop(send, int(level), args.requests)
+            else:
+                step = await open_loop(
+                    send, level, args.requests, process=args.load, seed=offset
+                )
+            offset += args.requests
+            steps.append(step)
+            s = step.summary(slo)
+            print(
+                f"  {step.mode}={level:<6g} "
+                f"ttft p50/p95/p99={s['ttft_p50']}/{s['ttft_p95']}/{s['ttft_p99']}s  "
+                f"itl p95={s['itl_p95']}s  tpot p95={s['tpot_p95']}s  "
+                f"e2e p95={s['e2e_p95']}s  "
+                f"tok/s={s['output_tokens_per_second']}  err={s['error_rate']:.1%}  "
+                f"goodput={s['goodput']} req/s"
+            )
+    return steps
+
+
+def run_load(args: argparse.Namespace) -> None:
+    slo = Slo(ttft=args.ttft, itl=args.itl)
+    levels = args.rates if args.load != "closed" else args.concurrency
+    print("=" * 78)
+    print(f"LOAD ({args.load}) — levels {levels}, {args.requests} requests per level")
+    print(
+        f"  SLO: ttft <= {slo.ttft}s, mean itl <= {slo.itl}s  max_tokens={MAX_TOKENS}"
+    )
+    print("=" * 78)
+    count_tokens = load_tokenizer(args.tokenizer)
+
+    engines: dict[str, dict] = {}
+    for name, cfg in ENDPOINTS.items():
+        label = name.replace("\n", " ")
+        print(f"\n[{label}]  warming up...")
+        if not warmup(cfg["url"], cfg["model"]):
+            print(f"[{label}]  SKIPPED (warmup failed)")
+            continue
+        steps = asyncio.run(
+            load_engine(cfg["url"], cfg["model"], args, slo, count_tokens)
+        )
+        knee = find_knee(steps, slo)
+        if knee:
+            print(
+                f"[{label}]  knee at {knee['mode']}={knee['level']:g} "
+                f"({knee['goodput']} req/s within SLO)"
+            )
+        else:
+            print(f"[{label}]  no step met the SLO")
+        engines[label] = {
+            "steps": [step.summary(slo) for step in steps],
+            "knee": knee,
+            "raw": [[r.as_dict() for r in step.results] for step in steps],
+        }
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    json_path = OUTPUT_DIR / f"load_{timestamp}.json"
+    with open(json_path, "w") as f:
+        json.dump(
+            {
+                "timestamp": timestamp,
+                "prompt": PROMPT,
+                "max_tokens": MAX_TOKENS,
+                "mode": args.load,
+                "levels": levels,
+                "requests_per_level": args.requests,
+                "slo": {"ttft": slo.ttft, "itl": slo.itl},
+                "engines": engines,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nRaw data saved to {json_path}")
+
+
+def floats(text: str) -> list[float]:
+    return [float(v) for v in text.split(",") if v]
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--runs", type=int, default=6, help="warm runs per endpoint")
     ap.add_argument("--no-plot", action="store_true")
+    ap.add_argument(
+        "--load",
+        choices=["poisson", "fixed", "closed"],
+        help="run a concurrent load sweep instead",
+    )
+    ap.add_argument(
+        "--rates",
+        type=floats,
+        default=[0.25, 0.5, 1, 2, 4, 8],
+        help="requests/s per open-loop step",
+    )
+    ap.add_argument(
+        "--concurrency",
+        type=floats,
+        default=[1, 2, 4, 8, 16, 32],
+        help="in-flight requests per closed-loop step",
+    )
+    ap.add_argument("--requests", type=int, default=32, help="requests per load step")
+    ap.add_argument(
+        "--ttft", type=float, default=2.0, help="SLO on time to first token (s)"
+    )
+    ap.add_argument(
+        "--itl", type=float, default=0.1, help="SLO on mean inter-token latency (s)"
+    )
+    ap.add_argument(
+        "--tokenizer",
+        default="cyankiwi/Qwen3.6-27B-AWQ-INT4",
+        help="Hugging Face tokenizer for servers that send no usage block "
+        "('' to count chunks)",
+    )
     args = ap.parse_args()
 
+    if args.load:
+        run_load(args)
+        return
+
     all_results: dict[str, list[dict]] = {}
+    count_tokens = load_tokenizer(args.tokenizer)
 
     print("=" * 78)
     print(f"WARM PERFORMANCE — {args.runs} runs per engine")
@@ -128,12 +311,15 @@ def main():
         print(f"[{label}]  measuring {args.runs} runs:")
         runs = []
         for i in range(args.runs):
-            r = stream_request(cfg["url"], cfg["model"])
+            r = stream_request(cfg["url"], cfg["model"], count_tokens=count_tokens)
             runs.append(r)
             all_results[name] = runs
             print(
                 f"  run {i+1}: ttft={r['ttft']:.3f}s  "
-                f"tps={r['tps']:.1f}  tokens={r['tokens']}  total={r['total']:.2f}s"
+                f"tps={r['tps']:.1f}  tokens={r['tokens']} "
+                f"(reasoning {r['reasoning_tokens']}, "
+                f"content {r['content_tokens']}, from {r['token_source']})  "
+                f"total={r['total']:.2f}s"
             )
 
     # save raw data
@@ -164,6 +350,8 @@ def main():
         ttfts = sorted(r["ttft"] for r in runs)
         tps_list = sorted(r["tps"] for r in runs)
         totals = sorted(r["total"] for r in runs)
+        itls = [gap for r in runs for gap in r["itls"]]
+        tpots = [r["tpot"] for r in runs if r["tpot"] is not None]
         n = len(ttfts)
         med = lambda v: v[n // 2]
         print(
@@ -171,6 +359,8 @@ def main():
             f"ttft={med(ttfts):.3f}s  "
             f"tps={med(tps_list):.1f}  "
             f"total={med(totals):.2f}s  "
+            f"itl p50/p99={percentile(itls, 0.5)}/{percentile(itls, 0.99)}s  "
+            f"tpot p50={percentile(tpots, 0.5)}s  "
             f"(n={n})"
         )
     print()
@@ -189,7 +379,11 @@ def plot_results(data: dict[str, list[dict]], json_path: Path):
         ("tps", "Tokens / second", "Throughput"),
         ("total", "Total latency (s)", "Total"),
     ]
-    colors = {"Ollama\n(Q4_K_M)": "#4C72B0", "vLLM\n(AWQ-INT4)": "#55A868", "SGLang\n(AWQ-INT4)": "#C44E52"}
+    colors = {
+        "Ollama\n(Q4_K_M)": "#4C72B0",
+        "vLLM\n(AWQ-INT4)": "#55A868",
+        "SGLang\n(AWQ-INT4)": "#C44E52",
+    }
 
     fig, axes = plt.subplots(1, 3, figsize=(14, 5))
     fig.suptitle(
@@ -209,10 +403,19 @@ def plot_results(data: dict[str, list[dict]], json_path: Path):
             jitter = np.random.uniform(-0.12, 0.12, len(vals))
             color = colors.get(eng, "#888888")
             ax.scatter(
-                [i + j for j in jitter], vals, color=color, s=60, alpha=0.7, zorder=3, edgecolors="white", linewidths=0.5
+                [i + j for j in jitter],
+                vals,
+                color=color,
+                s=60,
+                alpha=0.7,
+                zorder=3,
+                edgecolors="white",
+                linewidths=0.5,
             )
             med = sorted(vals)[len(vals) // 2]
-            ax.plot([i - 0.2, i + 0.2], [med, med], color=color, linewidth=2.5, zorder=2)
+            ax.plot(
+                [i - 0.2, i + 0.2], [med, med], color=color, linewidth=2.5, zorder=2
+            )
 
         ax.set_xticks(range(len(engines)))
         ax.set_xticklabels([e.replace("\n", " ") for e in engines], fontsize=9)
@@ -0,0 +1,93 @@
+# /// script
+# requires-python = ">=3.12"
+# dependencies = ["modal"]
+# ///
+
+"""Compare Ollama cold starts restored from a memory snapshot with unsnapshotted ones.
+
+Deploy the app twice, once per startup path:
+
+    modal deploy endpoint.py
+    OLLAMA_MEMORY_SNAPSHOT=0 modal deploy endpoint.py --name ollama-service-nosnap
+
+Then run (each trial waits for the pool to scale to zero first):
+
+    uv run scripts/benchmark_cold_start.py
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import time
+
+import modal
+
+APPS = os.environ.get("BENCHMARK_APPS", "ollama-service,ollama-service-nosnap").split(
+    ","
+)
+CLASS_NAME = os.environ.get("BENCHMARK_CLASS", "OllamaService")
+TRIALS = int(os.environ.get("BENCHMARK_TRIALS", "3"))
+IDLE_SECONDS = int(os.environ.get("BENCHMARK_IDLE_SECONDS", "150"))
+
+
+def cold_start(app_name: str) -> dict:
+    """Start a container in the idle pool; its startup report and client wall time."""
+    cls = modal.Cls.from_name(app_name, CLASS_NAME)
+    start = time.perf_counter()
+    report = cls().startup_report.remote()
+    wall = time.perf_counter() - start
+    start_total = report["start"]["total_seconds"]
+    return {
+        "wall_seconds": round(wall, 2),
+        "prepare_seconds": report["prepare"]["total_seconds"],
+        "start_seconds": start_total,
+        # prepare() finished long before start_and_load() began: restored from a
+        # snapshot.
+        "restored": report["snapshot_age_seconds"] - start_total > 10,
+        "phases": report["start"]["phases"],
+    }
+
+
+def main() -> None:
+    results: dict[str, list[dict]] = {app_name: [] for app_name in APPS}
+    for trial in range(1, TRIALS + 1):
+        for app_name in APPS:
+            print(
+                f"[{app_name}] trial {trial}: "
+                f"sleeping {IDLE_SECONDS}s so the pool scales to zero..."
+            )
+            time.sleep(IDLE_SECONDS)
+            result = cold_start(app_name)
+            results[app_name].append(result)
+            print(
+                f"[{app_name}] wall {result['wall_seconds']:.2f}s, "
+                f"prepare {result['prepare_seconds']:.2f}s, "
+                f"start {result['start_seconds']:.2f}s, "
+                f"restored={result['restored']}"
+            )
+
+    summary = {}
+    for app_name, runs in results.items():
+        # The first start after a deploy takes the snapshot rather than restoring one.
+        measured = [r for r in runs if r["restored"]] or runs
+        summary[app_name] = {
+            "trials": len(measured),
+            "median_wall_seconds": round(
+                statistics.median(r["wall_seconds"] for r in measured), 2
+            ),
+            "median_container_seconds": round(
+                statistics.median(
+                    r["start_seconds"] + (0 if r["restored"] else r["prepare_seconds"])
+                    for r in measured
+                ),
+                2,
+            ),
+        }
+    print("\n=== SUMMARY (JSON) ===")
+    print(json.dumps({"summary": summary, "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Measure the per-chunk cost of translating Ollama NDJSON <-> OpenAI SSE streams.
+
+Runs locally with no network: a synthetic stream of token chunks is pushed
+through each translator and through a plain pass-through generator, and the
+difference per chunk is reported in microseconds.
+
+Usage:
+    python scripts/benchmark_translate.py
+    python scripts/benchmark_translate.py --chunks 50000 --repeats 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ollama_modal.translate import ndjson_to_sse, sse_to_ndjson  # noqa: E402
+
+
+def ndjson_stream(n: int) -> list[bytes]:
+    lines = [
+        json.dumps(
+            {
+                "model": "qwen3.6:27b",
+                "created_at": "2026-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": " token"},
+                "done": False,
+            }
+        ).encode()
+        + b"\n"
+        for _ in range(n)
+    ]
+    lines.append(
+        json.dumps({"message": {"content": ""}, "done": True, "eval_count": n}).encode()
+        + b"\n"
+    )
+    return lines
+
+
+def sse_stream(n: int) -> list[bytes]:
+    event = {
+        "id": "x",
+        "object": "chat.completion.chunk",
+        "choices": [{"index": 0, "delta": {"content": " token"}}],
+    }
+    events = [b"data: " + json.dumps(event).encode() + b"\n\n" for _ in range(n)]
+    usage = {"choices": [], "usage": {"prompt_tokens": 1, "completion_tokens": 1}}
+    events.append(b"data: " + json.dumps(usage).encode() + b"\n\ndata: [DONE]\n\n")
+    return events
+
+
+async def source(chunks: list[bytes]):
+    for chunk in chunks:
+        yield chunk
+
+
+async def passthrough(stream):
+    async for chunk in stream:
+        yield chunk
+
+
+async def drain(stream) -> float:
+    start = time.perf_counter()
+    async for _ in stream:
+        pass
+    return time.perf_counter() - start
+
+
+def per_chunk_us(make, chunks: list[bytes], repeats: int) -> float:
+    times = [asyncio.run(drain(make(source(chunks)))) for _ in range(repeats)]
+    return statistics.median(times) / len(chunks) * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=20_000)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    ndjson, sse = ndjson_stream(args.chunks), sse_stream(args.chunks)
+    base_ndjson = per_chunk_us(passthrough, ndjson, args.repeats)
+    base_sse = per_chunk_us(passthrough, sse, args.repeats)
+    to_sse = per_chunk_us(lambda s: ndjson_to_sse(s, "m"), ndjson, args.repeats)
+    to_ndjson = per_chunk_us(lambda s: sse_to_ndjson(s, "m"), sse, args.repeats)
+
+    print(
+        f"{args.chunks} chunks, median of {args.repeats} runs (microseconds per chunk)"
+    )
+    print(f"  pass-through:          {base_ndjson:7.2f}")
+    print(f"  NDJSON -> SSE:         {to_sse:7.2f}  (+{to_sse - base_ndjson:.2f})")
+    print(f"  SSE -> NDJSON:         {to_ndjson:7.2f}  (+{to_ndjson - base_sse:.2f})")
+
+
+if __name__ == "__main__":
+    main()
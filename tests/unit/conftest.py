@@ -0,0 +1,133 @@
+"""Shared fixtures: an on-disk Ollama model store and a stand-in registry."""
+
+import hashlib
+import json
+import re
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_modal.manifests import ModelRef, blob_path
+
+
+def _write_model(root, name, blobs):
+    """Write a manifest for ``name`` plus ``{digest: bytes}`` blobs under ``root``."""
+    layers = []
+    for digest, data in blobs.items():
+        blob_path(root, digest).parent.mkdir(parents=True, exist_ok=True)
+        blob_path(root, digest).write_bytes(data)
+        layers.append(
+            {
+                "mediaType": "application/vnd.ollama.image.model",
+                "digest": digest,
+                "size": len(data),
+            }
+        )
+    path = ModelRef.parse(name).manifest_path(root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"schemaVersion": 2, "layers": layers}))
+
+
+@pytest.fixture
+def write_model():
+    """``write_model(root, name, {digest: bytes})`` lays out a model like Ollama."""
+    return _write_model
+
+
+class FakeRegistry:
+    """Serves manifests and blobs the way registry.ollama.ai does.
+
+    The routes are ``/v2/<ns>/<repo>/manifests/<tag>`` and
+    ``/v2/<ns>/<repo>/blobs/<digest>``. Blob requests are redirected to
+    ``/cdn/<digest>`` like the real registry.
+    ``fail_after`` makes blob range requests start failing after that many succeed.
+    """
+
+    def __init__(self) -> None:
+        self.blobs: dict[str, bytes] = {}
+        self.manifests: dict[str, bytes] = {}
+        self.blob_requests: list[tuple[str, str | None]] = []
+        self.fail_after: int | None = None
+        self.lock = threading.Lock()
+
+    def add_model(self, name: str, layers: list[bytes]) -> list[str]:
+        """Publish ``name`` (``repo:tag`` in the library namespace).
+
+        :return: The layer digests
+        """
+        repo, tag = name.split(":")
+        entries = []
+        for data in layers:
+            digest = "sha256:" + hashlib.sha256(data).hexdigest()
+            self.blobs[digest] = data
+            entries.append(
+                {
+                    "mediaType": "application/vnd.ollama.image.model",
+                    "digest": digest,
+                    "size": len(data),
+                }
+            )
+        self.manifests[f"library/{repo}/{tag}"] = json.dumps(
+            {"schemaVersion": 2, "config": entries[0], "layers": entries[1:]}
+        ).encode()
+        return [e["digest"] for e in entries]
+
+    def handler(self):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if m := re.fullmatch(r"/v2/(.+)/(.+)/manifests/(.+)", self.path):
+                    body = registry.manifests.get("/".join(m.groups()))
+                    return self._send(body)
+                if m := re.fullmatch(r"/v2/.+/blobs/(.+)", self.path):
+                    self.send_response(307)
+                    self.send_header("Location", f"/cdn/{m.group(1)}")
+                    self.send_header("Content-Length", "0")
+                    return self.end_headers()
+                if m := re.fullmatch(r"/cdn/(.+)", self.path):
+                    rng = self.headers.get("Range")
+                    with registry.lock:
+                        registry.blob_requests.append((m.group(1), rng))
+                        if registry.fail_after is not None:
+                            if registry.fail_after <= 0:
+                                return self._send(None, status=503)
+                            registry.fail_after -= 1
+                    data = registry.blobs.get(m.group(1))
+                    if data is not None and rng:
+                        lo, hi = map(int, rng.removeprefix("bytes=").split("-"))
+                        return self._send(data[lo : hi + 1], status=206)
+                    return self._send(data)
+                self._send(None)
+
+            def _send(self, body, status=200):
+                if body is None:
+                    status, body = (404 if status == 200 else status), b""
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    @contextmanager
+    def serve(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.fixture
+def fake_registry():
+    """A :class:`FakeRegistry` with nothing published yet."""
+    return FakeRegistry()
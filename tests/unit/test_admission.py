@@ -0,0 +1,83 @@
+"""Unit tests for per-model admission control."""
+
+import asyncio
+
+import pytest
+
+from ollama_modal.admission import AdmissionController, Rejected
+
+
+def test_fifo_queue_then_429_when_full():
+    async def main():
+        admission = AdmissionController(limit=1, max_queue=2, max_wait=5)
+        await admission.acquire("m")
+        order = []
+
+        async def waiter(name):
+            await admission.acquire("m")
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter(n)) for n in ("a", "b")]
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await admission.acquire("m")
+        assert full.value.status_code == 429 and full.value.retry_after >= 1
+        # Other models have their own slots.
+        assert await admission.acquire("other") == 0.0
+
+        admission.release("m", service_seconds=1.0)
+        await asyncio.sleep(0)
+        admission.release("m")
+        await asyncio.gather(*tasks)
+        return order, admission.stats()["m"]
+
+    order, stats = asyncio.run(main())
+    assert order == ["a", "b"]
+    assert (stats["in_flight"], stats["queue_depth"], stats["rejected_full"]) == (
+        1,
+        0,
+        1,
+    )
+
+
+def test_wait_deadline_gives_503_and_cancelled_waiters_free_their_place():
+    async def main():
+        admission = AdmissionController(limit=1, max_queue=4, max_wait=0.01)
+        await admission.acquire("m")
+        with pytest.raises(Rejected) as expired:
+            await admission.acquire("m")
+        assert expired.value.status_code == 503
+
+        admission.max_wait = 5
+        abandoned = asyncio.create_task(admission.acquire("m"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.gather(abandoned, return_exceptions=True)
+        stats = admission.stats()["m"]
+        admission.release("m")
+        return stats, admission.stats()
+
+    stats, drained = asyncio.run(main())
+    assert (stats["in_flight"], stats["queue_depth"], stats["rejected_timeout"]) == (
+        1,
+        0,
+        1,
+    )
+    assert drained == {}
+
+
+def test_idle_queues_are_dropped():
+    async def main():
+        admission = AdmissionController(limit=1, max_queue=4, max_wait=0.01)
+        for i in range(100):
+            await admission.acquire(f"model-{i}")
+            admission.release(f"model-{i}")
+        await admission.acquire("m")
+        with pytest.raises(Rejected):
+            await admission.acquire("m")
+        held = list(admission.stats())
+        admission.release("m")
+        return held, admission.stats()
+
+    held, drained = asyncio.run(main())
+    assert held == ["m"] and drained == {}
@@ -0,0 +1,84 @@
+"""Unit tests for prefix-affinity routing."""
+
+from collections import Counter
+
+from ollama_modal.affinity import PrefixAffinity, prefix_key
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+
+
+def chat(*turns):
+    return {"model": "m", "messages": [SYSTEM, *turns]}
+
+
+def test_prefix_key_is_stable_across_turns():
+    u1, a1, u2 = (
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "more"},
+    )
+    first = prefix_key("api/chat", chat(u1))
+    assert first == prefix_key("/v1/chat/completions", chat(u1, a1, u2))
+    assert first != prefix_key("api/chat", chat({"role": "user", "content": "other"}))
+    assert prefix_key("api/tags", None) is None
+
+
+def test_conversations_stick_and_only_removed_replica_keys_move():
+    replicas = [f"http://r{i}" for i in range(4)]
+    affinity = PrefixAffinity(replicas)
+    keys = [f"conv-{i}" for i in range(200)]
+    placement = {}
+    for key in keys:
+        placement[key], _ = affinity.acquire(key)
+        affinity.release(placement[key])
+    for key in keys:
+        replica, hit = affinity.acquire(key)
+        affinity.release(replica)
+        assert hit and replica == placement[key]
+    assert affinity.stats()["prefix_hit_rate"] == 0.5
+
+    affinity.set_replicas(replicas[:3])
+    for key in keys:
+        replica, _ = affinity.acquire(key)
+        affinity.release(replica)
+        if placement[key] != "http://r3":
+            assert replica == placement[key]
+
+
+def test_bounded_load_spills_hot_key():
+    affinity = PrefixAffinity(["http://a", "http://b"], epsilon=0.0)
+    used = Counter(affinity.acquire("hot")[0] for _ in range(10))
+    assert set(used) == {"http://a", "http://b"}
+    assert max(used.values()) - min(used.values()) <= 1
+    assert affinity.stats()["spills"] > 0
+
+
+def test_down_replica_leaves_the_ring_until_marked_up():
+    replicas = [f"http://r{i}" for i in range(3)]
+    affinity = PrefixAffinity(replicas)
+
+    def route(key):
+        replica, _ = affinity.acquire(key)
+        affinity.release(replica)
+        return replica
+
+    keys = [f"conv-{i}" for i in range(100)]
+    placement = {key: route(key) for key in keys}
+
+    affinity.mark_down("http://r0")
+    assert affinity.stats()["down"] == ["http://r0"]
+    for key in keys:
+        replica = route(key)
+        assert replica != "http://r0"
+        if placement[key] != "http://r0":
+            assert replica == placement[key]
+
+    affinity.mark_up("http://r0")
+    assert all(route(key) == placement[key] for key in keys)
+
+
+def test_all_replicas_down_still_routes():
+    affinity = PrefixAffinity(["http://a", "http://b"])
+    affinity.mark_down("http://a")
+    affinity.mark_down("http://b")
+    assert affinity.acquire("conv")[0] in {"http://a", "http://b"}
@@ -0,0 +1,94 @@
+"""Unit tests for the vLLM parameter autotuner, against the simulated backend."""
+
+import pytest
+
+from ollama_modal.autotune import (
+    LevelResult,
+    NoViableConfig,
+    Sample,
+    SimulatedBackend,
+    Slo,
+    Workload,
+    cli_args,
+    expand_grid,
+    load_profile,
+    tune,
+    write_profile,
+)
+
+GRID = {
+    "max_num_seqs": [4, 8, 16, 32],
+    "max_num_batched_tokens": [8192],
+    "gpu_memory_utilization": [0.5, 0.9],
+    "max_model_len": [32768],
+}
+
+
+def test_goodput_counts_only_requests_within_slo():
+    samples = [
+        Sample(0.5, 0.05, 10, 200),
+        Sample(3.0, 0.05, 12, 200),
+        Sample(0.5, 0.2, 40, 200),
+        Sample(0, 0, 1, 0, ok=False),
+    ]
+    level = LevelResult(4, samples, seconds=10.0)
+    assert level.goodput(Slo(ttft=2.0, itl=0.1)) == 0.1
+    assert level.goodput(Slo(ttft=None, itl=None)) == 0.3
+    assert level.as_dict(Slo())["errors"] == 1
+
+
+def test_expand_grid_and_cli_args():
+    configs = expand_grid({"max_num_seqs": [8, 16], "gpu_memory_utilization": [0.9]})
+    assert configs == [
+        {"gpu_memory_utilization": 0.9, "max_num_seqs": 8},
+        {"gpu_memory_utilization": 0.9, "max_num_seqs": 16},
+    ]
+    assert cli_args(configs[0]) == [
+        "--gpu-memory-utilization",
+        "0.9",
+        "--max-num-seqs",
+        "8",
+    ]
+
+
+def test_tighter_itl_slo_picks_a_smaller_batch():
+    backend, workload = SimulatedBackend(), Workload()
+    loose = tune(backend, GRID, workload, Slo(ttft=2.0, itl=0.1))
+    tight = tune(backend, GRID, workload, Slo(ttft=2.0, itl=0.045))
+    assert loose.best.params["max_num_seqs"] == 32
+    assert tight.best.params["max_num_seqs"] < 32
+    assert tight.best.score > 0
+
+
+def test_configs_that_do_not_fit_score_zero():
+    grid = {**GRID, "gpu_memory_utilization": [0.4], "max_model_len": [65536, 8192]}
+    result = tune(SimulatedBackend(), grid, Workload(concurrency=(1, 8)), Slo())
+    failed = [t for t in result.trials if t.error]
+    assert failed and all(
+        t.params["max_model_len"] == 65536 and t.score == 0 for t in failed
+    )
+    assert result.best.params["max_model_len"] == 8192
+
+
+def test_profile_round_trip(tmp_path):
+    result = tune(SimulatedBackend(), GRID, Workload(concurrency=(1, 4)), Slo())
+    write_profile(tmp_path / "profile.json", result)
+    assert load_profile(tmp_path / "profile.json") == result.best.params
+    assert load_profile(tmp_path / "missing.json") == {}
+
+
+def test_no_profile_when_nothing_meets_the_slo():
+    with pytest.raises(NoViableConfig) as failed:
+        tune(
+            SimulatedBackend(),
+            GRID,
+            Workload(concurrency=(1,)),
+            Slo(ttft=0.001, itl=None),
+        )
+    assert len(failed.value.trials) == 8 and all(
+        t.score == 0 for t in failed.value.trials
+    )
+    oversized = {**GRID, "gpu_memory_utilization": [0.4], "max_model_len": [65536]}
+    with pytest.raises(NoViableConfig) as failed:
+        tune(SimulatedBackend(), oversized, Workload(concurrency=(1,)), Slo())
+    assert all(t.error for t in failed.value.trials)
@@ -0,0 +1,74 @@
+"""Unit tests for the two-tier response cache."""
+
+import asyncio
+
+from ollama_modal.cache import CachedResponse, ResponseCache
+
+NDJSON = CachedResponse(
+    200, "application/x-ndjson", b'{"response":"a"}\n{"done":true}\n'
+)
+
+
+def test_memory_lru_is_bounded_by_bytes():
+    cache = ResponseCache(memory_bytes=2 * NDJSON.nbytes)
+    for key in ("k1", "k2", "k3"):
+        cache.put("m", "sha256:1", key, NDJSON)
+    assert cache.get("m", "sha256:1", "k1") is None
+    assert cache.get("m", "sha256:1", "k3") == NDJSON
+    stats = cache.stats()
+    assert (stats["evictions"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_tier_survives_restart_and_replays_stream(tmp_path):
+    ResponseCache(disk_root=tmp_path).put("gemma4:12b", "sha256:1", "k", NDJSON)
+    cache = ResponseCache(disk_root=tmp_path)
+    hit = cache.get("gemma4:12b", "sha256:1", "k")
+    assert list(hit.chunks()) == [b'{"response":"a"}\n', b'{"done":true}\n']
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_new_model_digest_invalidates_old_entries(tmp_path):
+    cache = ResponseCache(disk_root=tmp_path)
+    cache.put("m", "sha256:old", "k", NDJSON)
+    assert cache.get("m", "sha256:new", "k") is None
+    assert not any(p.name == "sha256-old" for p in tmp_path.rglob("*"))
+    assert cache.stats()["entries"] == 0
+
+
+def test_tee_stores_complete_body():
+    cache = ResponseCache()
+
+    async def body():
+        yield b"data: 1\n\n"
+        yield b"data: [DONE]\n\n"
+
+    async def store(entry):
+        cache.put("m", "sha256:1", "k", entry)
+
+    async def main():
+        return [c async for c in cache.tee(body(), 200, "text/event-stream", store)]
+
+    assert asyncio.run(main()) == [b"data: 1\n\n", b"data: [DONE]\n\n"]
+    assert cache.get("m", "sha256:1", "k").body == b"data: 1\n\ndata: [DONE]\n\n"
+
+
+def test_disk_tier_keeps_similar_model_names_apart(tmp_path):
+    ResponseCache(disk_root=tmp_path).put("a:b", "sha256:1", "k", NDJSON)
+    cache = ResponseCache(disk_root=tmp_path)
+    assert cache.get("a_b", "sha256:1", "k") is None
+    cache.put("a_b", "sha256:2", "k", NDJSON)
+    # a_b's first digest must not count a:b's entries as stale.
+    assert ResponseCache(disk_root=tmp_path).get("a:b", "sha256:1", "k") == NDJSON
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_streams_ending_in_an_error_are_not_cached(tmp_path):
+    cache = ResponseCache(disk_root=tmp_path)
+    failed = CachedResponse(
+        200,
+        "application/x-ndjson",
+        b'{"response":"a"}\n{"error":"model runner has unexpectedly stopped"}\n',
+    )
+    cache.put("m", "sha256:1", "k", failed)
+    assert cache.get("m", "sha256:1", "k") is None
+    assert cache.stats()["stores"] == 0 and not list(tmp_path.rglob("*.json"))
@@ -0,0 +1,107 @@
+"""Unit tests for the manifest-backed model catalog."""
+
+import hashlib
+import json
+import os
+import struct
+
+from ollama_modal.catalog import Catalog
+from ollama_modal.manifests import ModelRef, blob_path
+from ollama_modal.routing import MODEL_MEDIA_TYPE
+
+
+def digest(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def gguf_header(**metadata) -> bytes:
+    """A GGUF v3 header holding string or uint32 metadata and no tensors."""
+    out = b"GGUF" + struct.pack("<IQQ", 3, 0, len(metadata))
+    for key, value in metadata.items():
+        name = key.replace("__", ".").encode()
+        out += struct.pack("<Q", len(name)) + name
+        if isinstance(value, int):
+            out += struct.pack("<II", 4, value)
+        else:
+            out += struct.pack("<IQ", 8, len(value.encode())) + value.encode()
+    return out
+
+
+def write_ollama_model(root, name, config: dict, weights: bytes):
+    config_raw = json.dumps(config).encode()
+    for data in (config_raw, weights):
+        blob_path(root, digest(data)).parent.mkdir(parents=True, exist_ok=True)
+        blob_path(root, digest(data)).write_bytes(data)
+    manifest = {
+        "schemaVersion": 2,
+        "config": {
+            "mediaType": "application/vnd.docker.container.image.v1+json",
+            "digest": digest(config_raw),
+            "size": len(config_raw),
+        },
+        "layers": [
+            {
+                "mediaType": MODEL_MEDIA_TYPE,
+                "digest": digest(weights),
+                "size": len(weights),
+            }
+        ],
+    }
+    path = ModelRef.parse(name).manifest_path(root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest))
+
+
+def test_catalog_reads_config_and_gguf_details(tmp_path):
+    write_ollama_model(
+        tmp_path,
+        "gemma4:12b",
+        {
+            "model_format": "gguf",
+            "model_family": "gemma4",
+            "model_type": "12.2B",
+            "file_type": "Q4_K_M",
+        },
+        b"weights",
+    )
+    header = gguf_header(
+        general__architecture="llama", general__file_type=15, general__size_label="3B"
+    )
+    write_ollama_model(tmp_path, "llama3.2", {}, header)
+
+    gemma, llama = Catalog(tmp_path).refresh()
+    assert (gemma.name, gemma.family, gemma.parameter_size, gemma.quantization) == (
+        "gemma4:12b",
+        "gemma4",
+        "12.2B",
+        "Q4_K_M",
+    )
+    assert gemma.size == sum(layer["size"] for layer in gemma.layers)
+    assert len(gemma.layers) == 2 and gemma.digest.startswith("sha256:")
+    assert (llama.name, llama.family, llama.parameter_size, llama.quantization) == (
+        "llama3.2:latest",
+        "llama",
+        "3B",
+        "Q4_K_M",
+    )
+    assert llama.families == ["llama"]
+
+
+def test_catalog_rereads_only_changed_manifests(tmp_path, write_model):
+    write_model(tmp_path, "tiny:1b", {"sha256:aa": b"abc"})
+    write_model(tmp_path, "tiny:2b", {"sha256:bb": b"de"})
+    catalog = Catalog(tmp_path)
+    assert [m.name for m in catalog.refresh()] == ["tiny:1b", "tiny:2b"]
+    catalog.save()
+    assert not catalog.dirty
+
+    reloaded = Catalog(tmp_path)
+    assert [m.size for m in reloaded.refresh()] == [3, 2]
+    assert not reloaded.dirty
+
+    write_model(tmp_path, "tiny:2b", {"sha256:bb": b"de", "sha256:cc": b"fgh"})
+    path = ModelRef.parse("tiny:2b").manifest_path(tmp_path)
+    os.utime(path, ns=(1, 10**18))
+    ModelRef.parse("tiny:1b").manifest_path(tmp_path).unlink()
+    assert [(m.name, m.size) for m in reloaded.refresh()] == [("tiny:2b", 5)]
+    assert reloaded.dirty
@@ -0,0 +1,60 @@
+"""Unit tests for in-flight request coalescing."""
+
+import asyncio
+
+from ollama_modal.coalesce import Coalescer, Upstream, canonical_key
+
+
+def test_canonical_key_only_for_deterministic_requests():
+    a = canonical_key(
+        "/api/generate", {"model": "m", "prompt": "hi", "options": {"temperature": 0}}
+    )
+    b = canonical_key(
+        "api/generate", {"options": {"temperature": 0}, "prompt": "hi", "model": "m"}
+    )
+    assert a is not None and a == b
+    assert canonical_key("api/generate", {"model": "m", "prompt": "hi"}) is None
+    assert canonical_key("v1/chat/completions", {"model": "m", "seed": 1}) is not None
+    assert canonical_key("v1/embeddings", {"model": "m", "input": "x"}) is not None
+    assert canonical_key("api/tags", {}) is None
+
+
+def test_concurrent_duplicates_share_one_streaming_upstream_call():
+    calls = 0
+
+    async def open_upstream():
+        nonlocal calls
+        calls += 1
+
+        async def body():
+            for chunk in (
+                b'{"response":"a"}\n',
+                b'{"response":"b"}\n',
+                b'{"done":true}\n',
+            ):
+                await asyncio.sleep(0.01)
+                yield chunk
+
+        async def close():
+            pass
+
+        return Upstream(200, {"content-type": "application/x-ndjson"}, body(), close)
+
+    async def consume(coalescer):
+        status, _, stream, shared = await coalescer.open("k", open_upstream)
+        return status, b"".join([chunk async for chunk in stream]), shared
+
+    async def main():
+        coalescer = Coalescer()
+        first = asyncio.create_task(consume(coalescer))
+        await asyncio.sleep(0.015)  # join mid-stream
+        results = await asyncio.gather(first, *(consume(coalescer) for _ in range(3)))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(main())
+    assert calls == 1
+    assert {body for _, body, _ in results} == {
+        b'{"response":"a"}\n{"response":"b"}\n{"done":true}\n'
+    }
+    assert [shared for _, _, shared in results] == [False, True, True, True]
+    assert coalescer.stats() == {"upstream_calls": 1, "coalesced": 3, "in_flight": 0}
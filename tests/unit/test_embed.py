@@ -0,0 +1,93 @@
+"""Unit tests for the embedding micro-batcher."""
+
+import asyncio
+
+from ollama_modal.embed import EmbeddingBatcher, UpstreamError, batchable, handle_embed
+
+
+def fake_send(calls):
+    async def send(upstream, payload):
+        calls.append(payload["input"])
+        if "boom" in payload["input"]:
+            raise UpstreamError(500, b'{"error":"boom"}')
+        return {
+            "embeddings": [[float(len(t))] for t in payload["input"]],
+            "prompt_eval_count": 10,
+        }
+
+    return send
+
+
+def test_batchable():
+    assert batchable("/api/embed", {"model": "m", "input": "x"})
+    assert batchable("v1/embeddings", {"model": "m", "input": ["x", "y"]})
+    assert not batchable(
+        "v1/embeddings", {"model": "m", "input": "x", "encoding_format": "base64"}
+    )
+    assert not batchable("api/embed", {"model": "m", "input": [1, 2]})
+    assert not batchable("api/generate", {"model": "m", "input": "x"})
+
+
+def test_concurrent_requests_share_one_upstream_call_and_cache():
+    calls = []
+    batcher = EmbeddingBatcher(fake_send(calls), window=0.01, max_batch=64)
+
+    async def main():
+        requests = [
+            handle_embed(batcher, "u", "api/embed", {"model": "m", "input": "aa"}),
+            handle_embed(
+                batcher, "u", "v1/embeddings", {"model": "m", "input": ["bbb", "aa"]}
+            ),
+            handle_embed(
+                batcher, "u", "api/embed", {"model": "m", "input": "c", "dimensions": 2}
+            ),
+        ]
+        first = await asyncio.gather(*requests)
+        again = await handle_embed(
+            batcher, "u", "api/embed", {"model": "m", "input": ["aa", "bbb"]}
+        )
+        return first, again
+
+    (ollama, openai, other_params), again = asyncio.run(main())
+    assert sorted(calls) == [["aa", "bbb"], ["c"]]
+    assert ollama["embeddings"] == [[2.0]]
+    assert [d["embedding"] for d in openai["data"]] == [[3.0], [2.0]]
+    assert other_params["embeddings"] == [[1.0]]
+    assert again["embeddings"] == [[2.0], [3.0]]
+    assert batcher.stats()["cache_hits"] == 2
+
+
+def test_max_batch_flushes_early_and_errors_reach_every_caller():
+    calls = []
+    batcher = EmbeddingBatcher(fake_send(calls), window=10, max_batch=2)
+
+    async def main():
+        return await asyncio.gather(
+            batcher.embed("u", "m", ["boom"], {}),
+            batcher.embed("u", "m", ["x"], {}),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert calls == [["boom", "x"]]
+    assert all(isinstance(r, UpstreamError) and r.status_code == 500 for r in results)
+
+
+def test_malformed_upstream_response_fails_every_caller():
+    async def send(upstream, payload):
+        return {"embeddings": [[1.0]]}  # one vector for two texts
+
+    batcher = EmbeddingBatcher(send, window=0.01, max_batch=64)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                batcher.embed("u", "m", ["x"], {}),
+                batcher.embed("u", "m", ["y"], {}),
+                return_exceptions=True,
+            ),
+            timeout=1,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, UpstreamError) and r.status_code == 502 for r in results)
@@ -0,0 +1,73 @@
+"""Unit tests for backend selection in the gateway."""
+
+import json
+
+from ollama_modal.gateway import Gateway, OllamaBackend, VllmBackend, output_tokens
+
+
+def make_gateway():
+    vllm = VllmBackend(
+        "vllm", "http://v", {"qwen": "qwen-awq"}, concurrency=2, max_queue=1
+    )
+    ollama = OllamaBackend("ollama", "http://o", {"qwen": "qwen3.6:27b", "*": "*"})
+    return Gateway([vllm, ollama]), vllm, ollama
+
+
+def names(candidates):
+    return [(b.name, model) for b, model in candidates]
+
+
+def test_output_tokens():
+    assert output_tokens({"max_tokens": 32}) == 32
+    assert output_tokens({"options": {"num_predict": 64}}) == 64
+    assert output_tokens({"options": {"num_predict": -1}}) == 256
+    assert output_tokens(None) == 256
+
+
+def test_model_mapping_and_wildcard():
+    gateway, _, _ = make_gateway()
+    assert names(gateway.candidates("qwen")) == [
+        ("vllm", "qwen-awq"),
+        ("ollama", "qwen3.6:27b"),
+    ]
+    assert names(gateway.candidates("llama3.2")) == [("ollama", "llama3.2")]
+    assert gateway.models() == ["qwen"]
+
+
+def test_warm_backend_beats_cold_one():
+    gateway, _, ollama = make_gateway()
+    ollama.observe("qwen", ttft=0.5, tokens_per_second=40)
+    assert names(gateway.candidates("qwen"))[0][0] == "ollama"
+    # Warmth is per model.
+    assert not ollama.warm("other")
+
+
+def test_queue_depth_and_saturation_push_a_backend_back():
+    gateway, vllm, ollama = make_gateway()
+    vllm.observe("qwen", ttft=0.2, tokens_per_second=100)
+    ollama.observe("qwen", ttft=0.5, tokens_per_second=40)
+    assert names(gateway.candidates("qwen"))[0][0] == "vllm"
+    for _ in range(3):
+        gateway.acquire(vllm)
+    assert vllm.saturated
+    assert names(gateway.candidates("qwen"))[0][0] == "ollama"
+    gateway.release(vllm)
+    gateway.failed(vllm)
+    stats = gateway.stats()["vllm"]
+    assert (stats["in_flight"], stats["requests"], stats["failures"]) == (1, 3, 1)
+
+
+def test_completed_updates_speed_from_final_chunk():
+    gateway, _, ollama = make_gateway()
+    done = {
+        "done": True,
+        "eval_count": 100,
+        "eval_duration": 1_000_000_000,
+        "prompt_eval_duration": 100_000_000,
+    }
+    gateway.completed(
+        ollama, "qwen", json.dumps(done).encode() + b"\n", ttfb=0.3, elapsed=2.0
+    )
+    assert ollama.warm("qwen")
+    assert round(ollama.tokens_per_second, 1) == round(0.8 * 30 + 0.2 * 100, 1)
+    assert round(ollama.ttft_seconds, 3) == round(0.8 * 1.0 + 0.2 * 0.1, 3)
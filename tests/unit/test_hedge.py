@@ -0,0 +1,130 @@
+"""Unit tests for hedged requests."""
+
+import asyncio
+
+from ollama_modal.coalesce import Upstream
+from ollama_modal.hedge import HedgePolicy, is_streaming, race
+
+
+class FakeUpstreams:
+    """``start`` for ``race``.
+
+    Upstream ``i`` answers with ``statuses[i]`` after ``delays[i]`` seconds.
+    """
+
+    def __init__(self, delays, statuses=None):
+        self.delays = delays
+        self.statuses = statuses or [200] * len(delays)
+        self.started = []
+        self.closed = []
+
+    async def start(self, index, hedge):
+        self.started.append((index, hedge))
+
+        async def body():
+            await asyncio.sleep(self.delays[index])
+            yield f"upstream {index}".encode()
+
+        async def close():
+            self.closed.append(index)
+
+        return Upstream(self.statuses[index], {}, body(), close)
+
+
+async def read(attempt):
+    return b"".join([chunk async for chunk in attempt.opened.body])
+
+
+def test_slow_request_is_hedged_and_the_loser_closed():
+    upstreams = FakeUpstreams([1.0, 0.01])
+    policy = HedgePolicy(initial_seconds=0.05)
+
+    async def main():
+        attempt = await race(upstreams.start, 2, policy)
+        return attempt, await read(attempt)
+
+    attempt, body = asyncio.run(main())
+    assert (attempt.index, attempt.hedge, body) == (1, True, b"upstream 1")
+    assert upstreams.started == [(0, False), (1, True)]
+    assert upstreams.closed == [0]
+    stats = policy.stats()
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+
+
+def test_slow_original_is_sampled_when_the_hedge_wins():
+    upstreams = FakeUpstreams([1.0, 0.01])
+    policy = HedgePolicy(initial_seconds=0.05)
+    asyncio.run(race(upstreams.start, 2, policy))
+    # The hedge's own time to first chunk, and the original's wait so far.
+    fast, slow = sorted(policy._samples)
+    assert fast < 0.05 <= slow
+
+
+def test_fast_request_is_not_hedged():
+    upstreams = FakeUpstreams([0.0, 0.0])
+    policy = HedgePolicy(initial_seconds=0.5)
+    attempt = asyncio.run(race(upstreams.start, 2, policy))
+    assert attempt.index == 0 and not attempt.hedge
+    assert upstreams.started == [(0, False)]
+    assert policy.stats()["samples"] == 1
+
+
+def test_single_upstream_is_hedged_against_itself():
+    upstreams = FakeUpstreams([0.2])
+    attempt = asyncio.run(race(upstreams.start, 1, HedgePolicy(initial_seconds=0.01)))
+    assert upstreams.started == [(0, False), (0, True)]
+    assert attempt.index == 0
+
+
+def test_budget_caps_extra_load():
+    upstreams = FakeUpstreams([0.05, 0.0])
+    policy = HedgePolicy(initial_seconds=0.01, max_extra=0.5, burst=1.0)
+
+    async def main():
+        for _ in range(4):
+            await race(upstreams.start, 2, policy)
+
+    asyncio.run(main())
+    stats = policy.stats()
+    # One hedge from the initial burst, then one per two requests.
+    assert (stats["hedged"], stats["over_budget"]) == (2, 2)
+    assert stats["hedge_rate"] == 0.5
+
+
+def test_opted_out_requests_are_observed_but_not_hedged():
+    upstreams = FakeUpstreams([0.05, 0.0])
+    policy = HedgePolicy(initial_seconds=0.01)
+    asyncio.run(race(upstreams.start, 2, policy, hedge=False))
+    assert upstreams.started == [(0, False)]
+    assert policy.stats()["requests"] == 0 and policy.stats()["samples"] == 1
+
+
+def test_failed_upstream_falls_back_without_hedging():
+    upstreams = FakeUpstreams([0.0, 0.0], statuses=[503, 200])
+    attempt = asyncio.run(race(upstreams.start, 2))
+    assert attempt.index == 1 and not attempt.hedge
+    assert upstreams.closed == [0]
+
+
+def test_every_upstream_failing_returns_the_last_response():
+    upstreams = FakeUpstreams([0.0, 0.0], statuses=[503, 429])
+    attempt = asyncio.run(race(upstreams.start, 2))
+    assert attempt.opened.status_code == 429
+    assert upstreams.closed == [0]
+
+
+def test_threshold_tracks_the_tail_and_estimates_savings():
+    policy = HedgePolicy(min_samples=10, min_seconds=0.0)
+    for i in range(100):
+        policy.observe(i / 100)
+    assert policy.threshold() == 0.95
+    policy.won(0.9)
+    # Recent samples above 0.9s average 0.95s.
+    assert policy.stats()["latency_saved_seconds"] == 0.05
+
+
+def test_is_streaming_defaults_per_api():
+    assert is_streaming("api/chat", {"model": "m"})
+    assert not is_streaming("v1/chat/completions", {"model": "m"})
+    assert is_streaming("v1/chat/completions", {"model": "m", "stream": True})
+    assert not is_streaming("api/generate", {"model": "m", "stream": False})
@@ -0,0 +1,71 @@
+"""Smoke checks that app files import with only their images' packages installed.
+
+Modal imports the whole app file in every container, so a top-level import
+of a package one image lacks breaks every function on that image.
+"""
+
+import ast
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parents[2]
+# Packages that come along with the ones an image installs.
+BUNDLED = {"fastapi": {"starlette", "pydantic"}}
+
+
+def image_packages(app_file: Path, image: str) -> set[str]:
+    """The packages ``image`` installs with ``pip_install``, plus ``modal`` itself."""
+    packages = {"modal"}
+    for node in ast.walk(ast.parse(app_file.read_text())):
+        if isinstance(node, ast.Assign) and any(
+            getattr(t, "id", None) == image for t in node.targets
+        ):
+            for call in ast.walk(node.value):
+                if (
+                    isinstance(call, ast.Call)
+                    and getattr(call.func, "attr", None) == "pip_install"
+                ):
+                    for arg in call.args:
+                        name = arg.value.split("[")[0].split("=")[0].split(">")[0]
+                        packages |= {name} | BUNDLED.get(name, set())
+    return packages
+
+
+def top_level_imports(path: Path) -> set[str]:
+    """Modules imported when ``path`` is imported (not inside functions)."""
+    modules = set()
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.Import):
+            modules |= {alias.name for alias in node.names}
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module)
+    return modules
+
+
+def third_party_imports(path: Path) -> set[str]:
+    """Third-party packages needed to import ``path``.
+
+    Only top-level imports count; ``ollama_modal`` imports are followed.
+    """
+    needed, seen, todo = set(), set(), [path]
+    while todo:
+        for module in top_level_imports(todo.pop()):
+            root = module.split(".")[0]
+            if root == "ollama_modal":
+                source = ROOT / (module.replace(".", "/") + ".py")
+                if source.exists() and source not in seen:
+                    seen.add(source)
+                    todo.append(source)
+            elif root not in sys.stdlib_module_names and root != "__future__":
+                needed.add(root)
+    return needed
+
+
+def test_vllm_endpoint_imports_on_the_gateway_image():
+    app_file = ROOT / "vllm_endpoint.py"
+    installed = image_packages(app_file, "gateway_image")
+    # ollama_api builds its app from ollama_modal.proxy.
+    needed = third_party_imports(app_file) | third_party_imports(
+        ROOT / "ollama_modal" / "proxy.py"
+    )
+    assert needed <= installed, f"missing from gateway_image: {needed - installed}"
@@ -0,0 +1,73 @@
+"""Unit tests for the vLLM sleep/wake lifecycle."""
+
+import pytest
+
+from ollama_modal.lifecycle import ASLEEP, AWAKE, EngineLifecycle
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def sleep(self, level):
+        self.calls.append(("sleep", level))
+
+    def wake(self):
+        self.calls.append(("wake",))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_snapshot_sleep_and_restore_wake_are_recorded():
+    engine = FakeEngine()
+    lifecycle = EngineLifecycle(engine.sleep, engine.wake, level=1)
+    lifecycle.sleep("snapshot")
+    assert lifecycle.sleep("snapshot") == 0.0
+    lifecycle.wake("restore")
+    assert engine.calls == [("sleep", 1), ("wake",)]
+    stats = lifecycle.as_dict()
+    assert stats["state"] == AWAKE
+    assert [(t["transition"], t["reason"]) for t in stats["transitions"]] == [
+        ("sleep", "snapshot"),
+        ("wake", "restore"),
+    ]
+    assert stats["totals"]["wake"]["count"] == 1
+
+
+def test_idle_engine_sleeps_and_next_request_wakes_it():
+    engine, clock = FakeEngine(), Clock()
+    lifecycle = EngineLifecycle(
+        engine.sleep, engine.wake, level=2, idle_after=60, clock=clock
+    )
+    lifecycle.begin()
+    clock.now = 100
+    assert not lifecycle.maybe_sleep()  # a request is still running
+    lifecycle.end()
+    clock.now = 130
+    assert not lifecycle.maybe_sleep()
+    clock.now = 161
+    assert lifecycle.maybe_sleep()
+    assert lifecycle.state == ASLEEP and engine.calls == [("sleep", 2)]
+
+    lifecycle.begin()
+    assert lifecycle.state == AWAKE and engine.calls[-1] == ("wake",)
+    lifecycle.end()
+    assert [t["reason"] for t in lifecycle.as_dict()["transitions"]] == [
+        "idle",
+        "request",
+    ]
+
+
+def test_no_idle_sleep_by_default():
+    engine, clock = FakeEngine(), Clock()
+    lifecycle = EngineLifecycle(engine.sleep, engine.wake, clock=clock)
+    clock.now = 10_000
+    assert not lifecycle.maybe_sleep()
+    with pytest.raises(ValueError):
+        EngineLifecycle(engine.sleep, engine.wake, level=3)
@@ -0,0 +1,149 @@
+"""Unit tests for open/closed-loop load generation and the saturation knee."""
+
+import asyncio
+
+import pytest
+
+from ollama_modal.autotune import Slo
+from ollama_modal.loadgen import (
+    RequestResult,
+    Step,
+    StreamRecorder,
+    arrivals,
+    closed_loop,
+    find_knee,
+    open_loop,
+)
+
+
+def test_arrivals():
+    assert arrivals(4, 3, "fixed") == [0.0, 0.25, 0.5]
+    poisson = arrivals(10, 2000, seed=1)
+    assert poisson == arrivals(10, 2000, seed=1)
+    assert poisson[-1] / len(poisson) == pytest.approx(0.1, rel=0.1)
+    with pytest.raises(ValueError):
+        arrivals(0, 3)
+    with pytest.raises(ValueError):
+        arrivals(1, 3, "bursty")
+
+
+def slow_send(seconds, in_flight):
+    async def send(i):
+        in_flight.append(in_flight[-1] + 1 if in_flight else 1)
+        await asyncio.sleep(seconds)
+        in_flight.append(in_flight[-1] - 1)
+        return RequestResult(
+            ttft=seconds, e2e=seconds, output_tokens=10, itls=[0.01] * 9
+        )
+
+    return send
+
+
+def test_open_loop_does_not_wait_for_earlier_requests():
+    in_flight = []
+    step = asyncio.run(
+        open_loop(slow_send(0.2, in_flight), rate=100, n=10, process="fixed")
+    )
+    assert step.mode == "rate" and len(step.results) == 10
+    assert max(in_flight) == 10
+    assert step.seconds < 0.5
+
+
+def test_closed_loop_caps_requests_in_flight():
+    in_flight = []
+    step = asyncio.run(closed_loop(slow_send(0.01, in_flight), concurrency=3, n=9))
+    assert max(in_flight) == 3
+    assert step.mode == "concurrency" and step.level == 3
+
+
+def test_summary_reports_percentiles_errors_and_goodput():
+    results = [
+        RequestResult(ttft=t, e2e=t + 1, output_tokens=100, itls=[0.02, 0.04])
+        for t in (0.1, 0.2, 3.0)
+    ]
+    results.append(RequestResult(0.0, 5.0, 0, ok=False, error="HTTPStatusError"))
+    summary = Step("rate", 1.0, results, seconds=10.0).summary(Slo(ttft=2.0, itl=0.1))
+    assert summary["error_rate"] == 0.25
+    assert summary["ttft_p50"] == 0.2 and summary["ttft_p99"] == 3.0
+    assert summary["itl_p50"] == 0.04
+    assert summary["output_tokens_per_second"] == 30.0
+    assert summary["goodput"] == 0.2
+
+
+def step(level, good, bad=0):
+    fast = [RequestResult(0.1, 1.0, 10)] * good
+    slow = [RequestResult(9.0, 10.0, 10)] * bad
+    return Step("rate", level, fast + slow, seconds=10.0)
+
+
+def test_knee_is_lowest_load_where_goodput_stops_growing():
+    slo = Slo(ttft=2.0, itl=None)
+    steps = [
+        step(1, 10),
+        step(2, 20),
+        step(4, 39),
+        step(8, 40, bad=20),
+        step(16, 25, bad=60),
+    ]
+    assert find_knee(steps, slo)["level"] == 4
+    assert find_knee([step(1, 0, bad=5)], slo) is None
+    assert find_knee([], slo) is None
+
+
+def recorded(chunks, count_tokens=None):
+    ticks = iter(range(100))
+    recorder = StreamRecorder(clock=lambda: float(next(ticks)))
+    for chunk in chunks:
+        recorder.feed(chunk)
+    return recorder.result(count_tokens)
+
+
+def delta(**fields):
+    return {"choices": [{"delta": fields}]}
+
+
+THINK_THEN_ANSWER = [
+    delta(role="assistant"),
+    delta(reasoning_content="Let me think"),
+    delta(content="Two words"),
+]
+
+
+def test_recorder_prefers_server_usage_and_splits_reasoning():
+    usage = {
+        "choices": [],
+        "usage": {
+            "completion_tokens": 40,
+            "completion_tokens_details": {"reasoning_tokens": 30},
+        },
+    }
+    result = recorded(THINK_THEN_ANSWER + [usage])
+    assert (result.output_tokens, result.reasoning_tokens, result.content_tokens) == (
+        40,
+        30,
+        10,
+    )
+    assert result.token_source == "usage"
+    # Clock ticks: start 0, chunks at 1, 2, 3, usage at 4, end at 5.
+    assert (result.ttft, result.e2e, result.itls) == (2.0, 5.0, [1.0])
+    assert result.tpot == 3.0 / 39
+
+    no_details = recorded(
+        THINK_THEN_ANSWER + [{"choices": [], "usage": {"completion_tokens": 40}}], len
+    )
+    assert (no_details.reasoning_tokens, no_details.content_tokens) == (23, 17)
+
+
+def test_recorder_falls_back_to_tokenizer_then_chunks():
+    by_tokenizer = recorded(
+        THINK_THEN_ANSWER, count_tokens=lambda text: len(text.split())
+    )
+    assert (by_tokenizer.reasoning_tokens, by_tokenizer.content_tokens) == (3, 2)
+    assert by_tokenizer.token_source == "tokenizer"
+    by_chunks = recorded(THINK_THEN_ANSWER + [delta(reasoning="more")])
+    assert (
+        by_chunks.reasoning_tokens,
+        by_chunks.content_tokens,
+        by_chunks.token_source,
+    ) == (2, 1, "chunks")
+    assert not recorded([delta(role="assistant")]).ok
@@ -0,0 +1,137 @@
+"""Unit tests for the LoRA adapter cache and batch slots."""
+
+import asyncio
+
+import pytest
+
+from ollama_modal.lora import AdapterManager, UnknownAdapter
+
+
+def make_adapters(root, names):
+    for name in names:
+        (root / name).mkdir()
+        (root / name / "adapter_config.json").write_text("{}")
+
+
+class FakeEngine:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.loaded = []
+        self.unloaded = []
+
+    async def load(self, name, path):
+        await asyncio.sleep(self.delay)
+        self.loaded.append(name)
+
+    async def unload(self, name):
+        self.unloaded.append(name)
+
+
+def test_loads_on_demand_and_evicts_least_recently_used(tmp_path):
+    make_adapters(tmp_path, ["a", "b", "c"])
+    engine = FakeEngine()
+    manager = AdapterManager(tmp_path, engine.load, engine.unload, capacity=2, slots=2)
+
+    async def use(name):
+        await manager.acquire(name)
+        await manager.release(name)
+
+    async def main():
+        for name in ["a", "b", "a", "c", "a"]:
+            await use(name)
+
+    asyncio.run(main())
+    assert engine.loaded == ["a", "b", "c"]
+    assert engine.unloaded == ["b"]
+    stats = manager.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 3, 0.4)
+    assert manager.available() == ["a", "b", "c"]
+    with pytest.raises(UnknownAdapter):
+        asyncio.run(manager.acquire("../a"))
+
+
+def test_concurrent_first_requests_load_once(tmp_path):
+    make_adapters(tmp_path, ["a"])
+    engine = FakeEngine(delay=0.05)
+    manager = AdapterManager(tmp_path, engine.load, engine.unload)
+
+    async def main():
+        return await asyncio.gather(*(manager.acquire("a") for _ in range(4)))
+
+    loads = asyncio.run(main())
+    assert engine.loaded == ["a"]
+    assert sum(1 for seconds in loads if seconds > 0) == 1
+    assert manager.running == {"a": 4}
+
+
+def test_same_adapter_joins_running_batch_while_others_wait_for_a_slot(tmp_path):
+    make_adapters(tmp_path, ["a", "b"])
+    engine = FakeEngine()
+    manager = AdapterManager(
+        tmp_path, engine.load, engine.unload, slots=1, hold_seconds=60
+    )
+
+    async def main():
+        await manager.acquire("a")
+        waiting_b = asyncio.create_task(manager.acquire("b"))
+        await asyncio.sleep(0.01)
+        assert not waiting_b.done()
+        # Another request for the running adapter joins its batch.
+        await asyncio.wait_for(manager.acquire("a"), 1)
+        await manager.release("a")
+        await manager.release("a")
+        await asyncio.wait_for(waiting_b, 1)
+        assert manager.running == {"b": 1}
+
+    asyncio.run(main())
+
+
+def test_waiter_past_hold_time_stops_new_requests_jumping_ahead(tmp_path):
+    make_adapters(tmp_path, ["a", "b"])
+    engine = FakeEngine()
+    manager = AdapterManager(
+        tmp_path, engine.load, engine.unload, slots=1, hold_seconds=0.01
+    )
+
+    async def main():
+        await manager.acquire("a")
+        waiting_b = asyncio.create_task(manager.acquire("b"))
+        await asyncio.sleep(0.05)
+        late_a = asyncio.create_task(manager.acquire("a"))
+        await asyncio.sleep(0.01)
+        assert not late_a.done()
+        await manager.release("a")
+        await asyncio.wait_for(waiting_b, 1)
+        await manager.release("b")
+        await asyncio.wait_for(late_a, 1)
+
+    asyncio.run(main())
+
+
+def test_request_for_an_adapter_being_evicted_waits_and_reloads_it(tmp_path):
+    make_adapters(tmp_path, ["a", "b"])
+    in_engine = set()
+    unloading = asyncio.Event()
+
+    async def load(name, path):
+        in_engine.add(name)
+
+    async def unload(name):
+        unloading.set()
+        await asyncio.sleep(0.05)
+        in_engine.discard(name)
+
+    manager = AdapterManager(tmp_path, load, unload, capacity=1, slots=2)
+
+    async def main():
+        await manager.acquire("a")
+        await manager.release("a")
+        loading_b = asyncio.create_task(manager.acquire("b"))
+        await unloading.wait()
+        # "a" is mid-unload: this must not count as a hit on the old registration.
+        await manager.acquire("a")
+        await loading_b
+
+    asyncio.run(main())
+    assert "a" in in_engine and "a" in manager.registered
+    assert manager.stats()["hits"] == 0
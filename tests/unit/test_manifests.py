@@ -0,0 +1,38 @@
+"""Unit tests for reading the on-Volume Ollama model store."""
+
+from ollama_modal.manifests import ModelRef, blob_path, iter_manifests, model_blob_paths
+
+
+def test_parse_model_names():
+    assert ModelRef.parse("llama3.2") == ModelRef(
+        "registry.ollama.ai", "library", "llama3.2", "latest"
+    )
+    assert ModelRef.parse("gemma4:12b").tag == "12b"
+    assert ModelRef.parse("x/flux2-klein").namespace == "x"
+    ref = ModelRef.parse("hf.co/org/repo:q4")
+    assert (ref.host, ref.namespace, ref.repo, ref.tag) == (
+        "hf.co",
+        "org",
+        "repo",
+        "q4",
+    )
+    assert ModelRef.parse("gemma4:12b").short == "gemma4:12b"
+
+
+def test_model_blob_paths(tmp_path, write_model):
+    write_model(tmp_path, "tiny:1b", {"sha256:aa": b"abc", "sha256:bb": b"de"})
+    assert [p.name for p in model_blob_paths(tmp_path, "tiny:1b")] == [
+        "sha256-aa",
+        "sha256-bb",
+    ]
+    assert model_blob_paths(tmp_path, "missing") is None
+    blob_path(tmp_path, "sha256:bb").write_bytes(b"d")
+    assert model_blob_paths(tmp_path, "tiny:1b") is None
+
+
+def test_iter_manifests(tmp_path, write_model):
+    write_model(tmp_path, "tiny:1b", {"sha256:aa": b"abc"})
+    write_model(tmp_path, "hf.co/org/sub/repo:q4", {"sha256:bb": b"de"})
+    refs = [ref for ref, _ in iter_manifests(tmp_path)]
+    assert [ref.short for ref in refs] == ["hf.co/org/sub/repo:q4", "tiny:1b"]
+    assert list(iter_manifests(tmp_path / "missing")) == []
@@ -0,0 +1,115 @@
+"""Unit tests for the per-model inference metrics."""
+
+import asyncio
+import json
+
+from ollama_modal.metrics import (
+    OTHER_MODEL,
+    TAIL_BYTES,
+    InferenceMetrics,
+    final_object,
+    tap,
+    timings,
+)
+
+OLLAMA_DONE = {
+    "model": "m",
+    "done": True,
+    "load_duration": 2_000_000_000,
+    "prompt_eval_count": 100,
+    "prompt_eval_duration": 500_000_000,
+    "eval_count": 50,
+    "eval_duration": 1_000_000_000,
+}
+
+
+def test_ollama_timing_fields_become_observations():
+    obs = timings(OLLAMA_DONE, ttfb=3.0, elapsed=4.0)
+    assert obs == {
+        "ollama_load_seconds": 2.0,
+        "ollama_ttft_seconds": 2.5,
+        "ollama_prefill_tokens_per_second": 200.0,
+        "ollama_decode_tokens_per_second": 50.0,
+    }
+
+
+def test_openai_usage_falls_back_to_router_timing():
+    obs = timings(
+        {"usage": {"prompt_tokens": 10, "completion_tokens": 30}}, ttfb=0.5, elapsed=2.0
+    )
+    assert obs == {
+        "ollama_ttft_seconds": 0.5,
+        "ollama_prefill_tokens_per_second": 20.0,
+        "ollama_decode_tokens_per_second": 20.0,
+    }
+    assert timings({"choices": []}, ttfb=0.5, elapsed=2.0) == {}
+
+
+def test_final_object_from_ndjson_and_sse_tails():
+    ndjson = (
+        b'{"response":"hi","done":false}\n' + json.dumps(OLLAMA_DONE).encode() + b"\n"
+    )
+    assert final_object(ndjson)["eval_count"] == 50
+    sse = b'data: {"choices":[],"usage":{"completion_tokens":3}}\n\ndata: [DONE]\n\n'
+    assert final_object(sse)["usage"]["completion_tokens"] == 3
+    assert final_object(b'{"done": fal') is None
+
+
+def test_watch_passes_chunks_through_and_records_after_the_stream():
+    async def upstream():
+        yield b'{"response":"a","done":false}\n'
+        done = json.dumps(OLLAMA_DONE).encode() + b"\n"
+        # The final object may arrive split across reads.
+        yield done[:20]
+        yield done[20:]
+
+    async def main():
+        metrics = InferenceMetrics()
+        chunks = [c async for c in metrics.watch(upstream(), "m", 0.0)]
+        assert metrics.responses == {}  # recorded on the next loop iteration
+        await asyncio.sleep(0)
+        return chunks, metrics
+
+    chunks, metrics = asyncio.run(main())
+    assert len(chunks) == 3
+    text = metrics.render()
+    assert 'ollama_responses_total{model="m"} 1' in text
+    assert 'ollama_decode_tokens_per_second_bucket{model="m",le="40"} 0' in text
+    assert 'ollama_decode_tokens_per_second_bucket{model="m",le="80"} 1' in text
+    assert 'ollama_load_seconds_count{model="m"} 1' in text
+    assert "# TYPE ollama_ttft_seconds histogram" in text
+
+
+def test_tap_keeps_only_the_last_tail_bytes():
+    done = json.dumps(OLLAMA_DONE).encode() + b"\n"
+
+    async def upstream():
+        yield b"x" * (3 * TAIL_BYTES) + b"\n"
+        for _ in range(100):
+            yield b"y" * 1024 + b"\n"
+        yield done
+
+    async def main():
+        tails = []
+        async for _ in tap(upstream(), 0.0, lambda tail, *_: tails.append(tail)):
+            pass
+        await asyncio.sleep(0)
+        return tails[0]
+
+    tail = asyncio.run(main())
+    # At most TAIL_BYTES past the oldest chunk kept, and the big one is gone.
+    assert len(tail) < TAIL_BYTES + 1025 and b"x" not in tail
+    assert final_object(tail) == OLLAMA_DONE
+
+
+def test_model_labels_are_escaped_and_bounded():
+    metrics = InferenceMetrics(max_models=2)
+    tail = json.dumps(OLLAMA_DONE).encode()
+    for model in ['a"b\\c\nd', "m", "x", "y", "m"]:
+        metrics.record(model, tail, None, 1.0)
+    assert metrics.responses == {'a"b\\c\nd': 1, "m": 2, OTHER_MODEL: 2}
+    text = metrics.render()
+    assert 'ollama_responses_total{model="a\\"b\\\\c\\nd"} 1' in text
+    assert 'ollama_load_seconds_count{model="a\\"b\\\\c\\nd"} 1' in text
+    assert f'ollama_load_seconds_count{{model="{OTHER_MODEL}"}} 2' in text
+    assert len(text.splitlines()) == len(set(text.splitlines()))
@@ -0,0 +1,23 @@
+"""Unit tests for page-cache prefetching."""
+
+from ollama_modal.prefetch import prefetch_files, prefetch_range
+
+
+def test_prefetch_range_reads_only_its_segment(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"x" * 1000)
+    assert prefetch_range(path, 100, 300, chunk_size=64) == 300
+    assert prefetch_range(path, 900, 500, chunk_size=64) == 100
+    assert prefetch_range(path, chunk_size=64) == 1000
+
+
+def test_prefetch_files_splits_segments_and_dedups(tmp_path):
+    big, small, empty = tmp_path / "big", tmp_path / "small", tmp_path / "empty"
+    big.write_bytes(b"a" * 10_000)
+    small.write_bytes(b"b" * 10)
+    empty.write_bytes(b"")
+    result = prefetch_files(
+        [big, small, big, empty], chunk_size=128, max_workers=4, segment_size=3000
+    )
+    assert (result.files, result.bytes_read) == (3, 10_010)
+    assert result.as_dict()["gb_per_second"] >= 0
@@ -0,0 +1,79 @@
+"""Unit tests for seeding the vLLM prefix cache with hot prompts."""
+
+import json
+
+from ollama_modal.prefixcache import (
+    DEFAULT_HOT_PROMPTS,
+    load_hot_prompts,
+    measure,
+    prefix_cache_stats,
+    seed,
+)
+
+METRICS = """
+# HELP vllm:prefix_cache_queries_total Prefix cache queries, in terms of number of queried tokens.
+# TYPE vllm:prefix_cache_queries_total counter
+vllm:prefix_cache_queries_total{engine="0",model_name="qwen3.6-27b"} 400.0
+vllm:prefix_cache_hits_total{engine="0",model_name="qwen3.6-27b"} 300.0
+vllm:num_requests_running{engine="0",model_name="qwen3.6-27b"} 0.0
+"""
+
+
+def test_load_hot_prompts(tmp_path):
+    assert load_hot_prompts(tmp_path / "missing.json") == DEFAULT_HOT_PROMPTS
+    path = tmp_path / "hot.json"
+    path.write_text(
+        json.dumps(
+            [
+                "Be terse.",
+                {"system": "You are an agent.", "tools": [{"type": "function"}]},
+            ]
+        )
+    )
+    assert load_hot_prompts(path) == [
+        {"system": "Be terse."},
+        {"system": "You are an agent.", "tools": [{"type": "function"}]},
+    ]
+
+
+def test_seed_measures_hit_against_an_uncacheable_miss():
+    cached = set()
+    sent = []
+
+    def send(payload):
+        sent.append(payload)
+        system = payload["messages"][0]["content"]
+        hit = system in cached
+        cached.add(system)
+        return 0.05 if hit else 0.4
+
+    report = seed(
+        send, "qwen", [{"system": "You are an agent.", "tools": [{"type": "function"}]}]
+    )
+    assert [p["max_tokens"] for p in sent] == [1, 1, 1]
+    assert sent[0]["tools"] == [{"type": "function"}]
+    assert report[0]["seed_seconds"] == 0.4
+    assert report[0]["hit_ttft_seconds"] == 0.05
+    assert report[0]["ttft_saved_seconds"] == 0.35
+
+
+def test_measure_without_seeding_shows_a_dropped_cache():
+    sent = []
+
+    def send(payload):
+        sent.append(payload)
+        return 0.4
+
+    report = measure(send, "qwen", [{"system": "You are an agent."}])
+    assert len(sent) == 2 and "seed_seconds" not in report[0]
+    assert report[0]["ttft_saved_seconds"] == 0.0
+
+
+def test_prefix_cache_stats():
+    assert prefix_cache_stats(METRICS) == {
+        "queried_tokens": 400.0,
+        "hit_tokens": 300.0,
+        "hit_rate": 0.75,
+    }
+    assert prefix_cache_stats("vllm:gpu_prefix_cache_hit_rate 0.5\n")["hit_rate"] == 0.5
+    assert prefix_cache_stats("")["hit_rate"] is None
@@ -0,0 +1,156 @@
+"""Unit tests for the proxy apps, with the upstream faked by ``httpx.MockTransport``."""
+
+import asyncio
+import json
+
+import httpx
+
+from ollama_modal.admission import AdmissionController
+from ollama_modal.coalesce import Coalescer
+from ollama_modal.gateway import Gateway, OllamaBackend, VllmBackend
+from ollama_modal.lifecycle import ASLEEP, EngineLifecycle
+from ollama_modal.proxy import (
+    UpstreamProxy,
+    create_engine_app,
+    create_gateway_app,
+    create_router_app,
+)
+
+
+class Body(httpx.AsyncByteStream):
+    """An unread body, so the proxy can stream it like a real upstream's."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+
+
+class FakeUpstream:
+    """Records every request and answers ``{"ok": true}``."""
+
+    def __init__(self):
+        self.paths = []
+        self.urls = []
+
+    def handler(self, request):
+        self.paths.append(request.url.path)
+        self.urls.append(f"{request.url.host}{request.url.path}")
+        return httpx.Response(200, stream=Body(json.dumps({"ok": True}).encode()))
+
+    def proxy(self):
+        transport = httpx.MockTransport(self.handler)
+        return UpstreamProxy(httpx.AsyncClient(transport=transport))
+
+
+def call(app, method, path, **kwargs):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.request(method, path, **kwargs)
+
+    return asyncio.run(main())
+
+
+def test_engine_app_hides_dev_mode_endpoints():
+    upstream = FakeUpstream()
+    lifecycle = EngineLifecycle(lambda level: None, lambda: None)
+    app = create_engine_app("http://engine", lifecycle, proxy=upstream.proxy())
+    for method, path in [
+        ("POST", "/sleep?level=1"),
+        ("POST", "/wake_up"),
+        ("POST", "/collective_rpc"),
+        ("POST", "/v1/../reset_prefix_cache"),
+        ("GET", "/is_sleeping"),
+    ]:
+        assert call(app, method, path).status_code == 404, path
+    assert upstream.paths == []
+    assert lifecycle.state != ASLEEP and lifecycle.in_flight == 0
+
+    response = call(app, "POST", "/v1/chat/completions", json={"model": "m"})
+    assert response.status_code == 200
+    assert upstream.paths == ["/v1/chat/completions"]
+
+
+def test_engine_app_hides_runtime_lora_endpoints():
+    upstream = FakeUpstream()
+    app = create_engine_app("http://engine", proxy=upstream.proxy())
+    for path in ["/v1/load_lora_adapter", "/v1//unload_lora_adapter/"]:
+        response = call(app, "POST", path, json={"lora_name": "a", "lora_path": "/x"})
+        assert response.status_code == 404, path
+    assert upstream.paths == []
+
+
+def test_gateway_sends_each_path_to_a_backend_that_speaks_it():
+    upstream = FakeUpstream()
+    vllm = VllmBackend("vllm", "http://v", {"qwen": "qwen-awq"})
+    ollama = OllamaBackend("ollama", "http://o", {"qwen": "qwen3.6:27b"})
+    app = create_gateway_app(Gateway([vllm, ollama]), proxy=upstream.proxy())
+
+    assert call(app, "GET", "/api/tags").status_code == 200
+    assert call(app, "GET", "/v1/../api/version").status_code == 200
+    response = call(app, "POST", "/api/embed", json={"model": "qwen", "input": "x"})
+    assert response.status_code == 200
+    assert call(app, "GET", "/v1/whatever").status_code == 200
+    assert upstream.urls == [
+        "o/api/tags",
+        "o/api/version",
+        "o/api/embed",
+        "v/v1/whatever",
+    ]
+
+    vllm_only = create_gateway_app(Gateway([vllm]), proxy=upstream.proxy())
+    assert call(vllm_only, "GET", "/api/tags").status_code == 404
+    response = call(vllm_only, "POST", "/api/embed", json={"model": "qwen"})
+    assert response.status_code == 404
+    assert len(upstream.urls) == 4
+
+
+def test_coalesced_flight_takes_one_admission_slot_from_its_leader():
+    upstream = FakeUpstream()
+    opened = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def handler(request):
+        upstream.paths.append(request.url.path)
+        opened.set()
+        await finish.wait()
+        return httpx.Response(200, stream=Body(b'{"done":true}\n'))
+
+    proxy = UpstreamProxy(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    admission = AdmissionController(limit=1, max_queue=0, max_wait=1)
+    coalescer = Coalescer()
+    app = create_router_app(
+        lambda model, num_ctx: ("pool", "http://o"),
+        dict,
+        proxy=proxy,
+        coalescer=coalescer,
+        admission=admission,
+    )
+    payload = {"model": "m", "prompt": "hi", "options": {"temperature": 0}}
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            leader = asyncio.create_task(c.post("/api/generate", json=payload))
+            await opened.wait()
+            follower = asyncio.create_task(c.post("/api/generate", json=payload))
+            while coalescer.coalesced == 0:
+                await asyncio.sleep(0)
+            finish.set()
+            first, second = await asyncio.gather(leader, follower)
+            drained = admission.stats()
+
+            # Once the flight is over, the next identical request is a leader
+            # and needs a slot of its own.
+            await admission.acquire("m")
+            third = await c.post("/api/generate", json=payload)
+            return first, second, drained, third
+
+    first, second, drained, third = asyncio.run(main())
+    assert first.headers["x-coalesced"] == "0" and "x-queue-wait-ms" in first.headers
+    assert second.headers["x-coalesced"] == "1" and second.status_code == 200
+    assert drained == {} and upstream.paths == ["/api/generate"]
+    assert third.status_code == 429 and "Retry-After" in third.headers
+    assert admission.stats()["m"]["in_flight"] == 1
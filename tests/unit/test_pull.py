@@ -0,0 +1,114 @@
+"""Unit tests for the chunked registry pull engine against a local stand-in registry."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from ollama_modal.manifests import blob_path
+from ollama_modal.pull import BlobLocks, RegistryPuller, collect_garbage
+from ollama_modal.verify import verify_model
+
+
+@pytest.fixture
+def registry(fake_registry):
+    fake_registry.add_model("tiny:1b", [b"{}", os.urandom(10_000), b"template"])
+    return fake_registry
+
+
+def test_pull_writes_verifiable_model(tmp_path, registry):
+    events = []
+    with registry.serve() as url:
+        result = RegistryPuller(
+            tmp_path, url, chunk_size=1024, progress=events.append
+        ).pull("tiny:1b")
+    assert len(result.downloaded) == 3
+    assert verify_model(tmp_path, "tiny:1b").ok
+    assert events[-1].completed == events[-1].total or events[-1].total < 1024
+    assert any(rng == "bytes=1024-2047" for _, rng in registry.blob_requests)
+
+
+def test_interrupted_pull_resumes_from_partial(tmp_path, registry):
+    with registry.serve() as url:
+        registry.fail_after = 4
+        with pytest.raises(Exception):
+            RegistryPuller(tmp_path, url, chunk_size=1024, max_connections=1).pull(
+                "tiny:1b"
+            )
+        assert not verify_model(tmp_path, "tiny:1b").manifest_found
+
+        registry.fail_after = None
+        registry.blob_requests.clear()
+        result = RegistryPuller(tmp_path, url, chunk_size=1024, max_connections=1).pull(
+            "tiny:1b"
+        )
+    assert verify_model(tmp_path, "tiny:1b").ok
+    # Config blob + first 3 weight chunks landed before the failure; only the
+    # remaining 7 weight chunks and the template blob are fetched on resume.
+    assert len(registry.blob_requests) == 7 + 1
+    assert result.bytes_downloaded < 10_000 + len(b"template") + 2
+
+
+def test_pull_only_refetches_requested_blobs(tmp_path, registry):
+    with registry.serve() as url:
+        RegistryPuller(tmp_path, url, chunk_size=1024).pull("tiny:1b")
+        report = verify_model(tmp_path, "tiny:1b")
+        weights = report.layers[1]
+        blob_path(tmp_path, weights.digest).unlink()
+        registry.blob_requests.clear()
+        result = RegistryPuller(tmp_path, url, chunk_size=1024).pull(
+            "tiny:1b", only={weights.digest}
+        )
+    assert result.downloaded == [weights.digest]
+    assert verify_model(tmp_path, "tiny:1b").ok
+
+
+def test_pull_many_fetches_shared_blobs_once(tmp_path, registry):
+    shared = os.urandom(5_000)
+    registry.add_model("tiny:2b", [b"{}", shared, b"template"])
+    registry.add_model("tiny:3b", [b'{"x": 1}', shared, b"template"])
+    with registry.serve() as url:
+        puller = RegistryPuller(tmp_path, url, chunk_size=1024)
+        puller.pull("tiny:1b")
+        plan = puller.plan(["tiny:2b", "tiny:3b", "tiny:2b"])
+        result = puller.pull_many(plan)
+    assert sorted(plan.manifests) == ["tiny:2b", "tiny:3b"]
+    # "{}" and "template" are already on disk from tiny:1b.
+    assert len(plan.present) == 2 and len(plan.missing) == 2
+    assert len(result.downloaded) == 2 and result.shared == 2
+    requested = {digest for digest, _ in registry.blob_requests}
+    assert len(requested) == 3 + 2
+    assert verify_model(tmp_path, "tiny:2b").ok and verify_model(tmp_path, "tiny:3b").ok
+
+
+def test_concurrent_pulls_of_one_blob_download_it_once(tmp_path, registry):
+    with registry.serve() as url:
+        locks = BlobLocks()
+        pullers = [
+            RegistryPuller(tmp_path, url, chunk_size=1024, locks=locks)
+            for _ in range(2)
+        ]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda p: p.pull_many(["tiny:1b"]), pullers))
+    assert sum(len(r.downloaded) for r in results) == 3
+    assert len(registry.blob_requests) == 1 + 10 + 1
+    assert verify_model(tmp_path, "tiny:1b").ok
+
+
+def test_collect_garbage_removes_unreferenced_blobs(tmp_path, registry):
+    with registry.serve() as url:
+        RegistryPuller(tmp_path, url, chunk_size=1024).pull("tiny:1b")
+    orphan = blob_path(tmp_path, "sha256:" + "0" * 64)
+    orphan.write_bytes(b"old")
+    fresh = blob_path(tmp_path, "sha256:" + "1" * 64)
+    fresh.write_bytes(b"in progress")
+    os.utime(orphan, (0, 0))
+
+    report = collect_garbage(tmp_path, dry_run=True)
+    assert report.removed == [orphan.name] and orphan.exists()
+    report = collect_garbage(tmp_path)
+    assert report.removed == [orphan.name] and report.bytes_freed == 3
+    assert not orphan.exists() and fresh.exists()
+    assert verify_model(tmp_path, "tiny:1b").ok
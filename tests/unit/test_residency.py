@@ -0,0 +1,102 @@
+"""Unit tests for the VRAM residency manager."""
+
+import asyncio
+
+import pytest
+
+from ollama_modal.residency import ResidencyManager, model_key
+
+GB = 10**9
+
+
+class FakeOllama:
+    """Loaded models and the load/unload calls made against them."""
+
+    def __init__(self, loaded=None):
+        self.loaded = dict(loaded or {})
+        self.calls = []
+
+    async def ps(self):
+        return dict(self.loaded)
+
+    async def load(self, model):
+        self.calls.append(("load", model))
+        self.loaded[model] = SIZES[model]
+
+    async def unload(self, model):
+        self.calls.append(("unload", model))
+        self.loaded.pop(model, None)
+
+
+SIZES = {"a:latest": 8 * GB, "b:latest": 8 * GB, "c:latest": 8 * GB, "d:latest": 8 * GB}
+
+
+def manager(control, **kwargs):
+    return ResidencyManager(
+        20 * GB, SIZES.get, control, refresh_interval=0, preload_top=0, **kwargs
+    )
+
+
+def test_model_key_matches_ps_names():
+    assert model_key("llama3.2") == "llama3.2:latest"
+    assert model_key("hf.co/org/repo:q4") == "hf.co/org/repo:q4"
+
+
+def test_miss_evicts_least_recently_used_unpinned_model():
+    async def main():
+        ollama = FakeOllama()
+        residency = manager(ollama, pinned=["a"], hot_share=1.1)
+        for model in ("a", "b", "a"):
+            hit = await residency.before_request(model)
+            if not hit:
+                await ollama.load(model_key(model))
+            residency.after_request(model, hit, ttfb=2.0 if not hit else 0.1)
+        ollama.calls.clear()
+        assert not await residency.before_request("c")
+        return ollama, residency.stats()
+
+    ollama, stats = asyncio.run(main())
+    # a is pinned (and most recent), so b goes.
+    assert ollama.calls == [("unload", "b:latest")]
+    a = stats["models"]["a:latest"]
+    assert (a["hits"], a["misses"], a["loads"], a["load_seconds"]) == (1, 1, 1, 2.0)
+    assert stats["models"]["b:latest"]["evictions"] == 1
+
+
+def test_lfu_keeps_frequently_used_and_busy_models():
+    async def main():
+        ollama = FakeOllama({"a:latest": 8 * GB, "b:latest": 8 * GB})
+        residency = manager(ollama, policy="lfu", hot_share=1.1)
+        for _ in range(3):
+            assert await residency.before_request("a")
+            residency.after_request("a", True, 0.1)
+        assert await residency.before_request("b")  # stays in flight
+        assert not await residency.before_request("c")
+        return ollama
+
+    ollama = asyncio.run(main())
+    # b is the least used but busy; a is evicted rather than interrupting it.
+    assert ollama.calls == [("unload", "a:latest")]
+
+
+def test_preloads_frequent_models_that_fit():
+    async def main():
+        ollama = FakeOllama()
+        residency = ResidencyManager(
+            20 * GB, SIZES.get, ollama, refresh_interval=0, preload_top=2
+        )
+        await residency.before_request("a")
+        residency.after_request("a", False, 1.0)
+        await residency.before_request("b")
+        await ollama.load("b:latest")  # the request loads it
+        ollama.loaded.pop("a:latest", None)  # Ollama dropped it behind our back
+        return await residency.preload_predicted(), residency.stats()
+
+    loaded, stats = asyncio.run(main())
+    assert loaded == ["a:latest"]
+    assert stats["models"]["a:latest"]["preloads"] == 1
+
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        ResidencyManager(GB, SIZES.get, FakeOllama(), policy="random")
@@ -0,0 +1,65 @@
+"""Unit tests for GGUF-based footprint estimation and GPU pool selection."""
+
+import struct
+
+from ollama_modal.gguf import kv_bytes_per_token, read_metadata
+from ollama_modal.manifests import blob_path
+from ollama_modal.routing import GiB, POOLS, Footprint, RoutingTable, choose_pool
+
+
+def gguf_bytes(metadata: dict) -> bytes:
+    """A GGUF v3 header with uint32/string/array-of-int32 values and no tensors."""
+
+    def string(s):
+        raw = s.encode()
+        return struct.pack("<Q", len(raw)) + raw
+
+    out = b"GGUF" + struct.pack("<IQQ", 3, 0, len(metadata))
+    for key, value in metadata.items():
+        out += string(key)
+        if isinstance(value, str):
+            out += struct.pack("<I", 8) + string(value)
+        elif isinstance(value, list):
+            out += struct.pack("<IIQ", 9, 5, len(value)) + struct.pack(
+                f"<{len(value)}i", *value
+            )
+        else:
+            out += struct.pack("<II", 4, value)
+    return out
+
+
+LLAMA = {
+    "general.architecture": "llama",
+    "llama.block_count": 32,
+    "llama.embedding_length": 4096,
+    "llama.attention.head_count": 32,
+    "llama.attention.head_count_kv": 8,
+    "tokenizer.ggml.token_type": [1] * 2000,
+}
+
+
+def test_kv_bytes_per_token_from_header(tmp_path):
+    path = tmp_path / "model.gguf"
+    path.write_bytes(gguf_bytes(LLAMA))
+    metadata = read_metadata(path)
+    assert metadata["llama.block_count"] == 32
+    assert metadata["tokenizer.ggml.token_type"] is None
+    # 32 layers * 8 kv heads * (128 + 128) dims * 2 bytes
+    assert kv_bytes_per_token(metadata) == 32 * 8 * 256 * 2
+
+
+def test_choose_pool_prefers_cheapest_fit():
+    assert choose_pool(Footprint(8 * GiB, 1 * GiB)).gpu == "A10G"
+    assert choose_pool(Footprint(20 * GiB, 4 * GiB)).gpu == "H100"
+    assert choose_pool(Footprint(200 * GiB, 0)).gpu == "H100"
+
+
+def test_routing_table_uses_manifest_sizes(tmp_path, write_model):
+    write_model(tmp_path, "small:8b", {"sha256:01": gguf_bytes(LLAMA)})
+    table = RoutingTable(tmp_path, POOLS)
+    assert table.route("small:8b").gpu == "A10G"
+    # 128k context: 128 KiB/token * 131072 tokens = 16 GiB of KV on top of the weights.
+    assert table.route("small:8b", num_ctx=131072).gpu == "A10G"
+    assert table.route("small:8b", num_ctx=200_000).gpu == "H100"
+    assert table.route("not-pulled").gpu == "A10G"
+    assert table.as_dict() == {"small:8b": "a10g"}
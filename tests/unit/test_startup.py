@@ -0,0 +1,20 @@
+"""Unit tests for the cold-start timeline."""
+
+import pytest
+
+from ollama_modal.startup import StartupTimeline
+
+
+def test_phases_are_recorded_in_start_order():
+    timeline = StartupTimeline()
+    with timeline.phase("b") as detail:
+        detail["present"] = True
+    assert timeline.timed("a", lambda x: x + 1, 1) == 2
+    with pytest.raises(ValueError):
+        with timeline.phase("fails"):
+            raise ValueError
+    report = timeline.as_dict()
+    assert [p["name"] for p in report["phases"]] == ["b", "a", "fails"]
+    assert report["phases"][0]["detail"] == {"present": True}
+    assert report["phases"][2]["ok"] is False
+    assert report["total_seconds"] >= 0
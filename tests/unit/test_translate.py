@@ -0,0 +1,200 @@
+"""Unit tests for the NDJSON <-> OpenAI SSE translation."""
+
+import asyncio
+import json
+
+from ollama_modal.translate import (
+    LineSplitter,
+    ndjson_to_sse,
+    ollama_to_openai_request,
+    openai_to_ollama_request,
+    serves,
+    sse_to_ndjson,
+)
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def collect(agen):
+    async def main():
+        return [chunk async for chunk in agen]
+
+    return asyncio.run(main())
+
+
+def sse_events(raw):
+    return [json.loads(c[6:]) for c in raw if c != b"data: [DONE]\n\n"]
+
+
+def test_line_splitter_holds_back_partial_lines():
+    splitter = LineSplitter()
+    assert splitter.feed(b'{"a":1}\n{"b"') == [b'{"a":1}']
+    assert splitter.feed(b":2}\n") == [b'{"b":2}']
+    assert splitter.feed(b'{"c":3}') == []
+    assert splitter.flush() == [b'{"c":3}']
+
+
+def test_ndjson_to_sse_streams_reasoning_and_adds_usage():
+    lines = [
+        {
+            "message": {"role": "assistant", "content": "", "thinking": "hmm"},
+            "done": False,
+        },
+        {"message": {"role": "assistant", "content": "Paris"}, "done": False},
+        {
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": 12,
+            "eval_count": 3,
+        },
+    ]
+    raw = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+    # Split mid-line to check nothing is emitted for incomplete input.
+    out = collect(ndjson_to_sse(chunks(raw[:30], raw[30:90], raw[90:]), "m"))
+    assert out[-1] == b"data: [DONE]\n\n"
+    events = sse_events(out)
+    deltas = [e["choices"][0]["delta"] for e in events]
+    assert deltas[0] == {"role": "assistant", "reasoning_content": "hmm"}
+    assert deltas[1] == {"content": "Paris"}
+    assert events[-1]["choices"][0]["finish_reason"] == "stop"
+    assert events[-1]["usage"] == {
+        "prompt_tokens": 12,
+        "completion_tokens": 3,
+        "total_tokens": 15,
+    }
+    assert all("usage" not in e for e in events[:-1])
+
+
+def test_sse_to_ndjson_ends_with_counts():
+    events = [
+        {"choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]},
+        {"choices": [{"index": 0, "delta": {"reasoning": "think"}}]},
+        {
+            "choices": [
+                {"index": 0, "delta": {"content": "hi"}, "finish_reason": "length"}
+            ]
+        },
+        {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2}},
+    ]
+    raw = (
+        b"".join(b"data: " + json.dumps(e).encode() + b"\n\n" for e in events)
+        + b"data: [DONE]\n\n"
+    )
+    out = [
+        json.loads(line)
+        for line in collect(sse_to_ndjson(chunks(raw[:50], raw[50:]), "m"))
+    ]
+    assert [o["message"] for o in out[:-1]] == [
+        {"role": "assistant", "content": "", "thinking": "think"},
+        {"role": "assistant", "content": "hi"},
+    ]
+    final = out[-1]
+    assert final["done"] and final["done_reason"] == "length"
+    assert (final["prompt_eval_count"], final["eval_count"]) == (5, 2)
+    assert final["total_duration"] >= final["eval_duration"] >= 0
+
+
+def test_sse_to_ndjson_collects_streamed_tool_calls():
+    call = {
+        "index": 0,
+        "id": "call_1",
+        "type": "function",
+        "function": {"name": "get_weather", "arguments": ""},
+    }
+    events = [
+        {
+            "choices": [
+                {"index": 0, "delta": {"role": "assistant", "tool_calls": [call]}}
+            ]
+        },
+        {
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {
+                        "tool_calls": [
+                            {"index": 0, "function": {"arguments": '{"city": '}}
+                        ]
+                    },
+                }
+            ]
+        },
+        {
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {
+                        "tool_calls": [
+                            {"index": 0, "function": {"arguments": '"Paris"}'}}
+                        ]
+                    },
+                }
+            ]
+        },
+        {"choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls"}]},
+    ]
+    raw = (
+        b"".join(b"data: " + json.dumps(e).encode() + b"\n\n" for e in events)
+        + b"data: [DONE]\n\n"
+    )
+    final = [json.loads(line) for line in collect(sse_to_ndjson(chunks(raw), "m"))][-1]
+    assert final["message"]["tool_calls"] == [
+        {"function": {"name": "get_weather", "arguments": {"city": "Paris"}}}
+    ]
+    assert final["done_reason"] == "stop"
+
+
+def test_generate_streams_translate_text():
+    raw = json.dumps({"response": "a", "done": False}).encode() + b"\n"
+    raw += json.dumps({"response": "", "done": True, "eval_count": 1}).encode() + b"\n"
+    events = sse_events(collect(ndjson_to_sse(chunks(raw), "m", chat=False)))
+    assert [e["choices"][0]["text"] for e in events] == ["a", ""]
+    assert events[0]["object"] == "text_completion"
+
+
+def test_request_translation_round_trips_the_essentials():
+    openai = {
+        "model": "m",
+        "stream": True,
+        "max_tokens": 64,
+        "temperature": 0,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "what is"},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": "data:image/png;base64,AAA"},
+                    },
+                ],
+            },
+        ],
+        "chat_template_kwargs": {"enable_thinking": False},
+    }
+    ollama = openai_to_ollama_request("v1/chat/completions", openai)
+    assert ollama["options"] == {"temperature": 0, "num_predict": 64}
+    assert ollama["messages"] == [
+        {"role": "user", "content": "what is", "images": ["AAA"]}
+    ]
+    assert ollama["think"] is False
+
+    assert openai_to_ollama_request("v1/chat/completions", {**openai, "stop": "END"})[
+        "options"
+    ]["stop"] == ["END"]
+
+    back = ollama_to_openai_request("api/chat", ollama)
+    assert back["stream_options"] == {"include_usage": True}
+    assert (back["max_tokens"], back["temperature"]) == (64, 0)
+    assert back["messages"][0]["content"][1]["image_url"]["url"].endswith("AAA")
+    assert back["chat_template_kwargs"] == {"enable_thinking": False}
+
+
+def test_serves_by_protocol():
+    assert serves("ollama", "api/embed") and serves("ollama", "/v1/embeddings")
+    assert serves("openai", "/api/chat") and serves("openai", "v1/embeddings")
+    assert not serves("openai", "api/embed") and not serves("openai", "/api/tags")
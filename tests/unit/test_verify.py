@@ -0,0 +1,44 @@
+"""Unit tests for the in-process blob verifier."""
+
+import hashlib
+import os
+
+from ollama_modal.manifests import blob_path
+from ollama_modal.verify import VerificationCache, verify_model
+
+
+def digest(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def test_reports_missing_and_corrupt_blobs(tmp_path, write_model):
+    good, bad, gone = b"weights", b"template", b"params"
+    write_model(
+        tmp_path, "tiny:1b", {digest(good): good, digest(bad): bad, digest(gone): gone}
+    )
+    blob_path(tmp_path, digest(bad)).write_bytes(b"TEMPLATE")
+    blob_path(tmp_path, digest(gone)).unlink()
+
+    report = verify_model(tmp_path, "tiny:1b")
+    assert not report.ok
+    assert [layer.digest for layer in report.corrupt] == [digest(bad)]
+    assert [layer.digest for layer in report.missing] == [digest(gone)]
+    assert verify_model(tmp_path, "absent").manifest_found is False
+
+
+def test_cache_skips_rehash_until_blob_changes(tmp_path, write_model):
+    data = b"x" * 1000
+    write_model(tmp_path, "tiny:1b", {digest(data): data})
+    cache = VerificationCache.for_root(tmp_path)
+    assert len(verify_model(tmp_path, "tiny:1b", cache).hashed) == 1
+    cache.save()
+
+    cache = VerificationCache.for_root(tmp_path)
+    report = verify_model(tmp_path, "tiny:1b", cache)
+    assert report.ok and len(report.cached) == 1 and not report.hashed
+
+    path = blob_path(tmp_path, digest(data))
+    path.write_bytes(b"y" * 1000)
+    os.utime(path, ns=(1, 1))
+    report = verify_model(tmp_path, "tiny:1b", cache)
+    assert len(report.corrupt) == 1
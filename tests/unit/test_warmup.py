@@ -0,0 +1,49 @@
+"""Unit tests for the shape-sweeping warmup."""
+
+import threading
+
+from ollama_modal.warmup import Shape, default_shapes, shapes_from_traffic, sweep
+
+
+def test_default_shapes_cover_batch_sizes_and_prefill_budget():
+    shapes = default_shapes(max_num_seqs=8, max_num_batched_tokens=8192)
+    assert {s.concurrency for s in shapes} == {1, 2, 4, 8}
+    assert max(s.prompt_tokens for s in shapes) == 8192
+    assert Shape(8, 1024) in shapes
+    assert len(shapes) == len(set(shapes))
+
+
+def test_shapes_from_traffic_buckets_and_ranks():
+    records = (
+        [{"prompt_tokens": 300, "concurrency": 3}] * 5
+        + [{"prompt_tokens": 20000}] * 2
+        + [{"prompt_tokens": 0}]
+    )
+    assert shapes_from_traffic(
+        records, max_num_seqs=8, max_num_batched_tokens=8192
+    ) == [
+        Shape(4, 512),
+        Shape(1, 8192),
+    ]
+
+
+def test_sweep_runs_each_shape_concurrently_and_reports_the_drop():
+    active = {"now": 0, "max": 0, "calls": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(4)
+
+    def send(prompt, max_tokens):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            active["calls"] += 1
+            first = active["calls"] <= 4
+        barrier.wait(timeout=5)
+        with lock:
+            active["now"] -= 1
+        return 2.0 if first else 0.5
+
+    report = sweep(send, [Shape(4, 64)])
+    assert active["max"] == 4 and active["calls"] == 8
+    assert report["c4xp64"]["first_seconds"] == 2.0
+    assert report["c4xp64"]["dropped_seconds"] == 1.5
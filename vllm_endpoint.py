@@ -1,32 +1,80 @@
 """vLLM serving endpoint for Qwen3.6-27B (AWQ-INT4) on Modal.
 
 Uses vLLM sleep mode + Modal GPU snapshots for fast cold starts: the model is
-loaded and snapshotted once; subsequent containers restore from snapshot and
-just wake the model back onto the GPU. This is the key advantage over the
-Ollama deployment (whose subprocess GPU state doesn't survive snapshot/restore).
+loaded, put to sleep and snapshotted once; subsequent containers restore from
+snapshot and just wake the model back onto the GPU. This is the key advantage
+over the Ollama deployment (whose subprocess GPU state doesn't survive
+snapshot/restore).
 """
 
 import json
+import os
 import socket
 import subprocess
+import threading
+import time
 from typing import Any
 
-import aiohttp
 import modal
 
+from ollama_modal.autotune import cli_args, load_profile
+from ollama_modal.lifecycle import EngineLifecycle
+from ollama_modal.lora import AdapterManager
+from ollama_modal.prefixcache import (
+    load_hot_prompts,
+    prefix_cache_stats,
+    measure,
+    seed,
+    seed_payload,
+)
+from ollama_modal.startup import StartupTimeline
+from ollama_modal.warmup import default_shapes, load_traffic, shapes_from_traffic, sweep
+
 MINUTES = 60
 VLLM_PORT = 8000
+SCALEDOWN_WINDOW = 2 * MINUTES
+# Sleep level before the snapshot and on idle: 1 offloads the weights to CPU
+# memory (captured in the snapshot), 2 discards them and reloads from disk on wake.
+SLEEP_LEVEL = int(os.environ.get("VLLM_SLEEP_LEVEL", "1"))
+# Sleep before the snapshot, so it holds a quiet engine without its KV pool.
+# Sleeping discards the seeded hot prompts (HOT_PROMPTS); they are re-seeded
+# on wake. VLLM_SNAPSHOT_SLEEP=0 snapshots an awake engine that keeps them.
+SNAPSHOT_SLEEP = os.environ.get("VLLM_SNAPSHOT_SLEEP", "1") == "1"
+# Put an idle container to sleep after this fraction of SCALEDOWN_WINDOW without
+# requests (0 = never), e.g.
+# `VLLM_IDLE_SLEEP_FRACTION=0.5 modal deploy vllm_endpoint.py`.
+IDLE_SLEEP_FRACTION = float(os.environ.get("VLLM_IDLE_SLEEP_FRACTION", "0"))
+# Serve LoRA adapters from the vllm-lora-adapters Volume by name in the `model`
+# field, e.g. `VLLM_LORA=1 modal deploy vllm_endpoint.py`. MAX_LORAS adapters
+# share a batch; MAX_CPU_LORAS stay registered with the engine.
+LORA = os.environ.get("VLLM_LORA", "0") == "1"
+MAX_LORAS = int(os.environ.get("VLLM_MAX_LORAS", "4"))
+MAX_CPU_LORAS = int(os.environ.get("VLLM_MAX_CPU_LORAS", "16"))
+MAX_LORA_RANK = int(os.environ.get("VLLM_MAX_LORA_RANK", "64"))
+LORA_DIR = "/adapters"
+# vLLM listens on localhost only; the in-container proxy on VLLM_PORT is the
+# public face, so dev-mode endpoints like /sleep stay private.
+ENGINE_HOST = "127.0.0.1"
+ENGINE_PORT = VLLM_PORT + 1
 
 MODEL_NAME = "cyankiwi/Qwen3.6-27B-AWQ-INT4"
 SERVED_NAME = "qwen3.6-27b"
 N_GPU = 1
+MAX_NUM_SEQS = 8
+MAX_NUM_BATCHED_TOKENS = 8192
+MAX_MODEL_LEN = 32768
+VLLM_CACHE_DIR = "/root/.cache/vllm"
+# Recorded requests ({"prompt_tokens", "concurrency"} per line) on the vllm-cache
+# Volume; when present, the pre-snapshot warmup sweeps their shapes.
+WARMUP_TRAFFIC = f"{VLLM_CACHE_DIR}/warmup-traffic.jsonl"
+# JSON list of system prompts (strings or {"system": ..., "tools": [...]}) whose
+# KV blocks are prefilled before the snapshot; DEFAULT_HOT_PROMPTS if absent.
+HOT_PROMPTS = f"{VLLM_CACHE_DIR}/hot-prompts.json"
 
 app = modal.App("qwen36-vllm-service")
 
 vllm_image = (
-    modal.Image.from_registry(
-        "nvidia/cuda:12.9.0-devel-ubuntu22.04", add_python="3.12"
-    )
+    modal.Image.from_registry("nvidia/cuda:12.9.0-devel-ubuntu22.04", add_python="3.12")
     .entrypoint([])
     .uv_pip_install("vllm", "hf_transfer")
     .env(
@@ -35,57 +83,250 @@ vllm_image = (
             "HF_HUB_ENABLE_HF_TRANSFER": "1",
             "TORCHINDUCTOR_COMPILE_THREADS": "1",
             "TORCHINDUCTOR_CACHE_DIR": "/tmp/torchinductor",
+            # Exposes /sleep, /wake_up and /collective_rpc on the engine, which
+            # only listens on localhost; the proxy refuses these paths.
+            "VLLM_SERVER_DEV_MODE": "1",
+            "VLLM_SLEEP_LEVEL": str(SLEEP_LEVEL),
+            "VLLM_SNAPSHOT_SLEEP": "1" if SNAPSHOT_SLEEP else "0",
+            "VLLM_IDLE_SLEEP_FRACTION": str(IDLE_SLEEP_FRACTION),
+            "VLLM_LORA": "1" if LORA else "0",
+            "VLLM_MAX_LORAS": str(MAX_LORAS),
+            "VLLM_MAX_CPU_LORAS": str(MAX_CPU_LORAS),
+            "VLLM_MAX_LORA_RANK": str(MAX_LORA_RANK),
+            # Exposes /v1/load_lora_adapter and /v1/unload_lora_adapter on the
+            # engine's localhost port; the proxy refuses them.
+            "VLLM_ALLOW_RUNTIME_LORA_UPDATING": "True" if LORA else "False",
         }
     )
+    .add_local_python_source("ollama_modal")
 )
 
 hf_cache_vol = modal.Volume.from_name("huggingface-cache", create_if_missing=True)
 vllm_cache_vol = modal.Volume.from_name("vllm-cache", create_if_missing=True)
+lora_vol = modal.Volume.from_name("vllm-lora-adapters", create_if_missing=True)
 
 with vllm_image.imports():
     import requests
 
 
+ENGINE_URL = f"http://{ENGINE_HOST}:{ENGINE_PORT}"
+# Written by scripts/autotune_vllm.py; overrides SERVING_DEFAULTS when present.
+SERVING_PROFILE = f"{VLLM_CACHE_DIR}/serving-profile.json"
+SERVING_DEFAULTS = {
+    "max_num_seqs": MAX_NUM_SEQS,
+    "max_model_len": MAX_MODEL_LEN,
+    "max_num_batched_tokens": MAX_NUM_BATCHED_TOKENS,
+    "gpu_memory_utilization": 0.90,
+}
+
+
+def serving_params() -> dict[str, Any]:
+    """``SERVING_DEFAULTS`` overlaid with the tuned profile on the vllm-cache Volume."""
+    return {**SERVING_DEFAULTS, **load_profile(SERVING_PROFILE)}
+
+
+def lora_args() -> list[str]:
+    if not LORA:
+        return []
+    return [
+        "--enable-lora",
+        "--max-loras",
+        str(MAX_LORAS),
+        "--max-cpu-loras",
+        str(MAX_CPU_LORAS),
+        "--max-lora-rank",
+        str(MAX_LORA_RANK),
+    ]
+
+
+def serve_command(params: dict[str, Any], port: int = ENGINE_PORT) -> list[str]:
+    """The ``vllm serve`` command line; ``params`` are the tunable flags."""
+    return [
+        "vllm",
+        "serve",
+        MODEL_NAME,
+        "--served-model-name",
+        SERVED_NAME,
+        "--host",
+        ENGINE_HOST,
+        "--port",
+        str(port),
+        "--uvicorn-log-level=info",
+        "--tensor-parallel-size",
+        str(N_GPU),
+        "--enable-sleep-mode",
+        "--enable-prefix-caching",
+        *lora_args(),
+        *cli_args(params),
+        "--dtype",
+        "auto",
+        "--reasoning-parser",
+        "qwen3",
+        "--language-model-only",
+    ]
+
+
 def wait_ready(proc: subprocess.Popen):
     while True:
         try:
-            socket.create_connection(("localhost", VLLM_PORT), timeout=1).close()
+            socket.create_connection((ENGINE_HOST, ENGINE_PORT), timeout=1).close()
             return
         except OSError:
             if proc.poll() is not None:
                 raise RuntimeError(f"vLLM exited with {proc.returncode}")
 
 
-def warmup():
+def wait_healthy(timeout: float = 60):
+    """Poll ``/health`` until the engine answers 200."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            if requests.get(f"{ENGINE_URL}/health", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        if time.time() > deadline:
+            raise TimeoutError("vLLM did not become healthy")
+        time.sleep(0.1)
+
+
+def warmup(n: int = 3, max_tokens: int = 16):
     payload = {
         "model": SERVED_NAME,
         "messages": [{"role": "user", "content": "warmup"}],
-        "max_tokens": 16,
+        "max_tokens": max_tokens,
         "chat_template_kwargs": {"enable_thinking": False},
     }
-    for _ in range(3):
+    for _ in range(n):
         requests.post(
-            f"http://localhost:{VLLM_PORT}/v1/chat/completions",
+            f"{ENGINE_URL}/v1/chat/completions",
             json=payload,
             timeout=300,
         ).raise_for_status()
 
 
+def send_warmup(prompt: str, max_tokens: int) -> float:
+    """One chat request for ``sweep``; returns its latency in seconds."""
+    start = time.perf_counter()
+    requests.post(
+        f"{ENGINE_URL}/v1/chat/completions",
+        json={
+            "model": SERVED_NAME,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "ignore_eos": True,
+            "chat_template_kwargs": {"enable_thinking": False},
+        },
+        timeout=300,
+    ).raise_for_status()
+    return time.perf_counter() - start
+
+
+def warmup_shapes(max_num_seqs: int, max_num_batched_tokens: int) -> dict[str, dict]:
+    """Sweep batch sizes and prompt lengths through the engine.
+
+    With recorded traffic, the shapes come from it instead.
+    """
+    shapes = shapes_from_traffic(
+        load_traffic(WARMUP_TRAFFIC), max_num_seqs, max_num_batched_tokens
+    ) or default_shapes(max_num_seqs, max_num_batched_tokens)
+    report = sweep(send_warmup, shapes)
+    for name, row in report.items():
+        print(
+            f"warmup {name}: {row['first_seconds']:.3f}s -> {row['warm_seconds']:.3f}s"
+        )
+    return report
+
+
+def send_chat(payload: dict) -> float:
+    """POST one chat completion and return its latency in seconds."""
+    start = time.perf_counter()
+    requests.post(
+        f"{ENGINE_URL}/v1/chat/completions", json=payload, timeout=300
+    ).raise_for_status()
+    return time.perf_counter() - start
+
+
+def prefix_cache_report() -> dict:
+    return prefix_cache_stats(requests.get(f"{ENGINE_URL}/metrics", timeout=10).text)
+
+
 def sleep(level=1):
-    requests.post(f"http://localhost:{VLLM_PORT}/sleep?level={level}").raise_for_status()
+    requests.post(f"{ENGINE_URL}/sleep?level={level}").raise_for_status()
 
 
 def wake_up():
-    requests.post(f"http://localhost:{VLLM_PORT}/wake_up").raise_for_status()
+    requests.post(f"{ENGINE_URL}/wake_up").raise_for_status()
+    if SLEEP_LEVEL == 2:
+        # Level 2 dropped the weights; load them again from the HF cache.
+        requests.post(
+            f"{ENGINE_URL}/collective_rpc",
+            json={"method": "reload_weights"},
+            timeout=600,
+        ).raise_for_status()
+
+
+def adapter_manager() -> AdapterManager:
+    """LoRA adapters from ``LORA_DIR``, registered with the engine on first use."""
+    import httpx
+
+    client = httpx.AsyncClient(base_url=ENGINE_URL, timeout=600)
+
+    async def load(name: str, path: str) -> None:
+        response = await client.post(
+            "/v1/load_lora_adapter", json={"lora_name": name, "lora_path": path}
+        )
+        response.raise_for_status()
+
+    async def unload(name: str) -> None:
+        response = await client.post(
+            "/v1/unload_lora_adapter", json={"lora_name": name}
+        )
+        response.raise_for_status()
+
+    return AdapterManager(
+        LORA_DIR, load, unload, capacity=MAX_CPU_LORAS, slots=MAX_LORAS
+    )
+
+
+def reload_adapters_forever(interval: float = 60) -> None:
+    """Pick up adapters uploaded to the Volume after this container started."""
+    while True:
+        time.sleep(interval)
+        try:
+            lora_vol.reload()
+        except Exception as exc:
+            print(f"lora volume reload failed: {exc}")
+
+
+def serve_engine_proxy(
+    lifecycle: EngineLifecycle | None, adapters: AdapterManager | None
+) -> None:
+    """Serve ``create_engine_app`` on ``VLLM_PORT`` in a daemon thread."""
+    import uvicorn
+
+    from ollama_modal.proxy import create_engine_app
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_engine_app(ENGINE_URL, lifecycle, adapters),
+            host="0.0.0.0",
+            port=VLLM_PORT,
+            log_level="warning",
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
 
 
 @app.cls(
     image=vllm_image,
     gpu="L40S",
-    scaledown_window=2 * MINUTES,
+    scaledown_window=SCALEDOWN_WINDOW,
     timeout=20 * MINUTES,
     volumes={
         "/root/.cache/huggingface": hf_cache_vol,
+        VLLM_CACHE_DIR: vllm_cache_vol,
+        LORA_DIR: lora_vol,
     },
     enable_memory_snapshot=True,
     experimental_options={"enable_gpu_snapshot": True},
@@ -94,46 +335,97 @@ def wake_up():
 class VllmServer:
     @modal.enter(snap=True)
     def start(self):
-        cmd = [
-            "vllm",
-            "serve",
-            MODEL_NAME,
-            "--served-model-name",
-            SERVED_NAME,
-            "--host",
-            "0.0.0.0",
-            "--port",
-            str(VLLM_PORT),
-            "--uvicorn-log-level=info",
-            "--tensor-parallel-size",
-            str(N_GPU),
-            "--enable-sleep-mode",
-            "--max-num-seqs",
-            "8",
-            "--max-model-len",
-            "32768",
-            "--max-num-batched-tokens",
-            "8192",
-            "--gpu-memory-utilization",
-            "0.90",
-            "--dtype",
-            "auto",
-            "--reasoning-parser",
-            "qwen3",
-            "--language-model-only",
-        ]
+        """Load and warm the model, seed hot prompts, and sleep before the snapshot."""
+        self.start_timeline = StartupTimeline()
+        self.serving_params = serving_params()
+        cmd = serve_command(self.serving_params)
 
         print(*cmd)
 
-        self.vllm_proc = subprocess.Popen(cmd)
+        with self.start_timeline.phase("spawn_server"):
+            self.vllm_proc = subprocess.Popen(cmd)
+        self.start_timeline.timed("wait_ready", wait_ready, self.vllm_proc)
+        with self.start_timeline.phase("warmup") as detail:
+            self.warmup_report = warmup_shapes(
+                int(self.serving_params["max_num_seqs"]),
+                int(self.serving_params["max_num_batched_tokens"]),
+            )
+            detail["shapes"] = len(self.warmup_report)
+
+        self.hot_prompts = load_hot_prompts(HOT_PROMPTS)
+        with self.start_timeline.phase("seed_prefixes") as detail:
+            self.seed_report = seed(send_chat, SERVED_NAME, self.hot_prompts)
+            detail["prompts"] = len(self.seed_report)
+        for row in self.seed_report:
+            print(
+                f"hot prompt ({row['system_chars']} chars): "
+                f"miss {row['miss_ttft_seconds']:.3f}s, "
+                f"hit {row['hit_ttft_seconds']:.3f}s"
+            )
 
-        wait_ready(self.vllm_proc)
+        idle_after = IDLE_SLEEP_FRACTION * SCALEDOWN_WINDOW or None
+        self.lifecycle = EngineLifecycle(
+            sleep, self.wake_and_seed, level=SLEEP_LEVEL, idle_after=idle_after
+        )
+        if SNAPSHOT_SLEEP:
+            self.lifecycle.sleep("snapshot")
+        print(f"Startup timeline: {self.start_timeline.to_json()}")
 
-        warmup()
+    def wake_and_seed(self):
+        """Wake the engine and prefill the hot prompts again.
+
+        Sleeping dropped their KV blocks.
+        """
+        wake_up()
+        for prompt in self.hot_prompts:
+            send_chat(seed_payload(SERVED_NAME, prompt))
 
     @modal.enter(snap=False)
     def restore(self):
-        wait_ready(self.vllm_proc)
+        """Wake the engine, check its health and run one tiny request."""
+        self.restore_timeline = StartupTimeline()
+        self.restore_timeline.timed("wait_ready", wait_ready, self.vllm_proc)
+        self.restore_timeline.timed("wake", self.lifecycle.wake, "restore")
+        self.restore_timeline.timed("health", wait_healthy)
+        self.restore_timeline.timed("warmup", warmup, n=1, max_tokens=1)
+        # What a matching request sees right after restore: with SNAPSHOT_SLEEP
+        # the blocks were re-seeded during "wake", not kept in the snapshot.
+        self.restore_seed_report = measure(send_chat, SERVED_NAME, self.hot_prompts)
+        self.adapters = adapter_manager() if LORA else None
+        serve_engine_proxy(
+            self.lifecycle if self.lifecycle.idle_after else None, self.adapters
+        )
+        if self.lifecycle.idle_after:
+            self.lifecycle.watch()
+        if LORA:
+            threading.Thread(target=reload_adapters_forever, daemon=True).start()
+        print(f"Restore timeline: {self.restore_timeline.to_json()}")
+
+    @modal.method()
+    def lifecycle_report(self) -> dict:
+        """Timed phases of the pre-snapshot start, the restore, and every sleep/wake.
+
+        ``warmup`` has, per swept shape, the latency of its first and second pass;
+        ``hot_prompts`` the TTFT of a seeded prefix vs an unseeded one, before
+        the snapshot and right after restore, and whether the snapshot kept the
+        seeded blocks (not when the engine sleeps in it);
+        ``prefix_cache`` the engine's hit rate since it started; and ``lora``
+        the adapter cache's hit rate and load times.
+        """
+        return {
+            "serving_params": self.serving_params,
+            "start": self.start_timeline.as_dict(),
+            "warmup": self.warmup_report,
+            "restore": self.restore_timeline.as_dict(),
+            "lifecycle": self.lifecycle.as_dict(),
+            "hot_prompts": {
+                "kept_in_snapshot": not SNAPSHOT_SLEEP,
+                "before_snapshot": self.seed_report,
+                "after_restore": self.restore_seed_report,
+            },
+            "prefix_cache": prefix_cache_report(),
+            "lora": self.adapters.stats() if self.adapters else None,
+        }
 
     @modal.web_server(port=VLLM_PORT, startup_timeout=20 * MINUTES)
     def serve(self):
@@ -144,8 +436,33 @@ class VllmServer:
         self.vllm_proc.terminate()
 
 
+gateway_image = (
+    modal.Image.debian_slim(python_version="3.12")
+    .pip_install("fastapi", "httpx")
+    .add_local_python_source("ollama_modal")
+)
+
+
+@app.function(image=gateway_image, scaledown_window=5 * MINUTES, timeout=20 * MINUTES)
+@modal.concurrent(max_inputs=200)
+@modal.asgi_app()
+def ollama_api():
+    """Ollama's native NDJSON API (``/api/chat``, ``/api/generate``) for ``VllmServer``.
+
+    OpenAI-style requests and every other path pass straight through, so one
+    URL serves clients of either protocol.
+    """
+    from ollama_modal.proxy import create_translation_app
+
+    return create_translation_app(VllmServer().serve.get_web_url(), engine="openai")
+
+
 @app.local_entrypoint()
 async def test(content=None):
+    # Local only: Modal imports this file in every container, and the
+    # gateway image doesn't ship aiohttp.
+    import aiohttp
+
     url = await VllmServer().serve.get_web_url.aio()
 
     messages = [
@@ -157,7 +474,16 @@ async def test(content=None):
         print(f"Health check for {url}")
         async with session.get("/health", timeout=10 * MINUTES) as resp:
             assert resp.status == 200, f"health check failed: {resp.status}"
-        print("Health OK. Sending request:")
+        print("Health OK.")
+        hot_prompts = (await VllmServer().lifecycle_report.remote.aio())["hot_prompts"]
+        print(f"Seeded blocks kept in the snapshot: {hot_prompts['kept_in_snapshot']}")
+        for row in hot_prompts["after_restore"]:
+            print(
+                f"hot prompt ({row['system_chars']} chars) after restore: "
+                f"miss {row['miss_ttft_seconds']:.3f}s, "
+                f"hit {row['hit_ttft_seconds']:.3f}s"
+            )
+        print("Sending request:")
 
         payload: dict[str, Any] = {
             "messages": messages,